@@ -0,0 +1,325 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import logging
+from contextlib import closing
+from typing import Optional
+
+import artifacts
+import gcode_index
+
+logger = logging.getLogger(__name__)
+
+# The index lives in a subdirectory, so its journal files never change the models directory's mtime
+INDEX_DIR_NAME = ".index"
+DB_NAME = "artifacts.db"
+
+# Opt-in disk quota for the models directory, least recently used G-code and previews are deleted
+# beyond it; 0 disables
+QUOTA_BYTES = int(float(os.getenv("ARTIFACT_QUOTA_MB", "0")) * 1024 * 1024)
+# Artifacts used this recently are never collected, a running slice or upload may need them
+MIN_AGE_SECONDS = 600
+
+KINDS = {".stl": "model", ".3mf": "export", ".gcode": "gcode", ".bgcode": "gcode", ".png": "preview"}
+# Identical models and G-code share one file. Previews are rendered in place over the old file,
+# so a shared one would change both
+DEDUP_KINDS = {"model", "gcode"}
+# Only files that can be made again are collected: G-code is re-sliced and previews re-rendered
+# from the model, while models and exports are the user's work
+COLLECTED_KINDS = ("gcode", "preview")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    name TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    stored_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    prompt TEXT,
+    source TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_kind_created ON artifacts (kind, created_at);
+CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed_at);
+CREATE INDEX IF NOT EXISTS artifacts_hash ON artifacts (content_hash);
+CREATE INDEX IF NOT EXISTS artifacts_inode ON artifacts (inode);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def kind_of(name: str) -> str:
+    return KINDS.get(os.path.splitext(name)[1].lower(), "other")
+
+
+def content_digest(stored_path: str) -> str:
+    """SHA-256 of an artifact's plain contents, so a compressed and a plain copy hash the same."""
+    digest = hashlib.sha256()
+    opener = gzip.open if stored_path.endswith(artifacts.COMPRESSED_SUFFIX) else open
+    with opener(stored_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row(row: sqlite3.Row) -> dict:
+    item = dict(row)
+    item["metadata"] = json.loads(item["metadata"])
+    return item
+
+
+class ArtifactStore:
+    """
+    SQLite index of the models directory: content hash, source prompt, dimensions, slice results
+    and access times of every model, preview and G-code file.
+
+    Files keep their names in the models directory, so every tool that takes a filename works
+    unchanged. Files written without going through register (copied in by hand, left behind by
+    an older version) are picked up by sync, which only rescans when the directory changes.
+    All methods block; call them from a worker thread.
+    """
+
+    def __init__(self, models_dir: str, quota_bytes: Optional[int] = None):
+        self.models_dir = models_dir
+        self.db_path = os.path.join(models_dir, INDEX_DIR_NAME, DB_NAME)
+        self.quota_bytes = QUOTA_BYTES if quota_bytes is None else quota_bytes
+        self._created = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._created:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._created:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._created = True
+        return conn
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.models_dir, name)
+
+    def _index(self, conn: sqlite3.Connection, name: str, created_at: Optional[float] = None,
+               prompt: Optional[str] = None, source: Optional[str] = None, metadata: Optional[dict] = None):
+        """Hashes the stored file of name and writes its row, sharing the file with an identical artifact."""
+        stored_path = artifacts.stored_path(self.path(name))
+        if stored_path is None:
+            raise FileNotFoundError(f"Artifact not found: {name}")
+        kind = kind_of(name)
+        digest = content_digest(stored_path)
+
+        if kind in DEDUP_KINDS:
+            self._share(conn, name, stored_path, digest)
+        stat = os.stat(stored_path)
+
+        previous = conn.execute("SELECT * FROM artifacts WHERE name = ?", (name,)).fetchone()
+        if previous is not None and previous["content_hash"] == digest:
+            # Same content registered again: keep what is known about it
+            prompt = prompt if prompt is not None else previous["prompt"]
+            source = source if source is not None else previous["source"]
+            metadata = {**json.loads(previous["metadata"]), **(metadata or {})}
+            created_at = created_at or previous["created_at"]
+
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO artifacts (name, kind, stored_name, content_hash, size, inode, mtime_ns, "
+            "prompt, source, metadata, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name, kind, os.path.basename(stored_path), digest, stat.st_size, stat.st_ino, stat.st_mtime_ns,
+             prompt, source, json.dumps(metadata or {}), created_at or now, now))
+
+    def _share(self, conn: sqlite3.Connection, name: str, stored_path: str, digest: str):
+        """Replaces stored_path with a hard link to an identical artifact stored the same way."""
+        compressed = stored_path.endswith(artifacts.COMPRESSED_SUFFIX)
+        for other in conn.execute("SELECT stored_name, inode FROM artifacts WHERE content_hash = ? AND name != ?",
+                                  (digest, name)):
+            other_path = os.path.join(self.models_dir, other["stored_name"])
+            if other_path.endswith(artifacts.COMPRESSED_SUFFIX) != compressed:
+                continue
+            try:
+                other_stat = os.stat(other_path)
+                if other_stat.st_ino != other["inode"] or other_stat.st_ino == os.stat(stored_path).st_ino:
+                    continue
+                temp_path = stored_path + ".tmp"
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                os.link(other_path, temp_path)
+                os.replace(temp_path, stored_path)
+                logger.info(f"{name} has the same content as {other['stored_name']}, sharing its file")
+            except OSError as e:
+                # Filesystems without hard links just keep both copies
+                logger.debug(f"Could not share {name} with {other['stored_name']}: {e}")
+            return
+
+    def register(self, name: str, prompt: Optional[str] = None, source: Optional[str] = None,
+                 metadata: Optional[dict] = None) -> dict:
+        """
+        Indexes a freshly written artifact (after artifacts.finalize) and returns its row.
+
+        Args:
+            name: Filename in the models directory, without the compression suffix.
+            prompt: Description the model was generated from.
+            source: Artifact this one was made from, e.g. the STL of a G-code file.
+            metadata: Extra facts (dimensions, slice results), merged into what is already known
+                when the content did not change.
+        """
+        with closing(self._connect()) as conn, conn:
+            self._index(conn, name, prompt=prompt, source=source, metadata=metadata)
+        return self.get(name)
+
+    def get(self, name: str) -> Optional[dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM artifacts WHERE name = ?", (name,)).fetchone()
+        return _row(row) if row is not None else None
+
+    def touch(self, name: str):
+        """Marks an artifact as used, which keeps it from garbage collection."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("UPDATE artifacts SET accessed_at = ? WHERE name = ?", (time.time(), name))
+
+    def sync(self, force: bool = False) -> bool:
+        """
+        Brings the index up to date with files added, replaced or deleted behind its back.
+        Skipped while the directory's mtime is unchanged. Returns True if it rescanned.
+        """
+        try:
+            directory_mtime = str(os.stat(self.models_dir).st_mtime_ns)
+        except FileNotFoundError:
+            return False
+        with closing(self._connect()) as conn, conn:
+            state = conn.execute("SELECT value FROM state WHERE key = 'directory_mtime'").fetchone()
+            if not force and state is not None and state["value"] == directory_mtime:
+                return False
+
+            files = {}
+            for entry in os.scandir(self.models_dir):
+                if (entry.name.startswith(".") or entry.name.endswith(".tmp")
+                        or entry.name.endswith(gcode_index.INDEX_SUFFIX) or not entry.is_file()):
+                    continue
+                files[artifacts.logical_name(entry.name)] = entry
+
+            known = {row["name"]: row for row in conn.execute("SELECT name, stored_name, size, mtime_ns FROM artifacts")}
+            for name in known.keys() - files.keys():
+                conn.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+            for name, entry in files.items():
+                stat = entry.stat()
+                row = known.get(name)
+                if (row is None or row["stored_name"] != entry.name or row["size"] != stat.st_size
+                        or row["mtime_ns"] != stat.st_mtime_ns):
+                    try:
+                        self._index(conn, name, created_at=stat.st_mtime)
+                    except OSError as e:
+                        logger.warning(f"Could not index {name}: {e}")
+
+            # Sharing files above replaced directory entries, record the mtime after it
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('directory_mtime', ?)",
+                         (str(os.stat(self.models_dir).st_mtime_ns),))
+        return True
+
+    def list(self, kind: Optional[str] = None, search: Optional[str] = None, limit: int = 50,
+             offset: int = 0) -> dict:
+        """
+        One page of artifacts, newest first.
+
+        Args:
+            kind: "model", "gcode", "preview", "export" or None for all.
+            search: Case insensitive text the name or the prompt must contain.
+
+        Returns:
+            Dict with total (matches over all pages) and items (rows of this page).
+        """
+        self.sync()
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if search:
+            clauses.append("(name LIKE ? ESCAPE '\\' OR prompt LIKE ? ESCAPE '\\')")
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern, pattern]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM artifacts {where}", params).fetchone()[0]
+            rows = conn.execute(f"SELECT * FROM artifacts {where} ORDER BY created_at DESC, name LIMIT ? OFFSET ?",
+                                params + [limit, offset]).fetchall()
+        return {"total": total, "offset": offset, "items": [_row(row) for row in rows]}
+
+    def unique_name(self, filename: str) -> str:
+        """filename, or stem_2, stem_3, ... if an artifact already has that name."""
+        stem, extension = os.path.splitext(filename)
+        candidate, number = filename, 1
+        while artifacts.exists(self.path(candidate)):
+            number += 1
+            candidate = f"{stem}_{number}{extension}"
+        return candidate
+
+    def remove(self, name: str):
+        """Deletes an artifact with its cached plain copy, G-code index and thumbnail."""
+        path = self.path(name)
+        artifacts.remove(path)
+        sidecars = {
+            "gcode": [gcode_index.index_path_for(path)],
+            "model": [os.path.join(self.models_dir, ".thumbnails", os.path.splitext(name)[0] + ".png")],
+        }
+        for sidecar in sidecars.get(kind_of(name), []):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM artifacts WHERE name = ?", (name,))
+
+    def usage(self) -> int:
+        """Bytes on disk, counting a file shared by several artifacts once."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                                "(SELECT MAX(size) AS size FROM artifacts GROUP BY inode)").fetchone()[0]
+
+    def collect_garbage(self, quota_bytes: Optional[int] = None) -> dict:
+        """
+        Deletes least recently used G-code and previews (COLLECTED_KINDS) until the directory fits
+        the quota. Models, exports and artifacts used in the last MIN_AGE_SECONDS are kept even if
+        that leaves it over quota.
+
+        Returns:
+            Dict with removed (names), freed (bytes) and usage (bytes afterwards).
+        """
+        quota = self.quota_bytes if quota_bytes is None else quota_bytes
+        usage = self.usage()
+        removed, freed = [], 0
+        if quota <= 0 or usage <= quota:
+            return {"removed": removed, "freed": freed, "usage": usage}
+
+        with closing(self._connect()) as conn:
+            candidates = conn.execute(
+                f"SELECT name, size, inode FROM artifacts WHERE accessed_at < ? "
+                f"AND kind IN ({', '.join('?' * len(COLLECTED_KINDS))}) ORDER BY accessed_at",
+                (time.time() - MIN_AGE_SECONDS, *COLLECTED_KINDS)).fetchall()
+        for row in candidates:
+            if usage <= quota:
+                break
+            try:
+                self.remove(row["name"])
+            except OSError as e:
+                logger.warning(f"Could not remove {row['name']}: {e}")
+                continue
+            removed.append(row["name"])
+            with closing(self._connect()) as conn:
+                shared = conn.execute("SELECT COUNT(*) FROM artifacts WHERE inode = ?", (row["inode"],)).fetchone()[0]
+            # A shared file is only gone with its last name
+            if not shared:
+                usage -= row["size"]
+                freed += row["size"]
+        if removed:
+            logger.info(f"Removed {len(removed)} artifacts ({freed} bytes) to fit the {quota} byte quota")
+        return {"removed": removed, "freed": freed, "usage": usage}
+
+    def stats(self) -> dict:
+        self.sync()
+        with closing(self._connect()) as conn:
+            kinds = {row["kind"]: row["count"] for row in
+                     conn.execute("SELECT kind, COUNT(*) AS count FROM artifacts GROUP BY kind")}
+        return {"artifacts": sum(kinds.values()), "by_kind": kinds, "usage": self.usage(), "quota": self.quota_bytes}
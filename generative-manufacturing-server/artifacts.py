@@ -0,0 +1,133 @@
+import gzip
+import os
+import shutil
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# "gzip" stores finished models and G-code compressed in the models directory, "none" keeps them plain
+ARTIFACT_COMPRESSION = os.getenv("ARTIFACT_COMPRESSION", "none").lower()
+COMPRESSED_SUFFIX = ".gz"
+
+# Plain copies of compressed artifacts for tools that need a real file (OpenSCAD, PrusaSlicer, uploads)
+CACHE_DIR_NAME = ".cache"
+CACHE_MAX_BYTES = int(float(os.getenv("ARTIFACT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+
+def compression_enabled() -> bool:
+    return ARTIFACT_COMPRESSION == "gzip"
+
+
+def _cache_path(path: str) -> str:
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR_NAME, filename)
+
+
+def exists(path: str) -> bool:
+    """True if the artifact exists plain or compressed."""
+    return os.path.exists(path) or os.path.exists(path + COMPRESSED_SUFFIX)
+
+
+def stored_path(path: str) -> Optional[str]:
+    """The file that actually holds the artifact, or None."""
+    if os.path.exists(path):
+        return path
+    if os.path.exists(path + COMPRESSED_SUFFIX):
+        return path + COMPRESSED_SUFFIX
+    return None
+
+
+def logical_name(filename: str) -> str:
+    """Filename as tools refer to it, without the compression suffix."""
+    return filename[:-len(COMPRESSED_SUFFIX)] if filename.endswith(COMPRESSED_SUFFIX) else filename
+
+
+def finalize(path: str) -> str:
+    """
+    Stores a freshly written artifact according to ARTIFACT_COMPRESSION.
+
+    With gzip, the compressed file replaces the original in the models directory and the
+    plain file moves into the cache, so consumers right after generation skip decompression.
+    Returns the path the artifact is stored at.
+    """
+    if not compression_enabled() or not os.path.exists(path):
+        return path
+
+    compressed_path = path + COMPRESSED_SUFFIX
+    temp_path = compressed_path + ".tmp"
+    with open(path, "rb") as source, gzip.open(temp_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(temp_path, compressed_path)
+
+    cache_path = _cache_path(path)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    os.replace(path, cache_path)
+    _trim_cache(os.path.dirname(cache_path))
+
+    logger.info(f"Stored {os.path.basename(path)}: {os.path.getsize(cache_path)} -> {os.path.getsize(compressed_path)} bytes")
+    return compressed_path
+
+
+def resolve(path: str) -> Optional[str]:
+    """
+    Returns a plain file for an artifact, decompressing it into the cache if needed.
+    None if the artifact does not exist.
+    """
+    if os.path.exists(path):
+        return path
+
+    compressed_path = path + COMPRESSED_SUFFIX
+    if not os.path.exists(compressed_path):
+        return None
+
+    cache_path = _cache_path(path)
+    if not os.path.exists(cache_path) or os.path.getmtime(cache_path) < os.path.getmtime(compressed_path):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + ".tmp"
+        with gzip.open(compressed_path, "rb") as source, open(temp_path, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(temp_path, cache_path)
+        _trim_cache(os.path.dirname(cache_path))
+    else:
+        # Mark as recently used for the cache trim
+        os.utime(cache_path)
+    return cache_path
+
+
+def remove(path: str):
+    """Deletes an artifact in every form it is stored in."""
+    for candidate in (path, path + COMPRESSED_SUFFIX, _cache_path(path)):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+
+
+def unshare(path: str):
+    """
+    Removes path if it is a hard link shared with an identical artifact (see artifact_store),
+    so a tool that writes it in place (OpenSCAD, PrusaSlicer) does not change the other one too.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _trim_cache(cache_dir: str):
+    """Evicts least recently used plain copies until the cache fits CACHE_MAX_BYTES."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        # Only evict copies whose compressed original still exists
+        original = os.path.join(os.path.dirname(cache_dir), os.path.basename(path))
+        if os.path.exists(original + COMPRESSED_SUFFIX):
+            os.remove(path)
+            total -= size
@@ -0,0 +1,84 @@
+"""
+Compiles the SCAD corpus with every available OpenSCAD backend and records
+compile time, peak memory and output triangle count.
+
+Usage:
+    python benchmarks/bench_scad_compile.py [--backends cgal,manifold] [--repeat 3] [--output results.json]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import stl_generator
+from process_runner import ProcessRunner
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scad")
+
+
+async def bench_file(scad_path: str, backend: str, repeat: int, runner: ProcessRunner) -> dict:
+    with open(scad_path, "r", encoding="utf-8") as f:
+        scad_code = f.read()
+
+    runs = []
+    triangles = None
+    error = None
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "out.stl")
+        for _ in range(repeat):
+            result = await stl_generator.compile_scad_to_stl(scad_code, output_path, runner=runner, backend=backend)
+            if not result["success"]:
+                error = result["error"]
+                break
+            runs.append(result["usage"])
+            triangles = len(mesh_analysis.load_stl(output_path))
+
+    row = {"file": os.path.basename(scad_path), "backend": backend, "success": error is None}
+    if runs:
+        row.update({
+            "wall_time_median": round(statistics.median(r["wall_time"] for r in runs), 3),
+            "wall_time_min": min(r["wall_time"] for r in runs),
+            "peak_rss_mb": round(max(r["max_rss_kb"] or 0 for r in runs) / 1024, 1),
+            "triangles": triangles,
+        })
+    if error:
+        # OpenSCAD puts the actual error on its last stderr line
+        row["error"] = error.strip().splitlines()[-1]
+    return row
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="cgal,manifold", help="Comma separated backends to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Compiles per file and backend")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Directory of .scad files")
+    parser.add_argument("--output", help="Write the rows as JSON to this path")
+    args = parser.parse_args()
+
+    # One compile at a time, so runs do not compete for cores or memory bandwidth
+    runner = ProcessRunner(max_workers=1)
+    rows = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        if await stl_generator.detect_backend_args(backend, runner) is None:
+            print(f"Skipping {backend}: not supported by {stl_generator.OPENSCAD_PATH}")
+            continue
+        for scad_path in sorted(glob.glob(os.path.join(args.corpus, "*.scad"))):
+            row = await bench_file(scad_path, backend, args.repeat, runner)
+            rows.append(row)
+            print(f"{row['file']:<24} {backend:<9} "
+                  f"{row.get('wall_time_median', '-'):>8}s {row.get('peak_rss_mb', '-'):>8}MB "
+                  f"{row.get('triangles', '-'):>8} tris {'' if row['success'] else 'FAILED: ' + row['error']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"openscad": stl_generator.OPENSCAD_PATH, "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
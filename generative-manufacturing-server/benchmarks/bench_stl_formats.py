@@ -0,0 +1,114 @@
+"""
+Compares on-disk size, write time and load time of the mesh formats the server can
+store: ASCII STL, binary STL, gzipped binary STL and 3MF.
+
+Without input files a synthetic UV sphere is used, sized by --triangles.
+
+Usage:
+    python benchmarks/bench_stl_formats.py [model.stl ...] [--triangles 500000] [--repeat 3] [--output results.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+
+
+def uv_sphere(triangles: int, radius: float = 50.0) -> np.ndarray:
+    """Closed sphere with roughly the requested number of triangles."""
+    segments = max(int(np.sqrt(triangles / 2)), 3)
+    theta = np.linspace(0, np.pi, segments + 1)
+    phi = np.linspace(0, 2 * np.pi, segments + 1)
+    t, p = np.meshgrid(theta, phi, indexing="ij")
+    grid = np.stack([np.sin(t) * np.cos(p), np.sin(t) * np.sin(p), np.cos(t)], axis=-1) * radius
+    a, b = grid[:-1, :-1], grid[:-1, 1:]
+    c, d = grid[1:, :-1], grid[1:, 1:]
+    quads = np.concatenate([np.stack([a, c, d], axis=2), np.stack([a, d, b], axis=2)])
+    return quads.reshape(-1, 3, 3).astype(np.float32)
+
+
+def write_ascii_stl(path: str, triangles: np.ndarray):
+    with open(path, "w") as f:
+        f.write("solid bench\n")
+        for tri in triangles:
+            f.write("facet normal 0 0 0\nouter loop\n")
+            f.write("".join(f"vertex {x:e} {y:e} {z:e}\n" for x, y, z in tri))
+            f.write("endloop\nendfacet\n")
+        f.write("endsolid bench\n")
+
+
+def write_gzip_stl(path: str, triangles: np.ndarray):
+    plain_path = path[:-len(".gz")]
+    mesh_analysis.write_binary_stl(plain_path, triangles)
+    with open(plain_path, "rb") as source, gzip.open(path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.remove(plain_path)
+
+
+FORMATS = {
+    "ascii.stl": write_ascii_stl,
+    "binary.stl": mesh_analysis.write_binary_stl,
+    "binary.stl.gz": write_gzip_stl,
+    "3mf": mesh_analysis.write_3mf,
+}
+
+
+def timed(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times), 4)
+
+
+def bench_mesh(name: str, triangles: np.ndarray, repeat: int) -> list[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, writer in FORMATS.items():
+            path = os.path.join(tmp, "model." + fmt)
+            row = {"mesh": name, "format": fmt, "triangles": len(triangles)}
+            row["write_s"] = timed(lambda: writer(path, triangles), repeat)
+            row["size_mb"] = round(os.path.getsize(path) / 1e6, 3)
+            # 3MF is an export only, the server never reads it back
+            if fmt != "3mf":
+                row["load_s"] = timed(lambda: mesh_analysis.load_stl(path), repeat)
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("models", nargs="*", help="STL files to convert, defaults to a synthetic sphere")
+    parser.add_argument("--triangles", type=int, default=500_000, help="Size of the synthetic sphere")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per format")
+    parser.add_argument("--output", help="Write the rows as JSON to this path")
+    args = parser.parse_args()
+
+    meshes = [(os.path.basename(p), mesh_analysis.load_stl(p)) for p in args.models]
+    if not meshes:
+        meshes = [("sphere", uv_sphere(args.triangles))]
+
+    rows = []
+    for name, triangles in meshes:
+        for row in bench_mesh(name, triangles, args.repeat):
+            rows.append(row)
+            print(f"{row['mesh']:<24} {row['format']:<14} {row['size_mb']:>9}MB "
+                  f"write {row['write_s']:>8}s load {row.get('load_s', '-'):>8}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compares the size and PrusaLink upload time of text G-code and binary G-code (.bgcode).
+
+Give already sliced files, or STL models that are sliced both ways with the local PrusaSlicer.
+Uploads go to the printer at --printer-ip, or by default to a local PrusaLink stand-in that
+accepts the same PUT request and reads the body at --mbps, so runs are comparable without
+a printer.
+
+Usage:
+    python benchmarks/bench_upload_formats.py part.gcode part.bgcode [--repeat 3] [--output results.json]
+    python benchmarks/bench_upload_formats.py model.stl [--intent draft] [--mbps 20]
+    python benchmarks/bench_upload_formats.py part.gcode part.bgcode --printer-ip 192.168.1.50 --api-key KEY
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gcode_index
+from prusa_printer import PrusaPrinter
+from slicer_runner import SlicerRunner
+
+
+def throttled_handler(bytes_per_second: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            remaining = int(self.headers.get("Content-Length", 0))
+            start = time.perf_counter()
+            received = 0
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 64 * 1024))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                received += len(chunk)
+                # Sleep until the link would have delivered this much
+                delay = received / bytes_per_second - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            self.send_response(201)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stand_in(mbps: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), throttled_handler(mbps * 1e6 / 8))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def slice_both(stl_path: str, intent: str, directory: str) -> list[str]:
+    slicer = SlicerRunner()
+    stem = os.path.splitext(os.path.basename(stl_path))[0]
+    paths = []
+    for extension in (".gcode", ".bgcode"):
+        path = os.path.join(directory, stem + extension)
+        result = await slicer.slice_file(stl_path, path, intent)
+        if not result["success"]:
+            raise SystemExit(f"Slicing {stl_path} failed: {result['error']}")
+        paths.append(path)
+    return paths
+
+
+async def bench_file(printer: PrusaPrinter, path: str, repeat: int) -> dict:
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        await printer.upload_file(path, f"bench_{i}_{os.path.basename(path)}")
+        times.append(time.perf_counter() - start)
+    size = os.path.getsize(path)
+    upload_s = statistics.median(times)
+    return {
+        "file": os.path.basename(path),
+        "format": "binary" if gcode_index.is_binary(path) else "text",
+        "size_mb": round(size / 1e6, 3),
+        "upload_s": round(upload_s, 3),
+        "mb_per_s": round(size / 1e6 / upload_s, 3),
+    }
+
+
+async def run(args) -> list[dict]:
+    stand_in = None
+    if args.printer_ip:
+        printer = PrusaPrinter(args.printer_ip, args.api_key)
+    else:
+        stand_in = start_stand_in(args.mbps)
+        printer = PrusaPrinter(f"127.0.0.1:{stand_in.server_address[1]}", "bench")
+
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            files = []
+            for path in args.files:
+                if path.lower().endswith(".stl"):
+                    files.extend(await slice_both(path, args.intent, tmp))
+                else:
+                    files.append(path)
+            for path in files:
+                rows.append(await bench_file(printer, path, args.repeat))
+    finally:
+        if stand_in:
+            stand_in.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="G-code/.bgcode files to upload, or STL models to slice both ways")
+    parser.add_argument("--intent", default="default", help="Slicing intent for STL inputs")
+    parser.add_argument("--repeat", type=int, default=3, help="Uploads per file")
+    parser.add_argument("--mbps", type=float, default=20.0, help="Link speed of the local stand-in, Mbit/s")
+    parser.add_argument("--printer-ip", default=None, help="Upload to this PrusaLink printer instead")
+    parser.add_argument("--api-key", default=os.getenv("PRINTER_API_KEY", ""), help="PrusaLink API key")
+    parser.add_argument("--output", help="Write the rows as JSON to this path")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    for row in rows:
+        print(f"{row['file']:<32} {row['format']:<7} {row['size_mb']:>9}MB "
+              f"upload {row['upload_s']:>8}s {row['mb_per_s']:>8}MB/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
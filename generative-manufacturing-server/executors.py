@@ -0,0 +1,143 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Camera captures are latency-critical: their own few workers, never queued behind mesh work
+CAMERA_WORKERS = int(os.getenv("CAMERA_WORKERS", "2"))
+# CPU-bound mesh and image work: validation, orientation, decimation, rendering, packing, compression
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "0")) or os.cpu_count() or 1
+# Short blocking file and SQLite operations: artifact and incident stores, caches, G-code indexes
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+
+POOL_SIZES = {"camera": CAMERA_WORKERS, "cpu": CPU_WORKERS, "io": IO_WORKERS}
+# Recent queue waits kept per pool for the wait statistics
+STATS_WINDOW = 1000
+
+
+class Pool(ThreadPoolExecutor):
+    """
+    A named ThreadPoolExecutor that keeps occupancy statistics: workers busy now and at peak,
+    tasks waiting for a worker, and how long tasks waited before one was free.
+    """
+
+    def __init__(self, name: str, max_workers: int, thread_name_prefix: str = None):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix or name)
+        self.name = name
+        self.max_workers = max_workers
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.running = 0
+        self.peak_running = 0
+        self.busy_seconds = 0.0
+        self._waits = deque(maxlen=STATS_WINDOW)
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        submitted_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self.started += 1
+                self.running += 1
+                self.peak_running = max(self.peak_running, self.running)
+                self._waits.append(started_at - submitted_at)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    if failed:
+                        self.failed += 1
+                    self.busy_seconds += time.perf_counter() - started_at
+
+        with self._lock:
+            self.submitted += 1
+        future = super().submit(task)
+        future.add_done_callback(self._count_cancelled)
+        return future
+
+    def _count_cancelled(self, future: Future):
+        # Cancelled before a worker picked it up, so it never ran
+        if future.cancelled():
+            with self._lock:
+                self.cancelled += 1
+
+    async def run(self, fn: Callable, /, *args, **kwargs) -> Any:
+        """asyncio.to_thread on this pool: runs fn in a worker with the caller's context variables."""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self, functools.partial(context.run, fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "max_workers": self.max_workers,
+                "running": self.running,
+                "queued": self.submitted - self.started - self.cancelled,
+                "utilization": round(self.running / self.max_workers, 3),
+                "peak_running": self.peak_running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 3),
+            }
+        if waits:
+            stats["wait_ms"] = {
+                "mean": round(sum(waits) / len(waits) * 1000, 3),
+                "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 3),
+                "max": round(waits[-1] * 1000, 3),
+            }
+        return stats
+
+
+_pools: dict[str, Pool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool(name: str) -> Pool:
+    """The pool of a workload class in POOL_SIZES, or one registered under name. Created on first use."""
+    existing = _pools.get(name)
+    if existing is not None:
+        return existing
+    with _pools_lock:
+        if name not in _pools:
+            if name not in POOL_SIZES:
+                raise KeyError(f"Unknown executor: {name}")
+            _pools[name] = Pool(name, max(1, POOL_SIZES[name]))
+            logger.info(f"Started executor {name} with {_pools[name].max_workers} workers")
+        return _pools[name]
+
+
+def register(executor: Pool):
+    """Adds a pool created elsewhere, e.g. the process waiters of a ProcessRunner, to the statistics."""
+    with _pools_lock:
+        _pools[executor.name] = executor
+
+
+async def run(name: str, fn: Callable, /, *args, **kwargs) -> Any:
+    """Runs a blocking function on the named pool without blocking the event loop."""
+    return await pool(name).run(fn, *args, **kwargs)
+
+
+def stats() -> dict:
+    """Occupancy statistics of every pool started so far, by name."""
+    return {name: executor.stats() for name, executor in sorted(_pools.items())}
@@ -0,0 +1,253 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# PrusaSlicer writes its estimates and the full config as comments at the end of the file
+FOOTER_BYTES = 64 * 1024
+_FOOTER_LINE = re.compile(rb"^; ([^=\n]+?) = (.*)$", re.MULTILINE)
+METADATA_KEYS = {
+    "estimated printing time (normal mode)": "print_time",
+    "estimated printing time (silent mode)": "print_time_silent",
+    "filament used [mm]": "filament_mm",
+    "filament used [cm3]": "filament_cm3",
+    "filament used [g]": "filament_g",
+    "total filament cost": "filament_cost",
+    "total layers count": "layers",
+    "layer_height": "layer_height",
+    "printer_model": "printer_model",
+}
+
+# Binary G-code (.bgcode): a file header, then typed blocks, the metadata blocks before the G-code
+BGCODE_MAGIC = b"GCDE"
+_BLOCK_GCODE = 1
+_BLOCK_THUMBNAIL = 5
+_COMPRESSION_DEFLATE = 1
+
+# Every layer starts with this comment, followed by ";Z:<height>"
+LAYER_MARKER = b";LAYER_CHANGE"
+Z_MARKER = b";Z:"
+# Progress the firmware shows, emitted by the slicer from its time estimate
+PROGRESS_MARKER = b"M73 P"
+# The index lives next to the G-code; bump the version when its layout changes
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def is_binary(gcode_path: str) -> bool:
+    with open(gcode_path, "rb") as f:
+        return f.read(len(BGCODE_MAGIC)) == BGCODE_MAGIC
+
+
+def _read_binary_metadata(gcode_path: str) -> dict:
+    """
+    Metadata of a binary G-code file. Its metadata blocks are key=value lines ahead of the
+    G-code blocks, so only the start of the file is read.
+    """
+    metadata = {}
+    with open(gcode_path, "rb") as f:
+        header = f.read(10)
+        if len(header) < 10:
+            return metadata
+        _, checksum_type = struct.unpack("<IH", header[4:])
+        checksum_size = 4 if checksum_type == 1 else 0
+        while True:
+            block = f.read(8)
+            if len(block) < 8:
+                break
+            block_type, compression, size = struct.unpack("<HHI", block)
+            if compression:
+                size = struct.unpack("<I", f.read(4))[0]
+            if block_type == _BLOCK_GCODE:
+                break
+            if block_type == _BLOCK_THUMBNAIL:
+                # Format, width and height parameters, the image and the checksum
+                f.seek(6 + size + checksum_size, os.SEEK_CUR)
+                continue
+            # Encoding parameter, always INI for metadata
+            f.seek(2, os.SEEK_CUR)
+            data = f.read(size)
+            f.seek(checksum_size, os.SEEK_CUR)
+            if compression == _COMPRESSION_DEFLATE:
+                data = zlib.decompress(data)
+            elif compression:
+                continue
+            for line in data.decode("utf-8", errors="replace").splitlines():
+                key, _, value = line.partition("=")
+                if key.strip() == "max_layer_z":
+                    metadata["max_z"] = float(value)
+                name = METADATA_KEYS.get(key.strip())
+                if name:
+                    metadata[name] = value.strip()
+    return metadata
+
+
+def read_metadata(gcode_path: str) -> dict:
+    """Print time, filament use and layer count from a G-code footer; missing values are left out."""
+    if is_binary(gcode_path):
+        return _read_binary_metadata(gcode_path)
+    with open(gcode_path, "rb") as f:
+        f.seek(max(os.path.getsize(gcode_path) - FOOTER_BYTES, 0))
+        footer = f.read()
+
+    metadata = {}
+    for key, value in _FOOTER_LINE.findall(footer):
+        name = METADATA_KEYS.get(key.decode("utf-8", errors="replace").strip())
+        if name:
+            metadata[name] = value.decode("utf-8", errors="replace").strip()
+    return metadata
+
+
+def format_metadata(metadata: dict) -> str:
+    """One line summary of slice metadata for tool output."""
+    parts = []
+    if metadata.get("print_time"):
+        parts.append(f"estimated print time {metadata['print_time']}")
+    if metadata.get("filament_g"):
+        parts.append(f"{metadata['filament_g']} g filament")
+    if metadata.get("layers"):
+        parts.append(f"{metadata['layers']} layers")
+    if metadata.get("max_z"):
+        parts.append(f"{metadata['max_z']:g} mm high")
+    return ", ".join(parts)
+
+
+def fingerprint(path: str) -> str:
+    """
+    Size plus a hash of the first and last 64 KiB. Survives the file being moved or
+    decompressed into the artifact cache, unlike its mtime, and costs two small reads.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        f.seek(max(size - FINGERPRINT_BYTES, 0))
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _read_number(mm: mmap.mmap, start: int) -> Optional[float]:
+    end = mm.find(b"\n", start, start + 64)
+    try:
+        return float(mm[start:end if end != -1 else start + 64].split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def scan(gcode_path: str) -> dict:
+    """
+    Builds the layer index of a G-code file in one pass over a memory map.
+    Binary G-code gets its metadata only, without layers.
+
+    mmap.find runs in C over the mapped pages, so a few hundred MB take well under a second
+    and are never read into Python memory.
+
+    Returns:
+        Dict with z (layer heights), offsets (byte offset where each layer starts), progress
+        (M73 percentage the printer shows during each layer), end (byte offset after the last layer) and the
+        footer metadata plus max_z.
+    """
+    size = os.path.getsize(gcode_path)
+    z_values, offsets, progress = [], [], []
+    end = size
+    # Binary G-code is compressed block by block, its layers cannot be located without decoding it
+    if size and not is_binary(gcode_path):
+        with open(gcode_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(LAYER_MARKER)
+            while pos != -1:
+                z_mark = mm.find(Z_MARKER, pos, pos + 128)
+                z = _read_number(mm, z_mark + len(Z_MARKER)) if z_mark != -1 else None
+                z_values.append(z if z is not None else (z_values[-1] if z_values else 0.0))
+                offsets.append(pos)
+                pos = mm.find(LAYER_MARKER, pos + len(LAYER_MARKER))
+
+            # The last layer runs until the end G-code's footer comments
+            footer = mm.rfind(b"\n; filament used [mm]", offsets[-1] if offsets else 0)
+            if footer != -1:
+                end = footer + 1
+
+            # The firmware shows the first progress report inside a layer while printing it
+            percent = 0
+            for start, stop in zip(offsets, offsets[1:] + [end]):
+                mark = mm.find(PROGRESS_MARKER, start, stop)
+                if mark != -1:
+                    percent = int(_read_number(mm, mark + len(PROGRESS_MARKER)) or percent)
+                progress.append(percent)
+
+    metadata = read_metadata(gcode_path) if size else {}
+    if z_values:
+        metadata["max_z"] = max(z_values)
+        metadata.setdefault("layers", str(len(z_values)))
+    return {"z": z_values, "offsets": offsets, "progress": progress, "end": end, "metadata": metadata}
+
+
+def index_path_for(gcode_path: str) -> str:
+    return gcode_path + INDEX_SUFFIX
+
+
+def load_index(gcode_path: str, index_path: Optional[str] = None) -> dict:
+    """
+    Returns the layer index of a G-code file, building and caching it next to the file if the
+    cached one is missing or belongs to different content.
+
+    Args:
+        gcode_path: Plain G-code file to index.
+        index_path: Where the index is cached. Defaults to next to gcode_path; pass the models
+            directory path when gcode_path is a decompressed copy in the artifact cache.
+    """
+    index_path = index_path or index_path_for(gcode_path)
+    current = fingerprint(gcode_path)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == INDEX_VERSION and index.get("fingerprint") == current:
+            return index
+    except (OSError, ValueError):
+        pass
+
+    index = {"version": INDEX_VERSION, "fingerprint": current, **scan(gcode_path)}
+    temp_path = index_path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(temp_path, index_path)
+    except OSError as e:
+        logger.warning(f"Could not cache G-code index for {gcode_path}: {e}")
+    return index
+
+
+def layer_count(index: dict) -> int:
+    return len(index["offsets"])
+
+
+def layer_span(index: dict, layer: int) -> tuple[int, int]:
+    """Byte range [start, end) of a layer (0 based)."""
+    if not 0 <= layer < layer_count(index):
+        raise IndexError(f"Layer {layer} out of range, the file has {layer_count(index)} layers")
+    offsets = index["offsets"]
+    end = offsets[layer + 1] if layer + 1 < len(offsets) else index["end"]
+    return offsets[layer], end
+
+
+def read_layer(gcode_path: str, index: dict, layer: int) -> bytes:
+    """G-code of a single layer: one seek and one read, whatever the file size."""
+    start, end = layer_span(index, layer)
+    with open(gcode_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def layer_at_progress(index: dict, percent: float) -> Optional[int]:
+    """The layer being printed when the firmware reports `percent` progress, None without layers."""
+    if not index["offsets"]:
+        return None
+    return max(bisect.bisect_right(index["progress"], percent) - 1, 0)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import logging
+from contextlib import closing
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INCIDENTS_DIR = os.getenv("INCIDENTS_DIR", os.path.join(os.path.dirname(__file__), "assets", "incidents"))
+DB_NAME = "incidents.db"
+FRAMES_DIR_NAME = "frames"
+# Resource URI of a stored frame; tools and UIs pass this around instead of the image itself
+FRAME_URI_PREFIX = "incident://frames/"
+
+# Incidents kept, oldest deleted first beyond it; 0 disables
+MAX_INCIDENTS = int(os.getenv("INCIDENT_MAX_COUNT", "500"))
+# Incidents older than this are deleted; 0 disables
+MAX_AGE_SECONDS = float(os.getenv("INCIDENT_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+FRAME_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id TEXT PRIMARY KEY,
+    mime_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    status TEXT,
+    recommendation TEXT,
+    source TEXT,
+    frame_id TEXT REFERENCES frames (id),
+    analysis TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS incidents_created ON incidents (created_at);
+CREATE INDEX IF NOT EXISTS incidents_status_created ON incidents (status, created_at);
+CREATE INDEX IF NOT EXISTS incidents_frame ON incidents (frame_id);
+"""
+
+
+def frame_uri(frame_id: Optional[str]) -> Optional[str]:
+    return FRAME_URI_PREFIX + frame_id if frame_id else None
+
+
+def _row(row: sqlite3.Row) -> dict:
+    item = dict(row)
+    item["analysis"] = json.loads(item["analysis"])
+    item["frame_uri"] = frame_uri(item["frame_id"])
+    return item
+
+
+class IncidentStore:
+    """
+    Print check results and the camera frames they were made from, kept for later review.
+
+    Frames are stored once, as files named by their content hash, and referred to by that id;
+    incident rows in SQLite carry the analysis and the frame id. Retention limits on count and
+    age are enforced on every record, deleting frames no incident refers to any more.
+    All methods block; call them from a worker thread.
+    """
+
+    def __init__(self, directory: str = INCIDENTS_DIR, max_incidents: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None):
+        self.directory = directory
+        self.db_path = os.path.join(directory, DB_NAME)
+        self.frames_dir = os.path.join(directory, FRAMES_DIR_NAME)
+        self.max_incidents = MAX_INCIDENTS if max_incidents is None else max_incidents
+        self.max_age_seconds = MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self._created = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._created:
+            os.makedirs(self.frames_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        if not self._created:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._created = True
+        return conn
+
+    def _frame_path(self, frame_id: str, mime_type: str) -> str:
+        return os.path.join(self.frames_dir, frame_id + FRAME_EXTENSIONS.get(mime_type, ".bin"))
+
+    def _save_frame(self, conn: sqlite3.Connection, data: bytes, mime_type: str) -> str:
+        """Stores an image unless an identical one is already stored. Returns its id."""
+        frame_id = hashlib.sha256(data).hexdigest()[:32]
+        if conn.execute("SELECT 1 FROM frames WHERE id = ?", (frame_id,)).fetchone() is None:
+            path = self._frame_path(frame_id, mime_type)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            conn.execute("INSERT INTO frames (id, mime_type, size, created_at) VALUES (?, ?, ?, ?)",
+                         (frame_id, mime_type, len(data), time.time()))
+        return frame_id
+
+    def read_frame(self, frame_id: str) -> Optional[tuple[bytes, str]]:
+        """The bytes and MIME type of a stored frame, None if there is no such frame."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT mime_type FROM frames WHERE id = ?", (frame_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._frame_path(frame_id, row["mime_type"]), "rb") as f:
+                return f.read(), row["mime_type"]
+        except FileNotFoundError:
+            return None
+
+    def record(self, analysis: dict, frame: Optional[bytes] = None, mime_type: str = "image/jpeg",
+               source: Optional[str] = None) -> dict:
+        """
+        Stores a check result with its frame and returns it as a row, then applies the retention limits.
+
+        Args:
+            analysis: The analysis (status, issues, recommendation), stored as given.
+            frame: The image it was made from. Identical frames are stored once.
+            mime_type: MIME type of frame.
+            source: What produced it, e.g. the name of the check tool.
+        """
+        with closing(self._connect()) as conn, conn:
+            # One transaction, so a concurrent prune never sees the frame without its incident
+            frame_id = self._save_frame(conn, frame, mime_type) if frame else None
+            cursor = conn.execute(
+                "INSERT INTO incidents (created_at, status, recommendation, source, frame_id, analysis) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), analysis.get("status"), analysis.get("recommendation"), source, frame_id,
+                 json.dumps(analysis)))
+            incident_id = cursor.lastrowid
+        self.prune()
+        return self.get(incident_id)
+
+    def get(self, incident_id: int) -> Optional[dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM incidents WHERE id = ?", (incident_id,)).fetchone()
+        return _row(row) if row is not None else None
+
+    def latest(self, exclude_status: Optional[str] = "ok") -> Optional[dict]:
+        """The most recent incident, skipping those with exclude_status (by default, checks that found nothing)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM incidents WHERE status IS NOT ? ORDER BY id DESC LIMIT 1", (exclude_status,)
+            ).fetchone()
+        return _row(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, since: Optional[float] = None, limit: int = 20,
+             offset: int = 0) -> dict:
+        """
+        Incidents, newest first.
+
+        Returns:
+            {"total": matching incidents, "offset": offset, "items": rows}
+        """
+        where, params = [], []
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        clause = " WHERE " + " AND ".join(where) if where else ""
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM incidents{clause}", params).fetchone()[0]
+            rows = conn.execute(f"SELECT * FROM incidents{clause} ORDER BY id DESC LIMIT ? OFFSET ?",
+                                params + [limit, offset]).fetchall()
+        return {"total": total, "offset": offset, "items": [_row(row) for row in rows]}
+
+    def prune(self) -> dict:
+        """
+        Deletes incidents beyond the count and age limits, then frames no incident refers to.
+
+        Returns:
+            {"incidents": incidents deleted, "frames": frame ids deleted}
+        """
+        with closing(self._connect()) as conn, conn:
+            deleted = 0
+            if self.max_age_seconds > 0:
+                deleted += conn.execute("DELETE FROM incidents WHERE created_at < ?",
+                                        (time.time() - self.max_age_seconds,)).rowcount
+            if self.max_incidents > 0:
+                deleted += conn.execute(
+                    "DELETE FROM incidents WHERE id NOT IN (SELECT id FROM incidents ORDER BY id DESC LIMIT ?)",
+                    (self.max_incidents,)).rowcount
+            orphans = conn.execute(
+                "SELECT id, mime_type FROM frames WHERE id NOT IN "
+                "(SELECT frame_id FROM incidents WHERE frame_id IS NOT NULL)").fetchall()
+            for orphan in orphans:
+                try:
+                    os.remove(self._frame_path(orphan["id"], orphan["mime_type"]))
+                except FileNotFoundError:
+                    pass
+            conn.executemany("DELETE FROM frames WHERE id = ?", [(orphan["id"],) for orphan in orphans])
+        if deleted or orphans:
+            logger.info(f"Pruned {deleted} incidents and {len(orphans)} frames")
+        return {"incidents": deleted, "frames": [orphan["id"] for orphan in orphans]}
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn:
+            incidents = conn.execute("SELECT COUNT(*), MIN(created_at) FROM incidents").fetchone()
+            frames = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM frames").fetchone()
+        return {"incidents": incidents[0], "oldest": incidents[1], "frames": frames[0], "frame_bytes": frames[1]}
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import time
+import uuid
+import logging
+import weakref
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# PrusaSlicer runs several threads per slice, a quarter of the cores in parallel runs saturates the box
+SLICE_WORKERS = int(os.getenv("SLICE_WORKERS", "0")) or max(1, (os.cpu_count() or 1) // 4)
+# Jobs waiting for a worker before new submissions are refused
+SLICE_QUEUE_SIZE = int(os.getenv("SLICE_QUEUE_SIZE", "50"))
+# Finished jobs kept for status polling, and finished runs kept for the timing statistics
+MAX_FINISHED_JOBS = 200
+STATS_WINDOW = 1000
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting."""
+
+
+class JobFailed(Exception):
+    """Raised by work to fail its job with a message for the user; logged without a traceback."""
+
+
+class StageTimer:
+    """
+    Wall time spent in each named stage of a piece of work. A stage lasts until the next one
+    starts or finish is called; a stage entered twice adds up. on_stage is called with the name
+    of every stage as it starts.
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[str], None]] = None):
+        self.durations: dict[str, float] = {}
+        self.current: Optional[str] = None
+        self._started = 0.0
+        self._on_stage = on_stage
+
+    def start(self, stage: str):
+        self.finish()
+        self.current = stage
+        self._started = time.perf_counter()
+        if self._on_stage:
+            self._on_stage(stage)
+
+    def finish(self):
+        if self.current is not None:
+            self.durations[self.current] = self.durations.get(self.current, 0.0) + time.perf_counter() - self._started
+            self.current = None
+
+    def breakdown(self) -> dict:
+        """Seconds per stage in the order the stages first started, including the running one."""
+        durations = dict(self.durations)
+        if self.current is not None:
+            durations[self.current] = durations.get(self.current, 0.0) + time.perf_counter() - self._started
+        return {stage: round(seconds, 3) for stage, seconds in durations.items()}
+
+
+@dataclass
+class Job:
+    """One queued unit of work and its progress. Times are Unix timestamps."""
+    id: str
+    name: str
+    status: str = "queued"  # queued, running, done, failed, cancelled
+    stage: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    stages: StageTimer = field(default_factory=StageTimer, repr=False)
+
+    def set_stage(self, stage: str):
+        """Called by the running work to report what it is doing."""
+        self.stage = stage
+        self.stages.start(stage)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def wait_time(self) -> float:
+        end = self.started_at or self.finished_at or time.time()
+        return end - self.submitted_at
+
+    @property
+    def run_time(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> dict:
+        run_time = self.run_time
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "stage": self.stage,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_time": round(self.wait_time, 3),
+            "run_time": round(run_time, 3) if run_time is not None else None,
+            "stage_times": self.stages.breakdown(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def _summary(values) -> dict:
+    """Count, mean, median, 95th percentile and maximum of durations in seconds."""
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    def percentile(p):
+        return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)], 3)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": round(ordered[-1], 3),
+    }
+
+
+class JobQueue:
+    """
+    Runs submitted coroutines in the background, at most `workers` at once.
+
+    submit returns immediately with a Job whose id can be polled; jobs beyond the worker
+    limit wait in FIFO order. Cancelling a job cancels its coroutine, which kills any
+    external process it started (see ProcessRunner).
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_queued: Optional[int] = None):
+        self.workers = workers or SLICE_WORKERS
+        self.max_queued = SLICE_QUEUE_SIZE if max_queued is None else max_queued
+        self.jobs: dict[str, Job] = {}
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._wait_times = deque(maxlen=STATS_WINDOW)
+        self._run_times = deque(maxlen=STATS_WINDOW)
+        self._counts = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self._max_queued_seen = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to a single event loop, tests create a new loop per test
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.workers)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    def queued(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "queued")
+
+    def running(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == "running")
+
+    def submit(self, name: str, work: Callable[[Job], Awaitable[Any]]) -> Job:
+        """
+        Queues work(job) and returns its Job without waiting. Must be called from the event loop.
+
+        Raises:
+            QueueFull: max_queued jobs are already waiting for a worker.
+        """
+        queued = self.queued()
+        if queued >= self.max_queued:
+            self._counts["rejected"] += 1
+            raise QueueFull(f"Slicing queue is full ({queued} jobs waiting), try again later.")
+
+        job = Job(id=uuid.uuid4().hex[:12], name=name)
+        self.jobs[job.id] = job
+        self._counts["submitted"] += 1
+        self._max_queued_seen = max(self._max_queued_seen, queued + 1)
+        job.task = asyncio.create_task(self._run(job, work))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, work: Callable[[Job], Awaitable[Any]]) -> Any:
+        try:
+            async with self._semaphore():
+                job.started_at = time.time()
+                job.status = "running"
+                job.set_stage("running")
+                self._wait_times.append(job.wait_time)
+                job.result = await work(job)
+                job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except JobFailed as e:
+            logger.info(f"Job {job.id} ({job.name}) failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.name}) failed")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.stages.finish()
+            job.stage = job.status
+            self._counts[job.status] += 1
+            if job.started_at is not None:
+                self._run_times.append(job.run_time)
+            logger.info(f"Job {job.id} ({job.name}) {job.status}: waited {job.wait_time:.1f}s, "
+                        f"ran {job.run_time or 0:.1f}s")
+        return job.result
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a queued or running job. Returns False if it does not exist or already finished."""
+        job = self.jobs.get(job_id)
+        if job is None or job.done or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    def stats(self) -> dict:
+        """Current queue depth and the wait and run times of recent jobs, for capacity planning."""
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "queued": self.queued(),
+            "running": self.running(),
+            "max_queued_seen": self._max_queued_seen,
+            **self._counts,
+            "wait_time": _summary(self._wait_times),
+            "run_time": _summary(self._run_times),
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import logging
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds between lag samples; each sample is a sleep that should wake up on time
+SAMPLE_INTERVAL = float(os.getenv("LOOP_SAMPLE_INTERVAL", "0.5"))
+# Lag beyond this counts as the loop being blocked
+BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000
+# Log the stack of whatever blocks the loop beyond the threshold, caught in the act by a watchdog thread
+BLOCK_DEBUG = os.getenv("LOOP_BLOCK_DEBUG", "false").lower() == "true"
+# Recent lag samples kept for the statistics
+STATS_WINDOW = 600
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag: how late a sleep of interval seconds wakes up, which is how long
+    callbacks kept the loop from running anything else.
+
+    With debug, a watchdog thread checks that the sampler keeps waking up; when it misses its
+    wake-up by more than block_threshold, the watchdog logs the loop thread's stack, so the
+    warning names the blocking call rather than the callback that happened to run after it.
+    """
+
+    def __init__(self, interval: Optional[float] = None, block_threshold: Optional[float] = None,
+                 debug: Optional[bool] = None):
+        self.interval = SAMPLE_INTERVAL if interval is None else interval
+        self.block_threshold = BLOCK_THRESHOLD if block_threshold is None else block_threshold
+        self.debug = BLOCK_DEBUG if debug is None else debug
+        self.samples = 0
+        self.blocked = 0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stacks_logged = 0
+        self._lags = deque(maxlen=STATS_WINDOW)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._beat = 0.0
+        self._reported_beat = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Starts sampling on the running loop, and the watchdog thread in debug mode."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        if self.debug:
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        logger.info(f"Loop monitor sampling every {self.interval}s, blocking threshold {self.block_threshold * 1000:.0f} ms"
+                    + (", logging blocking stacks" if self.debug else ""))
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            self.record(max(0.0, loop.time() - expected))
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._lags.append(lag)
+        if lag > self.block_threshold:
+            self.blocked += 1
+
+    def _watch(self):
+        poll = max(0.01, self.block_threshold / 2)
+        while not self._stopped.wait(poll):
+            beat = self._beat
+            late = time.monotonic() - beat - self.interval
+            if late <= self.block_threshold or beat == self._reported_beat:
+                continue
+            # One stack per stall, taken while the loop is still stuck in it
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self.stacks_logged += 1
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for over {late * 1000:.0f} ms, loop thread stack:\n{stack}")
+
+    def stats(self) -> dict:
+        """Lag of recent samples in milliseconds, and how many exceeded the blocking threshold."""
+        lags = sorted(self._lags)
+        stats = {
+            "running": self.running,
+            "interval_s": self.interval,
+            "block_threshold_ms": round(self.block_threshold * 1000, 3),
+            "samples": self.samples,
+            "blocked": self.blocked,
+            "debug": self.debug,
+            "stacks_logged": self.stacks_logged,
+        }
+        if lags:
+            stats["lag_ms"] = {
+                "last": round(self.last_lag * 1000, 3),
+                "mean": round(sum(lags) / len(lags) * 1000, 3),
+                "p99": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 3),
+                "max": round(self.max_lag * 1000, 3),
+            }
+        return stats
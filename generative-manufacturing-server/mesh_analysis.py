@@ -0,0 +1,357 @@
+import gzip
+import io
+import mmap
+import os
+import re
+import zipfile
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Binary STL record: normal, three vertices, attribute byte count (50 bytes, little endian)
+STL_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attributes", "<u2"),
+])
+STL_HEADER_SIZE = 84
+
+# Printable volume in mm (X, Y, Z). Defaults to the Prusa MK4 bed.
+BED_SIZE = tuple(float(v) for v in os.getenv("BED_SIZE", "250,210,220").split(","))
+
+# Anything smaller than this in every direction is almost certainly a unit mistake (m vs mm)
+MIN_FEATURE_SIZE = 1.0
+
+_ASCII_VERTEX = re.compile(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+
+def _binary_count(header: bytes, size: int) -> Optional[int]:
+    """Triangle count of a binary STL, or None if the size does not match (ASCII)."""
+    if size < STL_HEADER_SIZE:
+        return None
+    count = int.from_bytes(header[80:84], "little")
+    # ASCII files can start with "solid" and still be binary, so trust the size check only
+    if size != STL_HEADER_SIZE + count * STL_DTYPE.itemsize:
+        return None
+    return count
+
+
+def _read_binary_records(path: str) -> Optional[np.ndarray]:
+    """Maps a binary STL into a structured array without copying. None if the file is not binary STL."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        count = _binary_count(f.read(STL_HEADER_SIZE), size)
+        if count is None:
+            return None
+        if count == 0:
+            return np.empty(0, dtype=STL_DTYPE)
+        # The array keeps the mapping alive after the file is closed
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mapped, dtype=STL_DTYPE, count=count, offset=STL_HEADER_SIZE)
+
+
+def _parse_ascii(data: bytes, name: str) -> np.ndarray:
+    vertices = _ASCII_VERTEX.findall(data)
+    if len(vertices) % 3:
+        raise ValueError(f"Malformed ASCII STL, {len(vertices)} vertices is not a multiple of 3: {name}")
+    if not vertices:
+        return np.empty((0, 3, 3), dtype=np.float32)
+    return np.array(vertices, dtype="S").astype(np.float32).reshape(-1, 3, 3)
+
+
+def parse_stl_bytes(data: bytes, name: str = "<buffer>") -> np.ndarray:
+    """Parses an in-memory ASCII or binary STL into an (N, 3, 3) float32 array."""
+    count = _binary_count(data[:STL_HEADER_SIZE], len(data))
+    if count is not None:
+        return np.frombuffer(data, dtype=STL_DTYPE, count=count, offset=STL_HEADER_SIZE)["vertices"]
+    return _parse_ascii(data, name)
+
+
+def load_stl(path: str) -> np.ndarray:
+    """
+    Loads an ASCII or binary STL as an (N, 3, 3) float32 array of triangle vertices.
+
+    Binary files are memory mapped; the returned array is a strided view into the mapping.
+    Gzip compressed artifacts (.stl.gz) are decompressed in memory.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return parse_stl_bytes(f.read(), path)
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"STL not found: {path}")
+
+    records = _read_binary_records(path)
+    if records is not None:
+        return records["vertices"]
+    with open(path, "rb") as f:
+        return _parse_ascii(f.read(), path)
+
+
+def is_binary_stl(path: str) -> bool:
+    with open(path, "rb") as f:
+        return _binary_count(f.read(STL_HEADER_SIZE), os.path.getsize(path)) is not None
+
+
+def face_normals(triangles: np.ndarray) -> np.ndarray:
+    """Unit normals of an (N, 3, 3) triangle array, zero for degenerate faces."""
+    tris = np.asarray(triangles, dtype=np.float32)
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+
+
+def write_binary_stl(path: str, triangles: np.ndarray, header: bytes = b"binary STL"):
+    """Writes triangles as binary STL in one buffer, via a temporary file so readers never see half a mesh."""
+    records = np.zeros(len(triangles), dtype=STL_DTYPE)
+    records["vertices"] = triangles
+    records["normal"] = face_normals(triangles)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header[:80].ljust(80, b"\0"))
+        f.write(np.uint32(len(records)).tobytes())
+        f.write(records.tobytes())
+    os.replace(temp_path, path)
+
+
+def ensure_binary_stl(path: str) -> bool:
+    """Rewrites an ASCII STL as binary in place. Returns True if the file was converted."""
+    if is_binary_stl(path):
+        return False
+    triangles = load_stl(path)
+    write_binary_stl(path, triangles)
+    return True
+
+
+def write_3mf(path: str, triangles: np.ndarray):
+    """Writes triangles as a single-object 3MF package with welded, indexed vertices."""
+    vertices, faces = weld_vertices(triangles)
+
+    vertex_xml = io.StringIO()
+    np.savetxt(vertex_xml, vertices, fmt='<vertex x="%.6g" y="%.6g" z="%.6g"/>', newline="")
+    triangle_xml = io.StringIO()
+    np.savetxt(triangle_xml, faces, fmt='<triangle v1="%d" v2="%d" v3="%d"/>', newline="")
+
+    model = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<model unit="millimeter" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">'
+        '<resources><object id="1" type="model"><mesh>'
+        f"<vertices>{vertex_xml.getvalue()}</vertices>"
+        f"<triangles>{triangle_xml.getvalue()}</triangles>"
+        '</mesh></object></resources><build><item objectid="1"/></build></model>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+        "</Relationships>"
+    )
+
+    temp_path = path + ".tmp"
+    with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", content_types)
+        package.writestr("_rels/.rels", rels)
+        package.writestr("3D/3dmodel.model", model)
+    os.replace(temp_path, path)
+
+
+def weld_vertices(triangles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merges bit-identical vertices.
+
+    Returns:
+        (vertices, faces): unique (V, 3) float32 vertices and (N, 3) int64 indices into them.
+    """
+    # Adding 0.0 turns -0.0 into 0.0, so both compare equal as raw bits
+    flat = np.ascontiguousarray(triangles, dtype=np.float32).reshape(-1, 3) + np.float32(0.0)
+    if len(flat) == 0:
+        return flat, np.empty((0, 3), dtype=np.int64)
+
+    bits = flat.view(np.uint32)
+    xy = (bits[:, 0].astype(np.uint64) << np.uint64(32)) | bits[:, 1]
+    z = bits[:, 2].astype(np.uint64)
+
+    # Sort one uint64 per vertex: a hash of the coordinates in the high bits and the row in the
+    # low bits. A plain sort of that is far faster than argsort/lexsort over the 96 bit rows,
+    # and copies of a vertex still end up next to each other.
+    n = len(flat)
+    index_bits = max(1, (n - 1).bit_length())
+    index_mask = np.uint64((1 << index_bits) - 1)
+    hashed = xy * np.uint64(0x9E3779B97F4A7C15) ^ z * np.uint64(0xC2B2AE3D27D4EB4F)
+    hashed ^= hashed >> np.uint64(31)
+    keys = (hashed & ~index_mask) | np.arange(n, dtype=np.uint64)
+    keys.sort()
+    order = (keys & index_mask).astype(np.intp)
+
+    xy_sorted = xy[order]
+    z_sorted = z[order]
+    same_vertex = (xy_sorted[1:] == xy_sorted[:-1]) & (z_sorted[1:] == z_sorted[:-1])
+    same_hash = (keys[1:] >> np.uint64(index_bits)) == (keys[:-1] >> np.uint64(index_bits))
+    if np.any(same_hash & ~same_vertex):
+        # Two distinct vertices share a hash, use the exact (slower) ordering
+        order = np.lexsort((z, xy))
+        xy_sorted = xy[order]
+        z_sorted = z[order]
+        same_vertex = (xy_sorted[1:] == xy_sorted[:-1]) & (z_sorted[1:] == z_sorted[:-1])
+
+    first = np.empty(n, dtype=bool)
+    first[0] = True
+    first[1:] = ~same_vertex
+
+    inverse = np.empty(len(order), dtype=np.int64)
+    inverse[order] = np.cumsum(first) - 1
+    return flat[order[first]], inverse.reshape(-1, 3)
+
+
+def edge_report(faces: np.ndarray, vertex_count: int) -> dict:
+    """Counts open, non-manifold and inconsistently wound edges of an indexed mesh."""
+    if len(faces) == 0:
+        return {"edges": 0, "boundary_edges": 0, "non_manifold_edges": 0, "inconsistent_edges": 0}
+
+    start = faces
+    end = np.roll(faces, -1, axis=1)
+    lo = np.minimum(start, end).ravel()
+    hi = np.maximum(start, end).ravel()
+    forward = (start < end).ravel()
+
+    # One sort of (undirected edge, direction) keys gives both the face count per edge
+    # and how often it is traversed forward; neighbours must traverse it in opposite directions
+    keys = (lo * vertex_count + hi) * 2 + forward
+    keys.sort()
+    undirected = keys >> 1
+
+    group_start = np.empty(len(keys), dtype=bool)
+    group_start[0] = True
+    group_start[1:] = undirected[1:] != undirected[:-1]
+    starts = np.flatnonzero(group_start)
+    counts = np.diff(np.append(starts, len(keys)))
+    forward_counts = np.add.reduceat(keys & 1, starts)
+
+    return {
+        "edges": int(len(counts)),
+        "boundary_edges": int(np.count_nonzero(counts == 1)),
+        "non_manifold_edges": int(np.count_nonzero(counts > 2)),
+        "inconsistent_edges": int(np.count_nonzero((counts == 2) & (forward_counts != 1))),
+    }
+
+
+def fits_bed(size: np.ndarray, bed: tuple = None) -> bool:
+    """True if a bounding box fits the build volume, allowing a 90 degree turn on the bed."""
+    bed = bed or BED_SIZE
+    footprint = sorted(float(v) for v in size[:2])
+    bed_footprint = sorted(bed[:2])
+    return footprint[0] <= bed_footprint[0] and footprint[1] <= bed_footprint[1] and float(size[2]) <= bed[2]
+
+
+def analyze_mesh(triangles: np.ndarray, bed: tuple = None) -> dict:
+    """
+    Computes geometry and topology statistics of a triangle soup.
+
+    Lengths are in model units (mm for OpenSCAD output), area in mm^2 and volume in mm^3.
+    """
+    triangle_count = int(len(triangles))
+    if triangle_count == 0:
+        return {"triangles": 0, "vertices": 0, "volume": 0.0, "surface_area": 0.0,
+                "bbox_min": None, "bbox_max": None, "size": None, "fits_bed": False,
+                "degenerate_triangles": 0, "watertight": False, "manifold": False,
+                "edges": 0, "boundary_edges": 0, "non_manifold_edges": 0, "inconsistent_edges": 0}
+
+    tris = np.ascontiguousarray(triangles, dtype=np.float32)
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    e1 = b - a
+    e2 = c - a
+    # Component-wise cross product, np.cross is much slower on large arrays
+    cross = np.empty_like(e1)
+    cross[:, 0] = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+    cross[:, 1] = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+    cross[:, 2] = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+    areas = 0.5 * np.sqrt(np.einsum("ij,ij->i", cross, cross))
+    # Sum of signed tetrahedra against the origin, accumulated in float64 to stay stable
+    volume = float(np.einsum("ij,ij->", a, cross, dtype=np.float64)) / 6.0
+
+    vertices, faces = weld_vertices(tris)
+    edges = edge_report(faces, len(vertices))
+
+    # Welded vertices span the same box with a fraction of the points
+    bbox_min = vertices.min(axis=0)
+    bbox_max = vertices.max(axis=0)
+    size = bbox_max - bbox_min
+
+    return {
+        "triangles": triangle_count,
+        "vertices": int(len(vertices)),
+        "volume": round(volume, 3),
+        "surface_area": round(float(areas.sum(dtype=np.float64)), 3),
+        "bbox_min": [round(float(v), 3) for v in bbox_min],
+        "bbox_max": [round(float(v), 3) for v in bbox_max],
+        "size": [round(float(v), 3) for v in size],
+        "fits_bed": fits_bed(size, bed),
+        "degenerate_triangles": int(np.count_nonzero(areas < 1e-9)),
+        "watertight": edges["boundary_edges"] == 0 and edges["non_manifold_edges"] == 0,
+        "manifold": edges["non_manifold_edges"] == 0,
+        **edges,
+    }
+
+
+def validate_mesh(path: str, bed: tuple = None) -> dict:
+    """
+    Fast pre-slice gate for an STL file.
+
+    Errors make slicing or printing pointless (no geometry, holes, inside-out or
+    off-bed models); warnings are worth surfacing but slicers usually cope.
+
+    Returns:
+        Dictionary with ok, errors, warnings and the analyze_mesh stats.
+    """
+    bed = bed or BED_SIZE
+    try:
+        stats = analyze_mesh(load_stl(path), bed)
+    except (OSError, ValueError) as e:
+        return {"ok": False, "errors": [f"Could not read mesh: {e}"], "warnings": [], "stats": None}
+
+    errors = []
+    warnings = []
+    if stats["triangles"] == 0:
+        errors.append("Mesh has no triangles.")
+    else:
+        if stats["boundary_edges"]:
+            errors.append(f"Mesh is not watertight: {stats['boundary_edges']} open edges.")
+        if stats["volume"] <= 0:
+            errors.append(f"Mesh encloses no positive volume ({stats['volume']} mm^3), normals may be inverted.")
+        if not stats["fits_bed"]:
+            dims = " x ".join(f"{v:g}" for v in stats["size"])
+            bed_dims = " x ".join(f"{v:g}" for v in bed)
+            errors.append(f"Model ({dims} mm) does not fit the build volume ({bed_dims} mm).")
+        if stats["non_manifold_edges"]:
+            warnings.append(f"{stats['non_manifold_edges']} non-manifold edges (more than two faces share an edge).")
+        if stats["inconsistent_edges"]:
+            warnings.append(f"{stats['inconsistent_edges']} edges with inconsistent face winding.")
+        if stats["degenerate_triangles"]:
+            warnings.append(f"{stats['degenerate_triangles']} degenerate (zero area) triangles.")
+        if max(stats["size"]) < MIN_FEATURE_SIZE:
+            warnings.append(f"Model is smaller than {MIN_FEATURE_SIZE} mm, check the units.")
+
+    return {"ok": not errors, "errors": errors, "warnings": warnings, "stats": stats}
+
+
+def format_report(report: dict) -> str:
+    """One line summary of a validate_mesh report for tool output."""
+    stats = report["stats"]
+    parts = []
+    if stats and stats["triangles"]:
+        dims = " x ".join(f"{v:g}" for v in stats["size"])
+        parts.append(f"{dims} mm, {stats['triangles']} triangles, {stats['volume'] / 1000:.2f} cm^3")
+    parts.extend(report["errors"])
+    parts.extend(report["warnings"])
+    return "; ".join(parts)
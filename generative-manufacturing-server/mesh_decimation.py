@@ -0,0 +1,223 @@
+import os
+import logging
+from typing import Optional
+
+import numpy as np
+
+import mesh_analysis
+
+logger = logging.getLogger(__name__)
+
+# Meshes below this size slice quickly anyway, simplifying them only risks detail
+MIN_TRIANGLES = int(os.getenv("DECIMATE_MIN_TRIANGLES", "100000"))
+
+# Allowed deviation as a fraction of the layer height; the printer cannot resolve much less
+TOLERANCE_FACTOR = float(os.getenv("DECIMATE_TOLERANCE_FACTOR", "0.5"))
+
+# Clustering starts with cells this many times the tolerance, curved and thin parts need finer cells
+START_CELL_FACTOR = 16
+# Each retry halves the cell size when the result deviates too far or breaks the mesh
+MAX_ATTEMPTS = 6
+
+
+def _face_planes(vertices: np.ndarray, faces: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Unit normals, plane offsets and areas of indexed faces, in float64."""
+    tris = vertices[faces].astype(np.float64)
+    cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(cross, axis=1)
+    normals = np.divide(cross, lengths[:, None], out=np.zeros_like(cross), where=lengths[:, None] > 0)
+    offsets = -np.einsum("ij,ij->i", normals, tris[:, 0])
+    return normals, offsets, 0.5 * lengths
+
+
+def _cluster_positions(vertices: np.ndarray, faces: np.ndarray, cluster: np.ndarray, count: int,
+                       normals: np.ndarray, offsets: np.ndarray, areas: np.ndarray) -> np.ndarray:
+    """
+    Places one vertex per cluster where it best fits the planes of the faces around it.
+
+    Every face adds its area weighted plane quadric to the clusters of its corners. Minimising
+    the summed quadric keeps corners on corners and edges on edges, where a plain average would
+    round them off. Directions the planes do not constrain (flat areas) fall back to the mean.
+    """
+    vertices = vertices.astype(np.float64)
+    sizes = np.bincount(cluster, minlength=count).astype(np.float64)
+    mean = np.stack([np.bincount(cluster, weights=vertices[:, i], minlength=count) for i in range(3)], axis=1)
+    mean /= sizes[:, None]
+
+    corner_clusters = cluster[faces].ravel()
+    weights = np.repeat(areas, 3)
+    face_normals = np.repeat(normals, 3, axis=0)
+    face_offsets = np.repeat(offsets, 3)
+
+    quadric = np.empty((count, 3, 3))
+    for i in range(3):
+        for j in range(i, 3):
+            quadric[:, i, j] = quadric[:, j, i] = np.bincount(
+                corner_clusters, weights=weights * face_normals[:, i] * face_normals[:, j], minlength=count)
+    linear = np.stack([np.bincount(corner_clusters, weights=weights * face_normals[:, i] * face_offsets, minlength=count)
+                       for i in range(3)], axis=1)
+
+    # Solve around the mean; the small ridge keeps unconstrained directions at the mean
+    trace = np.trace(quadric, axis1=1, axis2=2)
+    ridge = (1e-3 * trace / 3 + 1e-12)[:, None, None] * np.eye(3)
+    rhs = -(linear + np.einsum("kij,kj->ki", quadric, mean))
+    positions = mean + np.linalg.solve(quadric + ridge, rhs[:, :, None])[:, :, 0]
+
+    # Never leave the box spanned by the cluster's own vertices
+    low = np.full((count, 3), np.inf)
+    high = np.full((count, 3), -np.inf)
+    np.minimum.at(low, cluster, vertices)
+    np.maximum.at(high, cluster, vertices)
+    return np.clip(positions, low, high)
+
+
+def _clean_faces(faces: np.ndarray) -> np.ndarray:
+    """
+    Drops faces that collapsed to a line or point and resolves faces that clustering merged
+    onto the same three vertices: opposite windings cancel out (a wall thinner than one cell
+    folds flat), whatever winding is left over keeps a single face.
+    """
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 2] != faces[:, 0])]
+    if len(faces) == 0:
+        return faces
+
+    # Rotate the smallest index first: same winding gives the same triple, opposite winding swaps the tail
+    rotated = np.take_along_axis(faces, (np.argmin(faces, axis=1)[:, None] + np.arange(3)) % 3, axis=1)
+    flipped = rotated[:, 1] > rotated[:, 2]
+    key = np.stack([rotated[:, 0], np.minimum(rotated[:, 1], rotated[:, 2]), np.maximum(rotated[:, 1], rotated[:, 2])], axis=1)
+
+    _, inverse = np.unique(key, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    balance = np.bincount(inverse, weights=np.where(flipped, -1, 1))
+
+    # Keep the first face of each group whose winding matches the group's surplus
+    keep = np.zeros(len(faces), dtype=bool)
+    wanted = np.sign(balance)[inverse] == np.where(flipped, -1, 1)
+    candidates = np.flatnonzero(wanted)
+    _, first = np.unique(inverse[candidates], return_index=True)
+    keep[candidates[first]] = True
+    return faces[keep]
+
+
+def _deviation(vertices: np.ndarray, positions: np.ndarray, cluster: np.ndarray, faces: np.ndarray,
+               normals: np.ndarray, offsets: np.ndarray, new_faces: np.ndarray) -> float:
+    """
+    Two sided estimate of how far the simplified surface strays from the original, in mm.
+
+    Measures each simplified vertex against the planes of the original faces it replaces a corner
+    of, and each original vertex against the closest plane of the simplified faces around the vertex
+    that replaced it, which catches new faces cutting across a curved surface.
+    """
+    if len(faces) == 0 or len(new_faces) == 0:
+        return 0.0
+    moved = positions[cluster[faces]]
+    outward = np.abs(np.einsum("nkj,nj->nk", moved, normals) + offsets[:, None]).max()
+
+    new_normals, new_offsets, _ = _face_planes(positions, new_faces)
+    # Pair every simplified face with the original vertices of each of its corner clusters
+    by_cluster = np.argsort(cluster, kind="stable")
+    starts = np.searchsorted(cluster[by_cluster], np.arange(len(positions)))
+    sizes = np.bincount(cluster, minlength=len(positions))
+    corners = new_faces.ravel()
+    pair_faces = np.repeat(np.repeat(np.arange(len(new_faces)), 3), sizes[corners])
+    offsets_in_cluster = np.arange(len(pair_faces)) - np.repeat(np.cumsum(sizes[corners]) - sizes[corners], sizes[corners])
+    pair_vertices = by_cluster[np.repeat(starts[corners], sizes[corners]) + offsets_in_cluster]
+
+    distances = np.abs(np.einsum("ij,ij->i", vertices[pair_vertices].astype(np.float64), new_normals[pair_faces])
+                       + new_offsets[pair_faces])
+    closest = np.full(len(vertices), np.inf)
+    np.minimum.at(closest, pair_vertices, distances)
+    # Vertices whose cluster lost all its faces are covered by the outward measure
+    inward = closest[np.isfinite(closest)].max(initial=0.0)
+    return float(max(outward, inward))
+
+
+def decimate(triangles: np.ndarray, tolerance: float) -> tuple[np.ndarray, dict]:
+    """
+    Simplifies an over-tessellated mesh by vertex clustering with quadric vertex placement.
+
+    Vertices are grouped on a grid and each group is replaced by one vertex. The grid starts
+    coarse, since flat and gently curved areas lose almost nothing to large cells, and is refined
+    while the result deviates more than the tolerance or a watertight input stops being watertight.
+
+    Args:
+        triangles: (N, 3, 3) triangle soup.
+        tolerance: Maximum allowed deviation in model units (mm).
+
+    Returns:
+        (triangles, report): the simplified (or original) triangles and a dict with applied,
+        triangles_before, triangles_after, triangles_removed, max_deviation and cell_size.
+    """
+    before = int(len(triangles))
+    report = {"applied": False, "triangles_before": before, "triangles_after": before, "triangles_removed": 0,
+              "max_deviation": 0.0, "tolerance": tolerance, "cell_size": None}
+    if before == 0 or tolerance <= 0:
+        report["reason"] = "Nothing to simplify."
+        return triangles, report
+
+    vertices, faces = mesh_analysis.weld_vertices(triangles)
+    original_edges = mesh_analysis.edge_report(faces, len(vertices))
+    was_watertight = original_edges["boundary_edges"] == 0 and original_edges["non_manifold_edges"] == 0
+    normals, offsets, areas = _face_planes(vertices, faces)
+    origin = vertices.min(axis=0)
+
+    cell_size = tolerance * START_CELL_FACTOR
+    for _ in range(MAX_ATTEMPTS):
+        cells = np.floor((vertices - origin) / cell_size).astype(np.int64)
+        _, cluster = np.unique(cells, axis=0, return_inverse=True)
+        cluster = cluster.ravel()
+        count = int(cluster.max()) + 1
+
+        positions = _cluster_positions(vertices, faces, cluster, count, normals, offsets, areas)
+        new_faces = _clean_faces(cluster[faces])
+        deviation = _deviation(vertices, positions, cluster, faces, normals, offsets, new_faces)
+
+        edges = mesh_analysis.edge_report(new_faces, count)
+        keeps_topology = not was_watertight or (edges["boundary_edges"] == 0 and edges["non_manifold_edges"] == 0)
+        if len(new_faces) and deviation <= tolerance and keeps_topology:
+            report.update({
+                "applied": True,
+                "triangles_after": int(len(new_faces)),
+                "triangles_removed": before - int(len(new_faces)),
+                "max_deviation": round(deviation, 4),
+                "cell_size": round(cell_size, 4),
+            })
+            return positions[new_faces].astype(np.float32), report
+        cell_size /= 2
+
+    report["reason"] = f"No simplification within {tolerance} mm kept the mesh intact."
+    return triangles, report
+
+
+def decimate_file(input_path: str, output_path: str, tolerance: float, min_triangles: Optional[int] = None) -> dict:
+    """
+    Simplifies an STL and writes the result as binary STL to output_path.
+
+    Nothing is written if the mesh is below min_triangles or could not be simplified;
+    check the returned report's applied flag before using output_path.
+    """
+    min_triangles = MIN_TRIANGLES if min_triangles is None else min_triangles
+    try:
+        triangles = mesh_analysis.load_stl(input_path)
+    except (OSError, ValueError) as e:
+        return {"applied": False, "triangles_before": 0, "triangles_after": 0, "triangles_removed": 0,
+                "max_deviation": 0.0, "tolerance": tolerance, "cell_size": None, "reason": f"Could not read mesh: {e}"}
+    if len(triangles) < min_triangles:
+        return {"applied": False, "triangles_before": int(len(triangles)), "triangles_after": int(len(triangles)),
+                "triangles_removed": 0, "max_deviation": 0.0, "tolerance": tolerance, "cell_size": None,
+                "reason": f"Mesh has fewer than {min_triangles} triangles."}
+
+    simplified, report = decimate(triangles, tolerance)
+    if report["applied"]:
+        mesh_analysis.write_binary_stl(output_path, simplified)
+        logger.info(f"Simplified {os.path.basename(input_path)}: {report}")
+    return report
+
+
+def format_report(report: dict) -> str:
+    """One line summary of a decimation report for tool output."""
+    if not report["applied"]:
+        return f"Mesh not simplified: {report.get('reason', 'no change')}"
+    removed = 100.0 * report["triangles_removed"] / report["triangles_before"]
+    return (f"Simplified mesh for slicing: {report['triangles_before']} -> {report['triangles_after']} triangles "
+            f"({removed:.0f}% removed, max deviation {report['max_deviation']:.3f} mm).")
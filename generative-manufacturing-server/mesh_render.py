@@ -0,0 +1,210 @@
+import os
+import math
+import struct
+import zlib
+import logging
+
+import numpy as np
+
+import mesh_analysis
+
+logger = logging.getLogger(__name__)
+
+# Camera positions as (azimuth, elevation) in degrees; azimuth 0 looks at the front (-Y) side
+VIEWS = {
+    "iso": (30.0, 30.0),
+    "front": (0.0, 0.0),
+    "back": (180.0, 0.0),
+    "right": (90.0, 0.0),
+    "left": (-90.0, 0.0),
+    "top": (0.0, 90.0),
+    "bottom": (0.0, -90.0),
+}
+
+BACKGROUND = np.array([24, 40, 58], dtype=np.float32)
+MODEL_COLOR = np.array([245, 185, 66], dtype=np.float32)
+# Light from the upper left, slightly toward the viewer, in camera space
+LIGHT = np.array([-0.4, 0.6, 0.7], dtype=np.float32) / np.linalg.norm([-0.4, 0.6, 0.7])
+AMBIENT = 0.3
+
+# Images are rendered at this multiple of the output size and averaged down, smoothing the edges
+SUPERSAMPLE = 2
+# Pixel candidates rasterized per batch, bounds the temporary memory to a few hundred MB
+BATCH_PIXELS = 4_000_000
+MARGIN = 0.05
+EDGE_SLACK = 1e-4
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """Encodes an (H, W, 3) uint8 image as an 8 bit RGB PNG."""
+    height, width, _ = image.shape
+    # Filter type 0 (none) in front of every row; zlib does the rest
+    rows = np.empty((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)) + chunk(b"IEND", b""))
+
+
+def camera_basis(view: str) -> np.ndarray:
+    """Rows are the camera's right, up and toward-viewer axes in model coordinates."""
+    azimuth, elevation = (math.radians(v) for v in VIEWS[view])
+    toward = np.array([math.cos(elevation) * math.sin(azimuth), -math.cos(elevation) * math.cos(azimuth), math.sin(elevation)])
+    right = np.array([math.cos(azimuth), math.sin(azimuth), 0.0])
+    up = np.cross(toward, right)
+    return np.stack([right, up, toward])
+
+
+def render(triangles: np.ndarray, width: int, height: int, view: str = "iso") -> np.ndarray:
+    """
+    Renders a flat shaded orthographic view of a triangle soup with a z-buffer.
+
+    Every triangle is expanded to the pixels of its screen bounding box, tested with edge
+    functions and written with np.minimum.at on a key of (depth, triangle index), so the
+    nearest triangle wins each pixel without a Python loop.
+
+    Returns:
+        (height, width, 3) uint8 image, the model fitted to the frame.
+    """
+    ss_width, ss_height = width * SUPERSAMPLE, height * SUPERSAMPLE
+    image = np.empty((ss_height, ss_width, 3), dtype=np.float32)
+    image[:] = BACKGROUND
+    if len(triangles) == 0:
+        return _downsample(image)
+
+    points = np.ascontiguousarray(triangles, dtype=np.float32).reshape(-1, 3) @ camera_basis(view).T.astype(np.float32)
+    low, high = points.min(axis=0), points.max(axis=0)
+    extent = np.maximum(high - low, 1e-6)
+    scale = min(ss_width / extent[0], ss_height / extent[1]) * (1 - 2 * MARGIN)
+    center = (low + high) / 2
+
+    # Screen space: x to the right, y down, depth 0 (near) .. 1 (far)
+    screen = np.empty_like(points)
+    screen[:, 0] = (points[:, 0] - center[0]) * scale + ss_width / 2
+    screen[:, 1] = ss_height / 2 - (points[:, 1] - center[1]) * scale
+    screen[:, 2] = (high[2] - points[:, 2]) / extent[2]
+    screen = screen.reshape(-1, 3, 3)
+
+    normals = mesh_analysis.face_normals(points.reshape(-1, 3, 3))
+    # Two sided lighting, STLs with flipped faces should still look right
+    shade = AMBIENT + (1 - AMBIENT) * np.abs(normals @ LIGHT)
+
+    # A closed, outward facing mesh hides its back faces anyway; skipping them halves the work.
+    # Inside-out or open meshes are drawn from both sides.
+    drawn = normals[:, 2] >= 0 if _outward_facing(triangles) else np.ones(len(normals), dtype=bool)
+
+    face = _rasterize(screen, ss_width, ss_height, drawn)
+    covered = face >= 0
+    image.reshape(-1, 3)[covered] = MODEL_COLOR * shade[face[covered], None]
+    return _downsample(image)
+
+
+def _outward_facing(triangles: np.ndarray) -> bool:
+    """True if the mesh encloses a positive volume, i.e. its faces point outward."""
+    tris = np.ascontiguousarray(triangles, dtype=np.float32)
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    return float(np.einsum("ij,ij->", a, np.cross(b - a, c - a), dtype=np.float64)) > 0
+
+
+def _rasterize(screen: np.ndarray, width: int, height: int, drawn: np.ndarray) -> np.ndarray:
+    """Index of the nearest triangle per pixel, -1 where nothing is drawn."""
+    x, y, z = screen[..., 0], screen[..., 1], screen[..., 2]
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+
+    # Pixel centers sit at +0.5, only those inside the bounding box can be covered
+    # Element-wise over the three corners, a reduction along a length 3 axis is several times slower
+    x_min = np.clip(np.ceil(np.minimum(np.minimum(x[:, 0], x[:, 1]), x[:, 2]) - 0.5), 0, width).astype(np.int64)
+    x_max = np.clip(np.floor(np.maximum(np.maximum(x[:, 0], x[:, 1]), x[:, 2]) - 0.5), -1, width - 1).astype(np.int64)
+    y_min = np.clip(np.ceil(np.minimum(np.minimum(y[:, 0], y[:, 1]), y[:, 2]) - 0.5), 0, height).astype(np.int64)
+    y_max = np.clip(np.floor(np.maximum(np.maximum(y[:, 0], y[:, 1]), y[:, 2]) - 0.5), -1, height - 1).astype(np.int64)
+    box_width = np.maximum(x_max - x_min + 1, 0)
+    counts = box_width * np.maximum(y_max - y_min + 1, 0)
+    counts[(area == 0) | ~drawn] = 0
+
+    # Barycentric weights and depth are affine in screen space: w = a * x + b * y + c. Solving the
+    # coefficients once per triangle leaves three multiply-adds per candidate pixel and value.
+    # Dividing by the signed area makes the weights positive inside regardless of winding.
+    visible = np.flatnonzero(counts)
+    inv_area = 1.0 / area[visible]
+    x0, x1, x2 = x[visible, 0], x[visible, 1], x[visible, 2]
+    y0, y1, y2 = y[visible, 0], y[visible, 1], y[visible, 2]
+    w0 = np.stack([(y1 - y2), (x2 - x1), x1 * y2 - x2 * y1], axis=1) * inv_area[:, None]
+    w1 = np.stack([(y2 - y0), (x0 - x2), x2 * y0 - x0 * y2], axis=1) * inv_area[:, None]
+    z0, z1, z2 = (z[visible, i][:, None] for i in range(3))
+    depth = z0 * w0 + z1 * w1 + z2 * (np.array([0, 0, 1], dtype=np.float32) - w0 - w1)
+    coefficients = np.concatenate([w0, w1, depth], axis=1).astype(np.float32)
+
+    zbuffer = np.full(width * height, np.iinfo(np.uint64).max, dtype=np.uint64)
+    ends = np.cumsum(counts[visible])
+    start = 0
+    while start < len(visible):
+        # Take triangles until the batch holds BATCH_PIXELS candidates (at least one triangle)
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + BATCH_PIXELS, side="right")), start + 1)
+        batch = slice(start, stop)
+        _rasterize_batch(visible[batch], coefficients[batch], x_min[visible[batch]], y_min[visible[batch]],
+                         box_width[visible[batch]], counts[visible[batch]], zbuffer, width)
+        start = stop
+
+    face = np.full(width * height, -1, dtype=np.int64)
+    covered = zbuffer != np.iinfo(np.uint64).max
+    face[covered] = (zbuffer[covered] & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    return face
+
+
+def _rasterize_batch(tris, coefficients, x_min, y_min, box_width, counts, zbuffer, width):
+    # Expand every triangle to the pixels of its bounding box
+    slot = np.repeat(np.arange(len(tris)), counts)
+    local = np.arange(len(slot)) - np.repeat(np.cumsum(counts) - counts, counts)
+    row, column = np.divmod(local, box_width[slot])
+    px = x_min[slot] + column
+    py = y_min[slot] + row
+    cx = px.astype(np.float32) + 0.5
+    cy = py.astype(np.float32) + 0.5
+
+    c = coefficients[slot]
+    w0 = c[:, 0] * cx + c[:, 1] * cy + c[:, 2]
+    w1 = c[:, 3] * cx + c[:, 4] * cy + c[:, 5]
+    # The slack covers float32 rounding, so pixels on a shared edge are never missed by both triangles
+    inside = (w0 >= -EDGE_SLACK) & (w1 >= -EDGE_SLACK) & (w0 + w1 <= 1 + EDGE_SLACK)
+
+    slot, px, py, c = slot[inside], px[inside], py[inside], c[inside]
+    depth = c[:, 6] * cx[inside] + c[:, 7] * cy[inside] + c[:, 8]
+    # Depth in the high bits, triangle index in the low bits: the minimum is the nearest triangle
+    key = (np.clip(depth, 0, 1) * 0xFFFFFFFF).astype(np.uint64) << np.uint64(32) | tris[slot].astype(np.uint64)
+    np.minimum.at(zbuffer, py * width + px, key)
+
+
+def _downsample(image: np.ndarray) -> np.ndarray:
+    height, width, _ = image.shape
+    blocks = image.reshape(height // SUPERSAMPLE, SUPERSAMPLE, width // SUPERSAMPLE, SUPERSAMPLE, 3)
+    return np.clip(blocks.mean(axis=(1, 3)) + 0.5, 0, 255).astype(np.uint8)
+
+
+def render_views(triangles: np.ndarray, width: int, height: int, views: tuple = ("iso",)) -> np.ndarray:
+    """Renders several views into one image, tiled in a grid of equal cells."""
+    columns = math.ceil(math.sqrt(len(views)))
+    rows = math.ceil(len(views) / columns)
+    cell_width, cell_height = width // columns, height // rows
+
+    image = np.empty((cell_height * rows, cell_width * columns, 3), dtype=np.uint8)
+    image[:] = BACKGROUND.astype(np.uint8)
+    for i, view in enumerate(views):
+        row, column = divmod(i, columns)
+        image[row * cell_height:(row + 1) * cell_height, column * cell_width:(column + 1) * cell_width] = \
+            render(triangles, cell_width, cell_height, view)
+    return image
+
+
+def render_stl_to_png(stl_path: str, png_path: str, width: int = 800, height: int = 600, views: tuple = ("iso",)) -> str:
+    """Loads an STL, renders it and writes the PNG atomically. Blocking, run it in a worker thread."""
+    image = render_views(mesh_analysis.load_stl(stl_path), width, height, views)
+    temp_path = png_path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_png(image))
+    os.replace(temp_path, png_path)
+    return png_path
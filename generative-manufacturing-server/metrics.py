@@ -0,0 +1,248 @@
+import abc
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+import logging
+from typing import Callable, Iterable, Optional
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds, from in-memory tool calls to long slicer and OpenSCAD runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    """A named metric with a fixed set of label names; samples are kept per tuple of label values."""
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def samples(self) -> list[tuple[str, str, float]]:
+        """(name suffix, label string, value) of every sample."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines += [f"{self.name}{suffix}{labels} {_number(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [("", _labels(self.labelnames, key), value) for key, value in values]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple = (), value: float = 0):
+        with self._lock:
+            self._values[labels] = value
+
+
+class CallbackGauge(Metric):
+    """A gauge read from other state when scraped: callback returns {label values: value}."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str], callback: Callable[[], dict]):
+        super().__init__(name, help, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Could not collect {self.name}: {e}")
+            return []
+        return [("", _labels(self.labelnames, key), value) for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: tuple = ()):
+        # Per label set: a count per bucket (not cumulative, summed up when rendered), the sum and the count
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, labels: tuple = ()) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        samples = []
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", _labels(self.labelnames, key, f'le="{_number(float(bound))}"'), cumulative))
+            samples.append(("_sum", _labels(self.labelnames, key), total))
+            samples.append(("_count", _labels(self.labelnames, key), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+tool_duration = registry.register(Histogram(
+    "mcp_tool_duration_seconds", "Wall time of MCP tool calls.", ["tool"]))
+tool_errors = registry.register(Counter(
+    "mcp_tool_errors_total", "MCP tool calls that raised; error messages tools return as results are not counted.",
+    ["tool"]))
+tool_in_flight = registry.register(Gauge(
+    "mcp_tool_in_flight", "MCP tool calls running now.", ["tool"]))
+external_duration = registry.register(Histogram(
+    "external_call_duration_seconds", "Wall time of calls to PrusaLink, Gemini, the camera and external tools.",
+    ["service", "operation"]))
+external_errors = registry.register(Counter(
+    "external_call_errors_total", "External calls that raised or reported failure.", ["service", "operation"]))
+external_in_flight = registry.register(Gauge(
+    "external_calls_in_flight", "External calls running now.", ["service"]))
+
+
+class track:
+    """
+    Context manager timing one external call: in-flight gauge, latency histogram, and an error
+    count if the block raises or calls fail(). Works around awaits and in worker threads.
+    The call is also a tracing span named <service>.<operation>, nested in the request's trace.
+    """
+    __slots__ = ("service", "operation", "failed", "span", "_started")
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+        self.failed = False
+        self.span = tracing.span(f"{service}.{operation}")
+
+    def fail(self, error: str = None):
+        self.failed = True
+        self.span.fail(error)
+
+    def __enter__(self) -> "track":
+        self.span.__enter__()
+        external_in_flight.inc((self.service,))
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = (self.service, self.operation)
+        external_duration.observe(time.perf_counter() - self._started, labels)
+        external_in_flight.dec((self.service,))
+        if exc_type is not None or self.failed:
+            external_errors.inc(labels)
+        return self.span.__exit__(exc_type, exc, tb)
+
+
+def timed(service: str, operation: Optional[str] = None):
+    """Decorator tracking every call of a sync or async function as an external call, named after it by default."""
+    def decorate(fn):
+        name = operation or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with track(service, name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(service, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_tool(name: str, fn: Callable) -> Callable:
+    """
+    Wraps an async tool function to record its latency, errors and concurrent calls under name.
+    Only exceptions count as errors: most tools report failures as a returned message, which
+    cannot be told apart from a result here.
+    """
+    labels = (name,)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        tool_in_flight.inc(labels)
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        except BaseException:
+            tool_errors.inc(labels)
+            raise
+        finally:
+            tool_duration.observe(time.perf_counter() - started, labels)
+            tool_in_flight.dec(labels)
+    return wrapper
+
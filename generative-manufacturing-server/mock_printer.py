@@ -1,4 +1,5 @@
 import asyncio
+import os
 import random
 import logging
 from typing import Dict, Any
@@ -15,6 +16,7 @@ class MockPrinter:
         self.temp_bed = 60.0
         self.target_bed = 60.0
         self.temp_chamber = 35.0
+        self.file_name = None
         
         logging.info("Initialized MockPrinter")
 
@@ -23,7 +25,8 @@ class MockPrinter:
             "name": "Mock Prusa MK4",
             "model": "MK4",
             "firmware": "5.1.0-mock",
-            "state": self.state
+            "state": self.state,
+            "binary_gcode": True
         }
 
     async def get_status(self) -> Dict[str, Any]:
@@ -49,7 +52,8 @@ class MockPrinter:
             "fan_speed": 100 if self.state == "Printing" else 0,
             "progress": int(self.progress),
             "time_remaining": int(self.time_remaining),
-            "print_time": 3600 - int(self.time_remaining)
+            "print_time": 3600 - int(self.time_remaining),
+            "file_name": self.file_name
         }
 
     async def pause_print(self) -> Dict[str, Any]:
@@ -67,4 +71,5 @@ class MockPrinter:
         return {"status": "success", "message": "Mock print stopped"}
 
     async def upload_file(self, file_path: str, target_filename: str = None, storage: str = "usb") -> Dict[str, Any]:
+        self.file_name = target_filename or os.path.basename(file_path)
         return {"status": "success", "message": f"Simulated upload of {target_filename}"}
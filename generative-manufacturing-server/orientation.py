@@ -0,0 +1,216 @@
+import os
+import math
+import logging
+from typing import Optional
+
+import numpy as np
+
+import mesh_analysis
+from slicer_runner import intent_profile
+
+logger = logging.getLogger(__name__)
+
+# Faces tilted further than this from vertical need support material
+OVERHANG_ANGLE = float(os.getenv("OVERHANG_ANGLE", "45"))
+# Evenly spread directions tried as "down", on top of the axes and the largest flat faces
+SPHERE_CANDIDATES = int(os.getenv("ORIENTATION_CANDIDATES", "128"))
+FACE_CANDIDATES = 16
+# Faces within this distance of the bed touch it
+CONTACT_TOLERANCE = 0.05
+CONTACT_COS = math.cos(math.radians(1))
+# Candidates scored per batch, each costs a float32 column per face and vertex
+BATCH = 16
+# A new orientation has to beat the current one by this much to be worth a rotation
+MIN_IMPROVEMENT = 0.01
+
+# Score weights per slicing intent. Overhang and height are fractions (lower is better),
+# contact is the bed contact relative to the best candidate (higher is better).
+INTENT_WEIGHTS = {
+    # Fewer layers and less support material print fastest
+    "draft": {"overhang": 1.0, "contact": 0.3, "height": 1.0},
+    # A large, flat footprint holds the part down and keeps it from snapping along layers at the base
+    "strong": {"overhang": 1.0, "contact": 1.0, "height": 0.2},
+    # Support scars ruin surfaces, height barely matters
+    "detail": {"overhang": 2.0, "contact": 0.5, "height": 0.1},
+    "default": {"overhang": 1.0, "contact": 0.5, "height": 0.3},
+}
+
+
+def weights_for_intent(intent: str) -> dict:
+    """Maps an intent to score weights, through the same profiles SlicerRunner picks presets by."""
+    return INTENT_WEIGHTS[intent_profile(intent)]
+
+
+def fibonacci_sphere(count: int) -> np.ndarray:
+    """Unit vectors spread evenly over the sphere."""
+    i = np.arange(count) + 0.5
+    polar = np.arccos(1 - 2 * i / count)
+    azimuth = np.pi * (1 + 5 ** 0.5) * i
+    return np.stack([np.cos(azimuth) * np.sin(polar), np.sin(azimuth) * np.sin(polar), np.cos(polar)], axis=1)
+
+
+def candidate_directions(normals: np.ndarray, areas: np.ndarray, sphere_count: int = None) -> np.ndarray:
+    """
+    Down directions worth scoring: the current orientation first, then the axes, the normals of
+    the largest flat areas (resting one of them on the bed) and an even spread over the sphere.
+    """
+    sphere_count = SPHERE_CANDIDATES if sphere_count is None else sphere_count
+    axes = np.array([[0, 0, -1], [0, 0, 1], [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0]], dtype=np.float64)
+
+    # Group faces by rounded normal, so a tessellated flat side counts as one big face.
+    # One integer per normal sorts far faster than np.unique over rows.
+    quantized = np.round(normals * 100).astype(np.int64) + 100
+    keys, inverse = np.unique((quantized[:, 0] * 201 + quantized[:, 1]) * 201 + quantized[:, 2], return_inverse=True)
+    group_area = np.bincount(inverse.ravel(), weights=areas, minlength=len(keys))
+    top = keys[np.argsort(group_area)[::-1][:FACE_CANDIDATES]]
+    largest = (np.stack([top // (201 * 201), top // 201 % 201, top % 201], axis=1) - 100) / 100.0
+    largest = largest[np.linalg.norm(largest, axis=1) > 0.5]
+    largest = largest / np.linalg.norm(largest, axis=1, keepdims=True)
+
+    directions = np.concatenate([axes, largest, fibonacci_sphere(sphere_count)])
+    # Drop near duplicates, keeping the first (the current orientation stays at index 0)
+    _, first = np.unique(np.round(directions, 3), axis=0, return_index=True)
+    return directions[np.sort(first)]
+
+
+def rotation_to_bed(down: np.ndarray) -> np.ndarray:
+    """Rotation matrix turning the direction `down` into -Z (Rodrigues' formula)."""
+    down = np.asarray(down, dtype=np.float64)
+    down = down / np.linalg.norm(down)
+    target = np.array([0.0, 0.0, -1.0])
+    axis = np.cross(down, target)
+    sin = np.linalg.norm(axis)
+    cos = float(np.dot(down, target))
+    if sin < 1e-9:
+        # Already down, or straight up: turn half way around X
+        return np.eye(3) if cos > 0 else np.diag([1.0, -1.0, -1.0])
+    axis /= sin
+    k = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    return np.eye(3) + sin * k + (1 - cos) * k @ k
+
+
+def score_orientations(triangles: np.ndarray, intent: str = "default", directions: Optional[np.ndarray] = None) -> list[dict]:
+    """
+    Scores candidate orientations of a mesh for FDM printing, best first.
+
+    For every candidate down direction (in batches, as matrix products over all faces and
+    vertices) it measures the overhang area that needs support, the area resting on the bed
+    and the print height, then combines them with the intent's weights.
+
+    Returns:
+        List of dicts with down, overhang_area (mm^2), contact_area (mm^2), height (mm) and score.
+    """
+    vertices, faces = mesh_analysis.weld_vertices(triangles)
+    tris = vertices[faces]
+    cross = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    doubled_area = np.linalg.norm(cross, axis=1)
+    normals = np.divide(cross, doubled_area[:, None], out=np.zeros_like(cross), where=doubled_area[:, None] > 0)
+    areas = doubled_area / 2
+    total_area = float(areas.sum(dtype=np.float64)) or 1.0
+
+    if directions is None:
+        directions = candidate_directions(normals, areas)
+    directions = np.asarray(directions, dtype=np.float64)
+    overhang_cos = math.sin(math.radians(OVERHANG_ANGLE))
+
+    overhang = np.empty(len(directions))
+    contact = np.empty(len(directions))
+    height = np.empty(len(directions))
+    for start in range(0, len(directions), BATCH):
+        batch = directions[start:start + BATCH].astype(np.float32)
+        # One row per candidate keeps the per-candidate scans below contiguous
+        elevation = -batch @ vertices.T
+        lowest = elevation.min(axis=1)
+        height[start:start + len(batch)] = elevation.max(axis=1) - lowest
+
+        facing_down = batch @ normals.T
+        downward_area = (facing_down > overhang_cos).astype(np.float32) @ areas
+        for j in range(len(batch)):
+            flat = np.flatnonzero(facing_down[j] > CONTACT_COS)
+            on_bed = flat[(elevation[j, faces[flat]] - lowest[j] <= CONTACT_TOLERANCE).all(axis=1)]
+            contact_area = float(areas[on_bed].sum(dtype=np.float64))
+            contact[start + j] = contact_area
+            # Faces on the bed point down but are held by it, not by supports
+            overhang[start + j] = float(downward_area[j]) - contact_area
+
+    weights = weights_for_intent(intent)
+    max_contact = contact.max() or 1.0
+    max_height = height.max() or 1.0
+    score = (weights["overhang"] * overhang / total_area
+             + weights["height"] * height / max_height
+             - weights["contact"] * contact / max_contact)
+
+    order = np.argsort(score, kind="stable")
+    return [{
+        "down": [round(float(v), 4) for v in directions[i]],
+        "overhang_area": round(float(overhang[i]), 2),
+        "contact_area": round(float(contact[i]), 2),
+        "height": round(float(height[i]), 3),
+        "score": round(float(score[i]), 4),
+        "current": bool(i == 0),
+    } for i in order]
+
+
+def orient(triangles: np.ndarray, intent: str = "default", bed: tuple = None) -> tuple[np.ndarray, dict]:
+    """
+    Rotates a mesh into the best scoring orientation that fits the bed and sets it on z = 0.
+
+    The current orientation is kept unless another one scores clearly better.
+
+    Returns:
+        (triangles, report): the (possibly) rotated triangles and a dict with rotated,
+        the chosen and the current scores, and the rotation matrix.
+    """
+    scores = score_orientations(triangles, intent)
+    current = next(s for s in scores if s["current"])
+    chosen = current
+    points = np.asarray(triangles, dtype=np.float64).reshape(-1, 3)
+    for candidate in scores:
+        if candidate["score"] > current["score"] - MIN_IMPROVEMENT:
+            break
+        rotated = points @ rotation_to_bed(candidate["down"]).T
+        if mesh_analysis.fits_bed(rotated.max(axis=0) - rotated.min(axis=0), bed):
+            chosen = candidate
+            break
+
+    report = {"rotated": chosen is not current, "chosen": chosen, "current": current, "candidates": len(scores),
+              "rotation": None}
+    if chosen is current:
+        return triangles, report
+
+    rotation = rotation_to_bed(chosen["down"])
+    rotated = points @ rotation.T
+    rotated[:, 2] -= rotated[:, 2].min()
+    report["rotation"] = [[round(float(v), 6) for v in row] for row in rotation]
+    return rotated.reshape(-1, 3, 3).astype(np.float32), report
+
+
+def orient_file(input_path: str, output_path: str, intent: str = "default") -> dict:
+    """
+    Orients an STL for printing and writes the result as binary STL to output_path.
+
+    Nothing is written if the current orientation is already best; check the returned
+    report's rotated flag before using output_path.
+    """
+    try:
+        triangles = mesh_analysis.load_stl(input_path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not orient {input_path}: {e}")
+        triangles = np.empty((0, 3, 3), dtype=np.float32)
+    if len(triangles) == 0:
+        return {"rotated": False, "chosen": None, "current": None, "candidates": 0, "rotation": None}
+    oriented, report = orient(triangles, intent)
+    if report["rotated"]:
+        mesh_analysis.write_binary_stl(output_path, oriented)
+        logger.info(f"Reoriented {os.path.basename(input_path)}: {report['current']} -> {report['chosen']}")
+    return report
+
+
+def format_report(report: dict) -> str:
+    """One line summary of an orientation report for tool output."""
+    if not report["rotated"]:
+        return "Kept the model's orientation."
+    current, chosen = report["current"], report["chosen"]
+    return (f"Reoriented for printing: overhang {current['overhang_area']:g} -> {chosen['overhang_area']:g} mm^2, "
+            f"bed contact {current['contact_area']:g} -> {chosen['contact_area']:g} mm^2, "
+            f"height {current['height']:g} -> {chosen['height']:g} mm.")
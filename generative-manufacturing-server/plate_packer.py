@@ -0,0 +1,183 @@
+import os
+import logging
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import numpy as np
+
+import mesh_analysis
+
+logger = logging.getLogger(__name__)
+
+# Gap between parts, so the nozzle does not string between them and parts come off one by one
+PLATE_SPACING = float(os.getenv("PLATE_SPACING", "5"))
+# Kept free along the bed edges (clips, purge line)
+PLATE_MARGIN = float(os.getenv("PLATE_MARGIN", "5"))
+# Copies per model and parts per plate, a plate is one slicer run
+MAX_QUANTITY = 100
+MAX_PARTS = 200
+
+
+@dataclass
+class Placement:
+    """Where one copy of a part sits on the bed, in bed coordinates (mm)."""
+    name: str
+    copy: int
+    x: float
+    y: float
+    width: float
+    depth: float
+    rotated: bool
+
+
+def _split_free(free: tuple, used: tuple) -> list[tuple]:
+    """Maximal free rectangles left of `free` once `used` is taken out of it."""
+    fx, fy, fw, fh = free
+    ux, uy, uw, uh = used
+    if ux >= fx + fw or ux + uw <= fx or uy >= fy + fh or uy + uh <= fy:
+        return [free]
+    pieces = []
+    if ux > fx:
+        pieces.append((fx, fy, ux - fx, fh))
+    if ux + uw < fx + fw:
+        pieces.append((ux + uw, fy, fx + fw - ux - uw, fh))
+    if uy > fy:
+        pieces.append((fx, fy, fw, uy - fy))
+    if uy + uh < fy + fh:
+        pieces.append((fx, uy + uh, fw, fy + fh - uy - uh))
+    return pieces
+
+
+def _prune(free: list[tuple]) -> list[tuple]:
+    """Drops free rectangles contained in another one."""
+    kept = []
+    for i, (x, y, w, h) in enumerate(free):
+        contained = any(
+            j != i and x >= ox and y >= oy and x + w <= ox + ow and y + h <= oy + oh and (j < i or (x, y, w, h) != (ox, oy, ow, oh))
+            for j, (ox, oy, ow, oh) in enumerate(free)
+        )
+        if not contained:
+            kept.append((x, y, w, h))
+    return kept
+
+
+def pack_rectangles(sizes: list[tuple[float, float]], width: float, depth: float) -> list[Optional[tuple[float, float, bool]]]:
+    """
+    Packs rectangles into a width x depth area with the MaxRects best-short-side-fit heuristic.
+
+    Rectangles are placed largest first and may be turned by 90 degrees.
+
+    Returns:
+        One (x, y, rotated) per input size in input order, None for rectangles that did not fit.
+    """
+    free = [(0.0, 0.0, float(width), float(depth))]
+    result: list[Optional[tuple[float, float, bool]]] = [None] * len(sizes)
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][0] * sizes[i][1], -max(sizes[i])))
+
+    for i in order:
+        w, h = sizes[i]
+        best = None
+        for fx, fy, fw, fh in free:
+            for rotated, (pw, ph) in ((False, (w, h)), (True, (h, w))):
+                if pw <= fw + 1e-9 and ph <= fh + 1e-9:
+                    fit = (min(fw - pw, fh - ph), max(fw - pw, fh - ph), fy, fx)
+                    if best is None or fit < best[0]:
+                        best = (fit, fx, fy, pw, ph, rotated)
+        if best is None:
+            continue
+        _, x, y, pw, ph, rotated = best
+        result[i] = (x, y, rotated)
+        free = _prune([piece for rect in free for piece in _split_free(rect, (x, y, pw, ph))])
+    return result
+
+
+def footprint(triangles: np.ndarray) -> tuple[float, float]:
+    """X and Y extent of a part as it will sit on the bed."""
+    points = np.asarray(triangles, dtype=np.float32).reshape(-1, 3)
+    size = points.max(axis=0) - points.min(axis=0)
+    return float(size[0]), float(size[1])
+
+
+def place(triangles: np.ndarray, x: float, y: float, rotated: bool) -> np.ndarray:
+    """Moves a part so its footprint starts at (x, y) on the bed and it rests on z = 0."""
+    points = np.asarray(triangles, dtype=np.float64).reshape(-1, 3).copy()
+    if rotated:
+        # 90 degrees around Z keeps the winding and the footprint's extents swap
+        points[:, [0, 1]] = np.stack([-points[:, 1], points[:, 0]], axis=1)
+    points -= points.min(axis=0)
+    points[:, 0] += x
+    points[:, 1] += y
+    return points.reshape(-1, 3, 3).astype(np.float32)
+
+
+def build_plate(parts: list[tuple[str, np.ndarray, int]], bed: tuple = None, spacing: float = None,
+                margin: float = None) -> tuple[list[tuple[Placement, np.ndarray]], dict]:
+    """
+    Lays out copies of several parts on one bed.
+
+    Args:
+        parts: (name, triangles, quantity) per model, triangles already oriented for printing.
+
+    Returns:
+        (placed, report): every placed copy with its moved triangles, and a dict with
+        placements, unplaced copies and utilization (part footprints / bed area).
+    """
+    bed = bed or mesh_analysis.BED_SIZE
+    spacing = PLATE_SPACING if spacing is None else spacing
+    margin = PLATE_MARGIN if margin is None else margin
+
+    copies = [(name, triangles, copy) for name, triangles, quantity in parts for copy in range(quantity)]
+    sizes = {name: footprint(triangles) for name, triangles, _ in parts}
+    # Every part carries the spacing on its far sides; the area grows by one spacing to match
+    usable_width = bed[0] - 2 * margin + spacing
+    usable_depth = bed[1] - 2 * margin + spacing
+    positions = pack_rectangles([(sizes[name][0] + spacing, sizes[name][1] + spacing) for name, _, _ in copies],
+                                usable_width, usable_depth)
+
+    placed = []
+    unplaced = []
+    for (name, triangles, copy), position in zip(copies, positions):
+        if position is None:
+            unplaced.append({"name": name, "copy": copy})
+            continue
+        x, y, rotated = position
+        width, depth = sizes[name][::-1] if rotated else sizes[name]
+        placement = Placement(name=name, copy=copy, x=round(margin + x, 3), y=round(margin + y, 3),
+                              width=round(width, 3), depth=round(depth, 3), rotated=rotated)
+        placed.append((placement, place(triangles, placement.x, placement.y, rotated)))
+
+    used_area = sum(p.width * p.depth for p, _ in placed)
+    report = {
+        "placements": [asdict(p) for p, _ in placed],
+        "unplaced": unplaced,
+        "parts": len(placed),
+        "utilization": round(used_area / (bed[0] * bed[1]), 4),
+        "bed": list(bed),
+    }
+    return placed, report
+
+
+def write_plate(placed: list[tuple[Placement, np.ndarray]], directory: str) -> list[str]:
+    """Writes every placed copy as its own binary STL, the slicer keeps each one's position."""
+    paths = []
+    for placement, triangles in placed:
+        stem = os.path.splitext(placement.name)[0]
+        path = os.path.join(directory, f"{stem}_{placement.copy + 1}.stl")
+        mesh_analysis.write_binary_stl(path, triangles)
+        paths.append(path)
+    return paths
+
+
+def format_report(report: dict) -> str:
+    """Short plate summary for tool output."""
+    lines = [f"{report['parts']} parts on the plate, {report['utilization'] * 100:.0f}% of the bed used."]
+    counts = {}
+    for placement in report["placements"]:
+        counts[placement["name"]] = counts.get(placement["name"], 0) + 1
+    lines.extend(f"  {name}: {count}" for name, count in counts.items())
+    if report["unplaced"]:
+        missing = {}
+        for part in report["unplaced"]:
+            missing[part["name"]] = missing.get(part["name"], 0) + 1
+        lines.append("Did not fit: " + ", ".join(f"{count} x {name}" for name, count in missing.items()))
+    return "\n".join(lines)
@@ -0,0 +1,190 @@
+import json
+import math
+import os
+import re
+import logging
+import statistics
+from typing import Optional
+
+import numpy as np
+
+import slice_cache
+
+logger = logging.getLogger(__name__)
+
+# PLA; PETG is about 1.27, ASA 1.07
+FILAMENT_DENSITY = float(os.getenv("FILAMENT_DENSITY", "1.24"))
+EXTRUSION_WIDTH = 0.45
+# Solid top and bottom skin, as in the stock 0.2 mm profiles
+TOP_BOTTOM_THICKNESS = 0.7
+DEFAULT_PERIMETERS = 2
+
+# Uncalibrated speed model: volumetric flow (mm^3/s) for walls and infill, seconds per layer
+# change (travel, retraction, wipe) and fixed time for heating, homing and the purge line.
+# Real slices in the slice cache correct these (see calibrate).
+SHELL_FLOW = 6.0
+INFILL_FLOW = 12.0
+LAYER_OVERHEAD = 2.0
+FIXED_OVERHEAD = 150.0
+
+# Cached slice results needed before the estimator trusts their correction
+MIN_CALIBRATION_SAMPLES = 3
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)\s*([dhms])")
+_DURATION_SECONDS = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+
+# Cache directory -> (its mtime, calibration); the mtime changes whenever an entry is added or evicted
+_calibration_cache: dict = {}
+
+
+def parse_duration(text: str) -> Optional[float]:
+    """Seconds of a PrusaSlicer time estimate like "1d 2h 3m 4s", None if it has no parts."""
+    parts = _DURATION_PART.findall(text or "")
+    if not parts:
+        return None
+    return sum(float(value) * _DURATION_SECONDS[unit] for value, unit in parts)
+
+
+def format_duration(seconds: float) -> str:
+    minutes = int(round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m"
+
+
+def slicer_settings(args: list[str]) -> dict:
+    """Layer height, infill fraction and perimeter count from slicer CLI arguments."""
+    def value(flag, default):
+        return args[args.index(flag) + 1] if flag in args else default
+
+    return {
+        "layer_height": float(value("--layer-height", "0.2")),
+        "infill": float(str(value("--fill-density", "15%")).rstrip("%")) / 100,
+        "perimeters": int(value("--perimeters", DEFAULT_PERIMETERS)),
+    }
+
+
+def mesh_geometry(triangles: np.ndarray) -> dict:
+    """Volume (mm^3), surface area (mm^2) and height (mm) of a closed mesh, without welding vertices."""
+    if len(triangles) == 0:
+        return {"volume": 0.0, "surface_area": 0.0, "height": 0.0}
+    tris = np.ascontiguousarray(triangles, dtype=np.float32)
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    cross = np.cross(b - a, c - a)
+    z = tris[:, :, 2]
+    return {
+        "volume": round(float(np.einsum("ij,ij->", a, cross, dtype=np.float64)) / 6.0, 3),
+        "surface_area": round(float(np.sqrt(np.einsum("ij,ij->i", cross, cross)).sum(dtype=np.float64)) / 2, 3),
+        "height": round(float(z.max() - z.min()), 3),
+    }
+
+
+def geometry_from_stats(stats: dict) -> dict:
+    """The mesh_geometry subset of a mesh_analysis.analyze_mesh result."""
+    return {"volume": stats["volume"], "surface_area": stats["surface_area"], "height": stats["size"][2]}
+
+
+def _model(geometry: dict, settings: dict) -> dict:
+    """Extruded shell and infill volume and layer count of a part sliced with settings."""
+    volume = max(geometry["volume"], 0.0)
+    # Walls and skins cover the whole surface; thin parts are solid throughout
+    shell_thickness = max(settings["perimeters"] * EXTRUSION_WIDTH, TOP_BOTTOM_THICKNESS)
+    shell = min(volume, geometry["surface_area"] * shell_thickness)
+    infill = (volume - shell) * settings["infill"]
+    layers = max(math.ceil(geometry["height"] / settings["layer_height"]), 1) if geometry["height"] > 0 else 0
+    return {"shell": shell, "infill": infill, "layers": layers}
+
+
+def _raw_estimate(geometry: dict, settings: dict) -> dict:
+    model = _model(geometry, settings)
+    # Thinner layers lay down the same volume as more, slower lines
+    flow_scale = settings["layer_height"] / 0.2
+    seconds = (model["shell"] / (SHELL_FLOW * flow_scale) + model["infill"] / (INFILL_FLOW * flow_scale)
+               + model["layers"] * LAYER_OVERHEAD + FIXED_OVERHEAD)
+    grams = (model["shell"] + model["infill"]) / 1000 * FILAMENT_DENSITY
+    return {"print_time_s": seconds, "filament_g": grams, "layers": model["layers"]}
+
+
+def load_samples(cache_dir: str = None) -> list[dict]:
+    """Real slice results with the geometry and slicer arguments they were made from."""
+    cache_dir = cache_dir or slice_cache.CACHE_DIR
+    samples = []
+    if not os.path.isdir(cache_dir):
+        return samples
+    for entry in os.scandir(cache_dir):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        seconds = parse_duration(metadata.get("print_time"))
+        if not metadata.get("geometry") or not metadata.get("args") or seconds is None:
+            continue
+        try:
+            grams = float(metadata.get("filament_g"))
+        except (TypeError, ValueError):
+            grams = None
+        samples.append({"geometry": metadata["geometry"], "args": metadata["args"],
+                        "print_time_s": seconds, "filament_g": grams})
+    return samples
+
+
+def calibrate(samples: Optional[list[dict]] = None) -> dict:
+    """
+    Correction factors for the speed and material model from real slice results: the median
+    ratio of slicer estimate to model estimate, which one odd model cannot skew.
+
+    Without samples, the slice cache is read; the result is kept until the cache changes.
+    """
+    if samples is None:
+        cache_dir = slice_cache.CACHE_DIR
+        try:
+            stamp = os.stat(cache_dir).st_mtime_ns
+        except OSError:
+            stamp = None
+        cached = _calibration_cache.get(cache_dir)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        calibration = calibrate(load_samples(cache_dir))
+        _calibration_cache[cache_dir] = (stamp, calibration)
+        return calibration
+
+    time_ratios, filament_ratios = [], []
+    for sample in samples:
+        raw = _raw_estimate(sample["geometry"], slicer_settings(sample["args"]))
+        if raw["print_time_s"] > 0 and sample["print_time_s"]:
+            time_ratios.append(sample["print_time_s"] / raw["print_time_s"])
+        if raw["filament_g"] > 0 and sample["filament_g"]:
+            filament_ratios.append(sample["filament_g"] / raw["filament_g"])
+
+    def factor(ratios):
+        return round(statistics.median(ratios), 4) if len(ratios) >= MIN_CALIBRATION_SAMPLES else 1.0
+
+    return {"samples": len(samples), "time_factor": factor(time_ratios), "filament_factor": factor(filament_ratios),
+            "calibrated": len(time_ratios) >= MIN_CALIBRATION_SAMPLES}
+
+
+def estimate(geometry: dict, args: list[str], calibration: Optional[dict] = None) -> dict:
+    """Print time, filament and layer count of a part sliced with args, corrected by calibration."""
+    calibration = calibration or calibrate()
+    raw = _raw_estimate(geometry, slicer_settings(args))
+    seconds = raw["print_time_s"] * calibration["time_factor"]
+    return {
+        "print_time_s": round(seconds),
+        "print_time": format_duration(seconds),
+        "filament_g": round(raw["filament_g"] * calibration["filament_factor"], 1),
+        "layers": raw["layers"],
+    }
+
+
+def compare_intents(geometries: dict[str, dict], intent_args: dict[str, list[str]]) -> dict:
+    """
+    estimate for every intent, sharing one calibration. intent_args maps intent to slicer args,
+    geometries maps it to the geometry of the part in the orientation it is printed in at that intent.
+    """
+    calibration = calibrate()
+    return {
+        "estimates": {intent: estimate(geometries[intent], args, calibration) for intent, args in intent_args.items()},
+        "calibration": calibration,
+    }
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import signal
+import subprocess
+import tempfile
+import time
+import logging
+import weakref
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import executors
+import metrics
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProcessLimits:
+    """Per-job limits. None means unlimited."""
+    timeout: Optional[float] = None
+    cpu_seconds: Optional[int] = None
+    memory_bytes: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, prefix: str, timeout: float = None, cpu_seconds: int = None, memory_mb: int = None) -> "ProcessLimits":
+        """
+        Reads <PREFIX>_TIMEOUT, <PREFIX>_CPU_SECONDS and <PREFIX>_MEMORY_MB, falling back to the given defaults.
+        A value of 0 disables that limit.
+        """
+        def read(name, default):
+            value = os.getenv(f"{prefix}_{name}")
+            if value is None:
+                return default
+            value = float(value)
+            return value if value > 0 else None
+
+        timeout = read("TIMEOUT", timeout)
+        cpu_seconds = read("CPU_SECONDS", cpu_seconds)
+        memory_mb = read("MEMORY_MB", memory_mb)
+        return cls(
+            timeout=timeout,
+            cpu_seconds=int(cpu_seconds) if cpu_seconds else None,
+            memory_bytes=int(memory_mb * 1024 * 1024) if memory_mb else None,
+        )
+
+
+@dataclass
+class ProcessResult:
+    """Outcome and resource usage of one external process run."""
+    cmd: list[str]
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    wall_time: float
+    cpu_user: Optional[float] = None
+    cpu_system: Optional[float] = None
+    max_rss_kb: Optional[int] = None
+    timed_out: bool = False
+    signal: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    def usage(self) -> dict:
+        """Resource usage without the captured output, for logs and tool results."""
+        usage = asdict(self)
+        for key in ("cmd", "stdout", "stderr"):
+            usage.pop(key)
+        return usage
+
+
+class ProcessRunner:
+    """
+    Runs external tools (OpenSCAD, PrusaSlicer) without blocking the event loop.
+
+    At most max_workers processes run at once. Every process gets its own process
+    group, so a timeout or a cancelled request kills the tool and anything it spawned.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # One waiter thread per running process, so waiting never starves other work
+        self.executor = executors.Pool("tools", self.max_workers, thread_name_prefix="process-wait")
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Semaphores belong to a single event loop, tests create a new loop per test
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_workers)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, cmd: list[str], limits: ProcessLimits = None, cwd: str = None) -> ProcessResult:
+        """
+        Runs cmd to completion and returns its output and resource usage.
+
+        Raises FileNotFoundError if the executable does not exist. On cancellation
+        the process group is killed before CancelledError propagates.
+        """
+        limits = limits or ProcessLimits()
+        async with self._semaphore():
+            with metrics.track("process", os.path.splitext(os.path.basename(cmd[0]))[0]) as call:
+                result = await self._run(cmd, limits, cwd)
+                call.span.set(returncode=result.returncode, wall_time=result.wall_time, cpu_user=result.cpu_user)
+                if not result.ok:
+                    call.fail("timed out" if result.timed_out else f"exit code {result.returncode}")
+                return result
+
+    async def _run(self, cmd: list[str], limits: ProcessLimits, cwd: Optional[str]) -> ProcessResult:
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            start = time.monotonic()
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=stdout_file,
+                stderr=stderr_file,
+                cwd=cwd,
+                **self._spawn_kwargs(),
+            )
+            self._apply_limits(proc, limits)
+
+            loop = asyncio.get_running_loop()
+            waiter = loop.run_in_executor(self.executor, self._wait, proc)
+            timed_out = False
+            try:
+                returncode, rusage = await asyncio.wait_for(asyncio.shield(waiter), timeout=limits.timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                logger.warning(f"Process exceeded {limits.timeout}s wall clock, killing: {cmd[0]}")
+                self._kill(proc)
+                returncode, rusage = await waiter
+            except asyncio.CancelledError:
+                logger.info(f"Request cancelled, killing: {cmd[0]}")
+                self._kill(proc)
+                raise
+            wall_time = time.monotonic() - start
+
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            result = ProcessResult(
+                cmd=list(cmd),
+                returncode=returncode,
+                stdout=stdout_file.read().decode("utf-8", errors="replace"),
+                stderr=stderr_file.read().decode("utf-8", errors="replace"),
+                wall_time=round(wall_time, 3),
+                timed_out=timed_out,
+            )
+
+        if returncode is not None and returncode < 0:
+            try:
+                result.signal = signal.Signals(-returncode).name
+            except ValueError:
+                result.signal = str(-returncode)
+        if rusage is not None:
+            result.cpu_user = round(rusage.ru_utime, 3)
+            result.cpu_system = round(rusage.ru_stime, 3)
+            result.max_rss_kb = rusage.ru_maxrss
+
+        logger.info(f"Process finished: {os.path.basename(cmd[0])} {result.usage()}")
+        return result
+
+    @staticmethod
+    def _spawn_kwargs() -> dict:
+        if os.name != "posix":
+            return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        return {"start_new_session": True}
+
+    @staticmethod
+    def _apply_limits(proc: subprocess.Popen, limits: ProcessLimits):
+        """
+        Sets the rlimits of a started process from outside. A preexec_fn would run Python code
+        between fork and exec, which can deadlock in a process with threads.
+        """
+        if not (limits.cpu_seconds or limits.memory_bytes):
+            return
+        if resource is None or not hasattr(resource, "prlimit"):
+            logger.warning(f"Cannot limit CPU time or memory on this platform: {proc.args[0]}")
+            return
+        try:
+            if limits.cpu_seconds:
+                # Soft limit sends SIGXCPU, the hard limit one second later SIGKILL
+                resource.prlimit(proc.pid, resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1))
+            if limits.memory_bytes:
+                resource.prlimit(proc.pid, resource.RLIMIT_AS, (limits.memory_bytes, limits.memory_bytes))
+        except ProcessLookupError:
+            # Already exited, the waiter reaps it
+            pass
+
+    @staticmethod
+    def _wait(proc: subprocess.Popen):
+        """Reaps the process in a worker thread, collecting its rusage where the OS reports it."""
+        if hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return proc.returncode, rusage
+        return proc.wait(), None
+
+    @staticmethod
+    def _kill(proc: subprocess.Popen):
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+default_runner = ProcessRunner(max_workers=int(os.getenv("PROCESS_WORKERS", "0")) or None)
+executors.register(default_runner.executor)
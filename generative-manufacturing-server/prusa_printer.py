@@ -1,8 +1,19 @@
 import httpx
 import logging
 import os
+import re
 from typing import Dict, Any
 
+import metrics
+
+# Buddy firmware (MK4, XL, MINI, CORE One) reads binary G-code from 5.1 on, the MK3S firmware (3.x) never did
+BINARY_GCODE_MIN_FIRMWARE = (5, 1)
+
+def supports_binary_gcode(firmware_version: str) -> bool:
+    """True if the printer firmware version (e.g. "5.1.2+13478") can print .bgcode files."""
+    match = re.match(r"(\d+)\.(\d+)", firmware_version or "")
+    return bool(match) and (int(match.group(1)), int(match.group(2))) >= BINARY_GCODE_MIN_FIRMWARE
+
 class PrusaPrinter:
     def __init__(self, ip: str, api_key: str):
         self.ip = ip
@@ -10,6 +21,7 @@ class PrusaPrinter:
         self.base_url = f"http://{ip}"
         self.headers = {"X-Api-Key": api_key}
     
+    @metrics.timed("prusalink")
     async def get_info(self) -> Dict[str, Any]:
         """
         Retrieves basic printer information from PrusaLink.
@@ -37,7 +49,8 @@ class PrusaPrinter:
                     "name": info_data.get("hostname", "Unknown Prusa"),
                     "model": ver_data.get("text", "Unknown Model"),
                     "firmware": ver_data.get("server", "Unknown"),
-                    "state": printer_data.get("state", "Unknown")
+                    "state": printer_data.get("state", "Unknown"),
+                    "binary_gcode": supports_binary_gcode(ver_data.get("firmware", ""))
                 }
             except httpx.HTTPError as e:
                 logging.error(f"HTTP Error getting printer info: {e}")
@@ -46,6 +59,7 @@ class PrusaPrinter:
                 logging.error(f"Failed to get printer info: {e}")
                 raise
 
+    @metrics.timed("prusalink")
     async def get_status(self) -> Dict[str, Any]:
         """
         Retrieves current printer status (temps, job, etc).
@@ -79,7 +93,9 @@ class PrusaPrinter:
                     "fan_speed": printer_data.get("fan_hotend", 0), 
                     "progress": job_data.get("progress", 0),
                     "time_remaining": job_data.get("time_remaining", 0),
-                    "print_time": job_data.get("time_printing", 0)
+                    "print_time": job_data.get("time_printing", 0),
+                    # Long name first, "name" can be the 8.3 short name on USB storage
+                    "file_name": job_data.get("file", {}).get("display_name") or job_data.get("file", {}).get("name")
                 }
             except httpx.HTTPError as e:
                 logging.error(f"HTTP Error getting printer status: {e}")
@@ -88,6 +104,7 @@ class PrusaPrinter:
                 logging.error(f"Failed to get printer status: {e}")
                 raise
 
+    @metrics.timed("prusalink")
     async def pause_print(self) -> Dict[str, Any]:
         """
         Pauses the current print job.
@@ -111,6 +128,7 @@ class PrusaPrinter:
                 logging.error(f"Failed to pause print: {e}")
                 raise
 
+    @metrics.timed("prusalink")
     async def resume_print(self) -> Dict[str, Any]:
         """
         Resumes the current print job.
@@ -140,6 +158,7 @@ class PrusaPrinter:
                 logging.error(f"Failed to resume print: {e}")
                 raise
 
+    @metrics.timed("prusalink")
     async def stop_print(self) -> Dict[str, Any]:
         """
         Stops/Cancels the current print job.
@@ -162,6 +181,7 @@ class PrusaPrinter:
                 logging.error(f"Failed to stop print: {e}")
                 raise
 
+    @metrics.timed("prusalink")
     async def upload_file(self, file_path: str, target_filename: str = None, storage: str = "usb") -> Dict[str, Any]:
         """
         Uploads a G-code file to the printer.
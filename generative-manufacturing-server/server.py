@@ -3,18 +3,41 @@ from dotenv import load_dotenv
 import json
 import base64
 import asyncio
+import tempfile
+import time
+import shutil
+import contextlib
 
 import uvicorn
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from mcp import types
 from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
 
 from prusa_printer import PrusaPrinter
 import stl_generator
+import mesh_analysis
+import mesh_decimation
+import orientation
+import plate_packer
+import artifacts
+import artifact_store
+import slice_cache
+import gcode_index
+import print_estimator
+import job_queue
+import executors
+import loop_monitor
+import metrics
+import tracing
+import ui_resources
+import sop_index
+import incident_store
 from google import genai
 from google.genai import types as genai_types
 import glob
-from slicer_runner import SlicerRunner
+from slicer_runner import SlicerRunner, UNKNOWN_VERSION
 from mcp.server.transport_security import TransportSecuritySettings
 
 # Load environment variables
@@ -46,6 +69,15 @@ mcp = FastMCP(
   "Generative Manufacturing",
 )
 
+def instrumented(fn):
+    """
+    Times a tool and runs it in a tool.<name> span, the root of a new trace when called through MCP.
+    Applied under @mcp.tool(), so MCP registers the wrapper and every tool is covered from the
+    moment it is defined.
+    """
+    name = fn.__name__
+    return tracing.traced(f"tool.{name}")(metrics.instrument_tool(name, fn))
+
 # Initialize Gemini Client
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 client = None
@@ -54,46 +86,72 @@ if GEMINI_API_KEY:
     client = genai.Client(api_key=GEMINI_API_KEY)
 
 def capture_frame_base64(camera_url, quality=80):
-    if MOCK_MODE:
-        import random
-        # 20% chance of spaghetti, 80% chance of normal
-        is_failure = random.random() < 0.2
-        filename = "mock_spaghetti.jpg" if is_failure else "mock_normal.jpg"
-        filepath = os.path.join(os.path.dirname(__file__), "assets", filename)
+    # Timed as an external call; returning no frame counts as an error, as raising does
+    with metrics.track("camera", "capture") as call:
+        if MOCK_MODE:
+            import random
+            # 20% chance of spaghetti, 80% chance of normal
+            is_failure = random.random() < 0.2
+            filename = "mock_spaghetti.jpg" if is_failure else "mock_normal.jpg"
+            filepath = os.path.join(os.path.dirname(__file__), "assets", filename)
         
-        try:
-            with open(filepath, "rb") as f:
-                return base64.b64encode(f.read()).decode('utf-8')
-        except FileNotFoundError:
-            print(f"Mock asset not found: {filepath}")
-            # Fallback to creating a dummy black image if file missing
-            return "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/2wBDAQkJCQwLDBgNDRgyIRwhMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjL/wAARCAABAAEGMgASIAAhEBEQA/8QAFgABAQEAAAAAAAAAAAAAAAAAAwQFAAEBAQEAAAAAAAAAAAAAAAAAAQACEAACAQIDEAAAAAAAAAAAAAAAAJEQITFBEhEAAgIBAwUAAAAAAAAAAAAAAREhADFBUWGRof/aAAwDAQACEQMRAD8AQ0s1U1f/2Q=="
+            try:
+                with open(filepath, "rb") as f:
+                    return base64.b64encode(f.read()).decode('utf-8')
+            except FileNotFoundError:
+                print(f"Mock asset not found: {filepath}")
+                # Fallback to creating a dummy black image if file missing
+                return "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofHh0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/2wBDAQkJCQwLDBgNDRgyIRwhMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjIyMjL/wAARCAABAAEGMgASIAAhEBEQA/8QAFgABAQEAAAAAAAAAAAAAAAAAAwQFAAEBAQEAAAAAAAAAAAAAAAAAAQACEAACAQIDEAAAAAAAAAAAAAAAAJEQITFBEhEAAgIBAwUAAAAAAAAAAAAAAREhADFBUWGRof/aAAwDAQACEQMRAD8AQ0s1U1f/2Q=="
 
 
-    import cv2
-    if not camera_url:
-        return None
+        import cv2
+        if not camera_url:
+            call.fail("no camera URL")
+            return None
         
-    cap = cv2.VideoCapture(camera_url)
-    if not cap.isOpened():
-        return None
+        with tracing.span("camera.connect"):
+            cap = cv2.VideoCapture(camera_url)
+        if not cap.isOpened():
+            call.fail("camera stream did not open")
+            return None
     
-    ret, frame = cap.read()
-    cap.release()
+        with tracing.span("camera.read"):
+            ret, frame = cap.read()
+            cap.release()
     
-    if not ret:
-        return None
-        
-    # Resize to reduce size (standardize to VGA for analysis)
-    # This ensures consistency and lower token usage
-    resized_frame = cv2.resize(frame, (640, 480), interpolation=cv2.INTER_AREA)
+        if not ret:
+            call.fail("no frame read")
+            return None
         
-    # Encode to JPEG with specified quality
-    encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
-    _, buffer = cv2.imencode('.jpg', resized_frame, encode_param)
-    return base64.b64encode(buffer).decode('utf-8')
+        with tracing.span("camera.encode", quality=quality):
+            # Resize to reduce size (standardize to VGA for analysis)
+            # This ensures consistency and lower token usage
+            resized_frame = cv2.resize(frame, (640, 480), interpolation=cv2.INTER_AREA)
+            
+            # Encode to JPEG with specified quality
+            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+            _, buffer = cv2.imencode('.jpg', resized_frame, encode_param)
+            return base64.b64encode(buffer).decode('utf-8')
 
 
+# UI resources are served from memory; CDN assets are inlined when they could be fetched
+ui = ui_resources.UIRegistry()
+
+@mcp.custom_route("/ui/{filename}", methods=["GET"])
+async def ui_resource(request: Request) -> Response:
+    """The UI resources over plain HTTP, with ETag revalidation and precompressed gzip."""
+    try:
+        resource = ui.get(request.path_params["filename"])
+    except FileNotFoundError:
+        return Response("Not found", status_code=404)
+    headers = {"ETag": resource.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == resource.etag:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(resource.gzipped, media_type="text/html; charset=utf-8",
+                        headers={**headers, "Content-Encoding": "gzip"})
+    return Response(resource.body, media_type="text/html; charset=utf-8", headers=headers)
+
 DASHBOARD_URI = "ui://printer-dashboard.html"
 SNAPSHOT_URI = "ui://printer-snapshot.html"
 ANALYSIS_URI = "ui://printer-analysis.html"
@@ -105,17 +163,7 @@ ANALYSIS_URI = "ui://printer-analysis.html"
 )
 def printer_dashboard() -> str:
     """Dashboard HTML resource with CSP metadata for external dependencies."""
-    
-    dashboard_path = os.path.join(os.path.dirname(__file__), "resources/printer-dashboard.html")
-    try:
-        with open(dashboard_path, "r", encoding="utf-8") as f:
-            dashboard_html = f.read()
-    except FileNotFoundError:
-        print(f"Warning: printer-dashboard.html not found at {dashboard_path}")
-        dashboard_html = "<html><body><h1>Error: dashboard.html not found</h1></body></html>"
-    
-    
-    return dashboard_html
+    return ui.html("printer-dashboard.html")
 
 @mcp.resource(
     SNAPSHOT_URI,
@@ -124,12 +172,7 @@ def printer_dashboard() -> str:
 )
 def printer_snapshot() -> str:
     """Snapshot HTML resource."""
-    snapshot_path = os.path.join(os.path.dirname(__file__), "resources/printer-snapshot.html")
-    try:
-        with open(snapshot_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return "<html><body><h1>Error: printer-snapshot.html not found</h1></body></html>"
+    return ui.html("printer-snapshot.html")
 
 @mcp.resource(
     ANALYSIS_URI,
@@ -138,18 +181,14 @@ def printer_snapshot() -> str:
 )
 def printer_analysis() -> str:
     """Analysis UI resource."""
-    analysis_path = os.path.join(os.path.dirname(__file__), "resources/printer-analysis.html")
-    try:
-        with open(analysis_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return "<html><body><h1>Error: printer-analysis.html not found</h1></body></html>"
+    return ui.html("printer-analysis.html")
 
 @mcp.tool(meta={
     "ui":{
         "resourceUri": DASHBOARD_URI
     }
 })
+@instrumented
 async def show_printer_dashboard() -> list[types.TextContent]:
     """
     Fetch the latest raw printer data for the dashboard.
@@ -181,23 +220,42 @@ async def show_printer_dashboard() -> list[types.TextContent]:
         error_data = {"error": f"Error fetching printer data: {str(e)}"}
         return [types.TextContent(type="text", text=json.dumps(error_data))]
 
+def _current_layer(file_name: str | None, progress: float) -> str | None:
+    """"12 / 120 (Z 2.4 mm)" for a print of a local G-code file, from its layer index. Blocking."""
+    if not file_name or not artifacts.exists(os.path.join(MODELS_DIR, os.path.basename(file_name))):
+        return None
+    try:
+        _, index = _load_gcode_index(os.path.basename(file_name))
+    except (OSError, ValueError):
+        return None
+    layer = gcode_index.layer_at_progress(index, progress)
+    if layer is None:
+        return None
+    return f"{layer + 1} / {gcode_index.layer_count(index)} (Z {index['z'][layer]:g} mm)"
+
 @mcp.tool()
+@instrumented
 async def get_printer_status() -> str:
     """
     Get the current status of the printer including temperatures and progress.
     """
     try:
         status = await printer.get_status()
-        return (f"State: {status['state']}\n"
+        text = (f"State: {status['state']}\n"
                 f"Nozzle: {status['temp_nozzle']}°C / {status['target_nozzle']}°C\n"
                 f"Bed: {status['temp_bed']}°C / {status['target_bed']}°C\n"
                 f"Chamber: {status['temp_chamber']}°C / {status['target_chamber']}°C\n"
                 f"Progress: {status['progress']}%\n"
                 f"Time Remaining: {status['time_remaining']}")
+        layer = await executors.run("io", _current_layer, status.get("file_name"), status["progress"])
+        if layer:
+            text += f"\nLayer: {layer}"
+        return text
     except Exception as e:
         return f"Error fetching printer status: {str(e)}"
 
 @mcp.tool()
+@instrumented
 async def pause_printer() -> str:
     """
     Pause the current print job.
@@ -209,6 +267,7 @@ async def pause_printer() -> str:
         return f"Error pausing printer: {str(e)}"
 
 @mcp.tool()
+@instrumented
 async def resume_printer() -> str:
     """
     Resume the current print job.
@@ -220,6 +279,7 @@ async def resume_printer() -> str:
         return f"Error resuming printer: {str(e)}"
 
 @mcp.tool()
+@instrumented
 async def stop_printer() -> str:
     """
     Stop (Cancel) the current print job. WARNING: This cannot be undone.
@@ -231,13 +291,15 @@ async def stop_printer() -> str:
         return f"Error stopping printer: {str(e)}"
 
 @mcp.tool()
+@instrumented
 async def get_printer_info() -> str:
     """
     Get basic information about the connected Prusa printer (Model, Serial, Firmware).
     """
     try:
         info = await printer.get_info()
-        return f"Printer: {info['name']} ({info['model']})\nFirmware: {info['firmware']}\nState: {info['state']}"
+        return (f"Printer: {info['name']} ({info['model']})\nFirmware: {info['firmware']}\nState: {info['state']}\n"
+                f"Binary G-code: {'supported' if info.get('binary_gcode') else 'not supported'}")
     except Exception as e:
         return f"Error fetching printer info: {str(e)}"
 
@@ -246,6 +308,7 @@ async def get_printer_info() -> str:
         "resourceUri": SNAPSHOT_URI
     }
 })
+@instrumented
 async def get_camera_frame() -> list[types.ImageContent | types.TextContent]:
     """
     Take a screenshot from the printer camera (RTSP stream).
@@ -276,7 +339,7 @@ async def get_camera_frame() -> list[types.ImageContent | types.TextContent]:
 
     try:
         # Run blocking cv2/IO in a separate thread
-        image_base64 = await asyncio.to_thread(capture_frame_base64, camera_url)
+        image_base64 = await executors.run("camera", capture_frame_base64, camera_url)
         
         if not image_base64:
              return [types.TextContent(type="text", text="Failed to capture image from camera.")]
@@ -295,10 +358,11 @@ async def get_printer_status_for_gemini():
     except Exception as e:
         return {"error": f"Failed to get status: {str(e)}"}
 
-async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=None, prompt=None, media_resolution="MEDIA_RESOLUTION_MEDIUM") -> list[types.TextContent | types.ImageContent]:
+async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=None, prompt=None, media_resolution="MEDIA_RESOLUTION_MEDIUM", source=None) -> list[types.TextContent | types.ImageContent]:
     """
     Helper function to perform analysis using Gemini with specified thinking level and tools.
     Handles multi-turn function calling interactions.
+    The result and frame are recorded in the incident store; the frame is returned as a URI, not as image data.
     """
     if not client:
         return [types.TextContent(type="text", text=json.dumps({"error": "Gemini API key not configured"}))]
@@ -352,11 +416,13 @@ async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=Non
         current_turn = 0
         
         while current_turn < MAX_TURNS:
-            response = await client.aio.models.generate_content(
-                model='gemini-3-flash-preview',
-                contents=contents,
-                config=config
-            )
+            with metrics.track("gemini", "analyze_frame") as call:
+                call.span.set(turn=current_turn, thinking_level=thinking_level)
+                response = await client.aio.models.generate_content(
+                    model='gemini-3-flash-preview',
+                    contents=contents,
+                    config=config
+                )
 
             # Check for function calls
             # The structure of `response` depends on the SDK, but typically we check candidates[0].content.parts
@@ -370,10 +436,18 @@ async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=Non
 
             if not function_calls:
                 # No function calls, this is the final response
-                return [
-                    types.ImageContent(type="image", data=image_base64, mimeType="image/jpeg"),
-                    types.TextContent(type="text", text=response.text, mimeType="application/json")
-                ]
+                try:
+                    analysis = json.loads(response.text)
+                except (json.JSONDecodeError, TypeError):
+                    analysis = None
+                if not isinstance(analysis, dict):
+                    analysis = {"raw": response.text}
+                incident = await _record_incident(analysis, image_bytes, source=source)
+                result = [types.TextContent(type="text", text=json.dumps(_incident_summary(incident, analysis)), mimeType="application/json")]
+                if incident is None:
+                    # Nowhere to refer to, so the frame goes inline as before
+                    result.insert(0, types.ImageContent(type="image", data=image_base64, mimeType="image/jpeg"))
+                return result
             
             # If we have function calls, execute them
             # Append the model's response (with function calls) to history
@@ -385,11 +459,12 @@ async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=Non
                 
                 # Execute valid tools
                 function_result = None
-                if func_name == "get_printer_status_for_gemini":
-                    result_data = await get_printer_status_for_gemini()
-                    function_result = json.dumps(result_data)
-                else:
-                    function_result = json.dumps({"error": f"Unknown function {func_name}"})
+                with tracing.span("gemini.function_call", function=func_name, turn=current_turn):
+                    if func_name == "get_printer_status_for_gemini":
+                        result_data = await get_printer_status_for_gemini()
+                        function_result = json.dumps(result_data)
+                    else:
+                        function_result = json.dumps({"error": f"Unknown function {func_name}"})
                 
                 # Append function response to history
                 contents.append(genai_types.Content(
@@ -415,6 +490,7 @@ async def _analyze_with_gemini(image_base64: str, thinking_level: str, tools=Non
         "resourceUri": ANALYSIS_URI
     }
 })
+@instrumented
 async def quick_print_check() -> list[types.TextContent | types.ImageContent]:
     """
     Perform a quick status check of the print. 
@@ -426,7 +502,7 @@ async def quick_print_check() -> list[types.TextContent | types.ImageContent]:
         return [types.TextContent(type="text", text=json.dumps({"error": "CAMERA_URL not set"}))]
 
     # Capture image with 50% quality
-    image_base64 = await asyncio.to_thread(capture_frame_base64, camera_url, quality=50)
+    image_base64 = await executors.run("camera", capture_frame_base64, camera_url, quality=50)
     if not image_base64:
         return [types.TextContent(type="text", text=json.dumps({"error": "Failed to capture image"}))]
 
@@ -440,7 +516,7 @@ async def quick_print_check() -> list[types.TextContent | types.ImageContent]:
     }
     Do NOT list specific issues. Keep the response minimal."""
     
-    return await _analyze_with_gemini(image_base64, thinking_level="LOW", tools=[get_printer_status_for_gemini], prompt=prompt, media_resolution="MEDIA_RESOLUTION_LOW")
+    return await _analyze_with_gemini(image_base64, thinking_level="LOW", tools=[get_printer_status_for_gemini], prompt=prompt, media_resolution="MEDIA_RESOLUTION_LOW", source="quick_print_check")
 
 
 @mcp.tool(meta={
@@ -448,6 +524,7 @@ async def quick_print_check() -> list[types.TextContent | types.ImageContent]:
         "resourceUri": ANALYSIS_URI
     }
 })
+@instrumented
 async def deep_print_check() -> list[types.TextContent | types.ImageContent]:
     """
     Perform a deep, complex diagnosis of a potential failure.
@@ -458,15 +535,77 @@ async def deep_print_check() -> list[types.TextContent | types.ImageContent]:
         return [types.TextContent(type="text", text=json.dumps({"error": "CAMERA_URL not set"}))]
 
     # Capture image with higher quality (80%) for deep analysis
-    image_base64 = await asyncio.to_thread(capture_frame_base64, camera_url, quality=80)
+    image_base64 = await executors.run("camera", capture_frame_base64, camera_url, quality=80)
     if not image_base64:
         return [types.TextContent(type="text", text=json.dumps({"error": "Failed to capture image"}))]
 
     # Use HIGH thinking
-    return await _analyze_with_gemini(image_base64, thinking_level="HIGH", media_resolution="MEDIA_RESOLUTION_HIGH")
+    return await _analyze_with_gemini(image_base64, thinking_level="HIGH", media_resolution="MEDIA_RESOLUTION_HIGH", source="deep_print_check")
 
 INCIDENT_URI = "ui://printer-incident.html"
 
+# Standard operating procedures for incident review, indexed in memory and rebuilt when a file changes
+sop_library = sop_index.SOPIndex()
+SAFETY_SOP = "safety"
+SOPS_PER_ISSUE = 2
+
+# Check results and their frames, kept once on disk and referred to by id and resource URI
+incidents = incident_store.IncidentStore()
+
+async def _record_incident(analysis: dict, frame: bytes | None, source: str | None = None) -> dict | None:
+    """Stores an analysis with its frame. The analysis is still returned without the store, so errors only print."""
+    try:
+        return await executors.run("io", incidents.record, analysis, frame, source=source)
+    except Exception as e:
+        print(f"Could not record incident: {e}")
+        return None
+
+def _incident_summary(incident: dict | None, analysis: dict) -> dict:
+    """The analysis with the id of its incident and the URI of its frame, for tool results."""
+    if incident is None:
+        return analysis
+    return {**analysis, "incident_id": incident["id"], "frame_uri": incident["frame_uri"]}
+
+def _frame_id(frame: str) -> str:
+    return frame[len(incident_store.FRAME_URI_PREFIX):] if frame.startswith(incident_store.FRAME_URI_PREFIX) else frame
+
+@mcp.resource(incident_store.FRAME_URI_PREFIX + "{frame_id}", mime_type="image/jpeg")
+async def incident_frame(frame_id: str) -> bytes:
+    """Camera frame of a recorded incident."""
+    frame = await executors.run("io", incidents.read_frame, frame_id)
+    if frame is None:
+        raise ValueError(f"Frame not found: {frame_id}")
+    return frame[0]
+
+@mcp.tool()
+@instrumented
+async def get_incident_frame(frame: str) -> list[types.TextContent | types.ImageContent]:
+    """
+    Get the camera frame of a recorded incident.
+
+    Args:
+        frame: Frame URI (incident://frames/...) or frame id, from an incident or print check result
+    """
+    stored = await executors.run("io", incidents.read_frame, _frame_id(frame))
+    if stored is None:
+        return [types.TextContent(type="text", text=f"Frame not found: {frame}")]
+    data, mime_type = stored
+    return [types.ImageContent(type="image", data=base64.b64encode(data).decode("ascii"), mimeType=mime_type)]
+
+@mcp.tool()
+@instrumented
+async def list_incidents(status: str | None = None, limit: int = 20, offset: int = 0) -> list[types.TextContent]:
+    """
+    List recorded print checks and incidents as JSON, newest first, with their frame URIs.
+
+    Args:
+        status: Only results with this status ("ok", "warning", "failure")
+        limit: Maximum number of results
+        offset: Number of results to skip, for paging
+    """
+    page = await executors.run("io", incidents.list, status=status, limit=limit, offset=offset)
+    return [types.TextContent(type="text", text=json.dumps(page), mimeType="application/json")]
+
 @mcp.resource(
     INCIDENT_URI,
     mime_type="text/html;profile=mcp-app",
@@ -474,18 +613,14 @@ INCIDENT_URI = "ui://printer-incident.html"
 )
 def printer_incident() -> str:
     """Incident Dashboard HTML resource."""
-    path = os.path.join(os.path.dirname(__file__), "resources/printer-incident.html")
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return "<html><body><h1>Error: printer-incident.html not found</h1></body></html>"
+    return ui.html("printer-incident.html")
 
 @mcp.tool(meta={
     "ui": {
         "resourceUri": INCIDENT_URI
     }
 })
+@instrumented
 async def simulate_spaghetti_incident() -> list[types.TextContent]:
     """
     Simulate a spaghetti failure incident for testing the UI.
@@ -507,17 +642,18 @@ async def simulate_spaghetti_incident() -> list[types.TextContent]:
         "resourceUri": INCIDENT_URI
     }
 })
-async def review_latest_incident(analysis: dict | str, image: str | None = None) -> list[types.TextContent]:
+@instrumented
+async def review_latest_incident(analysis: dict | str | None = None, image: str | None = None, incident_id: int | None = None) -> list[types.TextContent]:
     """
     Review a detected incident.
-    Returns the analysis report, snapshot, and relevant SOPs.
+    Returns the analysis report, the URI of its snapshot, and relevant SOPs.
+    Without arguments, reviews the latest recorded check that was not "ok".
     
     Args:
-        analysis: Analysis result object or JSON string (status, issues, etc.)
-        image: Optional base64 encoded image string
+        analysis: Analysis result object or JSON string (status, issues, etc.); recorded as a new incident
+        image: Optional base64 encoded image string, stored with a new incident
+        incident_id: Review a recorded incident instead, e.g. from a print check result
     """
-    import glob
-    
     analysis_data = analysis
     if isinstance(analysis, str):
         try:
@@ -528,80 +664,615 @@ async def review_latest_incident(analysis: dict | str, image: str | None = None)
                 "analysis": None,
                 "sops": []
             }))]
+
+    if analysis_data is not None:
+        try:
+            frame = base64.b64decode(image) if image else None
+        except ValueError:
+            return [types.TextContent(type="text", text=json.dumps({
+                "error": "Invalid base64 image provided.",
+                "analysis": None,
+                "sops": []
+            }))]
+        incident = await _record_incident(analysis_data, frame, source="review_latest_incident")
+    elif incident_id is not None:
+        incident = await executors.run("io", incidents.get, incident_id)
+    else:
+        incident = await executors.run("io", incidents.latest)
+    if incident is None and analysis_data is None:
+        return [types.TextContent(type="text", text=json.dumps({
+            "error": f"Incident {incident_id} not found." if incident_id is not None else "No incidents recorded.",
+            "analysis": None,
+            "sops": []
+        }))]
+    if incident is not None:
+        analysis_data = incident["analysis"]
     
-    # Find relevant SOPs
+    # Match issues to SOPs through the in-memory index: names, aliases and headings, ranked.
+    # A changed SOP directory is re-read on the I/O pool, so the searches below stay in memory
+    await executors.run("io", sop_library.refresh)
     sops = []
-    sop_dir = os.path.join(os.path.dirname(__file__), "assets/sop")
-    
-    # Always include Safety SOP
-    safety_path = os.path.join(sop_dir, "safety.md")
-    # Match issues to SOPs
-    if analysis_data.get("issues"):
-        for issue in analysis_data["issues"]:
-            issue_type = issue.get("type", "").lower()
-            # Simple keyword matching against filenames
-            for sop_file in glob.glob(os.path.join(sop_dir, "*.md")):
-                filename = os.path.basename(sop_file).lower()
-                clean_name = filename.replace(".md", "").replace("_", " ")
-                
-                # Check for match (either direction)
-                if (clean_name in issue_type) or (issue_type in clean_name):
-                    # Avoid duplicates
-                    if not any(s["title"] == clean_name.title() for s in sops):
-                        with open(sop_file, "r", encoding="utf-8") as f:
-                            sops.append({
-                                "title": clean_name.replace("_", " ").title(),
-                                "content": f.read()
-                            })
+    matched = set()
+    for issue in analysis_data.get("issues") or []:
+        for match in sop_library.search(issue.get("type", ""), limit=SOPS_PER_ISSUE):
+            sop = sop_library.get(match["name"])
+            if sop and sop.name not in matched and sop.name != SAFETY_SOP:
+                matched.add(sop.name)
+                sops.append({"title": sop.title, "content": sop.content})
 
     # Always include Safety SOP at the end
-    safety_path = os.path.join(sop_dir, "safety.md")
-    if os.path.exists(safety_path):
-        with open(safety_path, "r", encoding="utf-8") as f:
-            sops.append({"title": "Safety Protocols", "content": f.read()})
+    safety = sop_library.get(SAFETY_SOP)
+    if safety:
+        sops.append({"title": "Safety Protocols", "content": safety.content})
 
     # Construct response
     result = {
+        "incident_id": incident["id"] if incident else None,
+        "created_at": incident["created_at"] if incident else None,
         "analysis": analysis_data,
-        "image": image,
+        "frame_uri": incident["frame_uri"] if incident else None,
         "sops": sops
     }
     
     
     return [types.TextContent(type="text", text=json.dumps(result), mimeType="application/json")]
 
+# Artifact indexes by models directory, opened on first use
+artifact_stores: dict[str, artifact_store.ArtifactStore] = {}
+
+def _artifact_store() -> artifact_store.ArtifactStore:
+    store = artifact_stores.get(MODELS_DIR)
+    if store is None:
+        store = artifact_stores[MODELS_DIR] = artifact_store.ArtifactStore(MODELS_DIR)
+    return store
+
+async def _record_artifact(filename: str, **fields):
+    """Indexes a new artifact and enforces the disk quota. Files work without the index, so errors only print."""
+    store = _artifact_store()
+    try:
+        await executors.run("io", store.register, filename, **fields)
+        await executors.run("io", store.collect_garbage)
+    except Exception as e:
+        print(f"Could not index {filename}: {e}")
+
+async def _touch_artifact(filename: str):
+    """Marks an artifact as used for the least recently used garbage collection."""
+    try:
+        await executors.run("io", _artifact_store().touch, filename)
+    except Exception as e:
+        print(f"Could not index {filename}: {e}")
+
+async def _model_name(filename: str | None) -> str:
+    """Safe filename stem for a new model; without a filename, a generated_model name no model has yet."""
+    if filename is None:
+        unique = await executors.run("io", _artifact_store().unique_name, "generated_model.stl")
+        return os.path.splitext(unique)[0]
+    return "".join(x for x in filename if x.isalnum() or x in "_-") or "generated_model"
+
+def _describe_artifact(item: dict) -> str:
+    """Listing line of an artifact index row: name, then size, print time and prompt when known."""
+    details = []
+    metadata = item["metadata"]
+    if metadata.get("size"):
+        details.append(" x ".join(f"{v:g}" for v in metadata["size"]) + " mm")
+    if metadata.get("print_time"):
+        details.append(metadata["print_time"])
+    if item["prompt"]:
+        prompt = item["prompt"] if len(item["prompt"]) <= 60 else item["prompt"][:57] + "..."
+        details.append(f'"{prompt}"')
+    return item["name"] + (f" ({', '.join(details)})" if details else "")
+
+# Thumbnails one list_local_models call renders at once
+THUMBNAIL_CONCURRENCY = max(1, int(os.getenv("THUMBNAIL_CONCURRENCY", "4")))
+
 @mcp.tool()
-async def list_local_models() -> str:
-    """List available STL files in the local models directory."""
+@instrumented
+async def list_local_models(thumbnails: bool = False, search: str | None = None, kind: str = "model",
+                            limit: int = 50, offset: int = 0) -> str | list[types.TextContent | types.ImageContent]:
+    """
+    List files in the local models directory, newest first, with the size and the prompt of
+    generated models and the print time of sliced G-code.
+    Set thumbnails to true to get a small rendered image after each model name.
+
+    Args:
+        thumbnails: Add a rendered thumbnail after each STL model.
+        search: Only list files whose name or generation prompt contains this text.
+        kind: "model" (STL), "gcode", "preview" (PNG), "export" (3MF) or "all".
+        limit: Entries per page.
+        offset: Entries to skip, for the next page.
+    """
     try:
-        files = glob.glob(os.path.join(MODELS_DIR, "*.stl"))
-        if not files:
-            return "No STL files found in models directory."
-        
-        return "Available models:\n" + "\n".join([os.path.basename(f) for f in files])
+        # Served from the artifact index, which only rescans the directory when it changed
+        page = await executors.run("io", _artifact_store().list, None if kind == "all" else kind, search,
+                                       max(limit, 1), max(offset, 0))
+        items = page["items"]
+        if not items:
+            if kind == "model" and not search and not offset:
+                return "No STL files found in models directory."
+            return "No matching files found in models directory."
+
+        header = "Available models:" if kind == "model" else "Available files:"
+        footer = None
+        if page["offset"] + len(items) < page["total"]:
+            footer = (f"Showing {page['offset'] + 1}-{page['offset'] + len(items)} of {page['total']}; "
+                      f"use offset={page['offset'] + len(items)} for more.")
+        if not thumbnails:
+            return "\n".join([header] + [_describe_artifact(item) for item in items] + ([footer] if footer else []))
+
+        # Thumbnails are cached next to the models and only re-rendered when a model changes.
+        # A page of uncached models renders a few at a time, not all at once
+        models = [item for item in items if item["kind"] == "model"]
+        semaphore = asyncio.Semaphore(THUMBNAIL_CONCURRENCY)
+
+        async def render_thumbnail(item: dict) -> str | None:
+            async with semaphore:
+                return await stl_generator.render_stl_thumbnail(os.path.join(MODELS_DIR, item["name"]))
+
+        paths = await asyncio.gather(*(render_thumbnail(item) for item in models))
+        thumbnails_by_name = {item["name"]: path for item, path in zip(models, paths)}
+        content = [types.TextContent(type="text", text=header)]
+        for item in items:
+            content.append(types.TextContent(type="text", text=_describe_artifact(item)))
+            if item["name"] in thumbnails_by_name:
+                image_base64 = await executors.run("io", stl_generator.read_preview_base64, thumbnails_by_name[item["name"]])
+                if image_base64:
+                    content.append(types.ImageContent(type="image", data=image_base64, mimeType="image/png"))
+        if footer:
+            content.append(types.TextContent(type="text", text=footer))
+        return content
     except Exception as e:
         return f"Error listing models: {str(e)}"
 
 @mcp.tool()
-async def slice_model(model_filename: str, intent: str = "default") -> str:
+@instrumented
+async def get_storage_stats() -> list[types.TextContent]:
     """
-    Slice a 3D model (STL) into G-code with specific settings based on intent.
-    Intent examples: 'draft', 'fast', 'strong', 'detail'.
+    Models directory usage as JSON: artifact counts by kind, bytes used (identical files counted
+    once) and the quota beyond which the least recently used G-code and previews are deleted
+    (0 when ARTIFACT_QUOTA_MB is not set, nothing is deleted).
     """
+    stats = await executors.run("io", _artifact_store().stats)
+    return [types.TextContent(type="text", text=json.dumps(stats), mimeType="application/json")]
+
+# "text" and "binary" force a format; "auto" opts in to binary G-code whenever the printer can print it
+GCODE_FORMAT = os.getenv("GCODE_FORMAT", "text").lower()
+
+# Printer support for binary G-code, asked once; None until the printer answered
+printer_binary_gcode: bool | None = None
+
+async def use_binary_gcode() -> bool:
+    """Whether slicing should write binary G-code, per GCODE_FORMAT and the printer's get_info."""
+    global printer_binary_gcode
+    if GCODE_FORMAT != "auto":
+        return GCODE_FORMAT == "binary"
+    if printer_binary_gcode is None:
+        try:
+            info = await printer.get_info()
+        except Exception as e:
+            # An offline printer gets text G-code, which every printer reads; ask again next time
+            print(f"Could not query printer capabilities, using text G-code: {e}")
+            return False
+        printer_binary_gcode = bool(info.get("binary_gcode"))
+    return printer_binary_gcode
+
+# Every slicer run goes through this queue, which bounds how many run at once
+slice_jobs = job_queue.JobQueue()
+
+async def _await_slice_job(name: str, work) -> str:
+    """Runs work in the slice queue and waits for its result."""
     try:
-        input_path = os.path.join(MODELS_DIR, model_filename)
-        output_filename = model_filename.lower().replace(".stl", ".gcode")
-        output_path = os.path.join(MODELS_DIR, output_filename)
-        
-        # Run slicing in a separate thread to avoid blocking the event loop
-        result = await asyncio.to_thread(slicer.slice_file, input_path, output_path, intent)
-        
-        if result["success"]:
-            return f"Successfully sliced {model_filename} to {output_filename}.\nMessage: {result['message']}"
-        else:
-            return f"Slicing failed: {result['error']}"
+        job = slice_jobs.submit(name, work)
+    except job_queue.QueueFull as e:
+        return str(e)
+    try:
+        # Shielded so a cancel_slice_job can be told apart from this request being cancelled
+        await asyncio.shield(job.task)
+    except asyncio.CancelledError:
+        if not job.task.cancelled():
+            job.task.cancel()
+            raise
+        return f"Slice job {job.id} was cancelled."
+    if job.status == "failed":
+        return job.error
+    return job.result
+
+async def _prepare_mesh(triangles, intent: str, orient: bool, simplify: bool, stage=lambda name: None) -> tuple:
+    """
+    Turns a mesh into its best print orientation and removes detail finer than the intent's
+    layer height, as slice_model and slice_plate do before slicing.
+
+    Returns:
+        (triangles, changes): the prepared triangles and a report line per step that changed them.
+    """
+    changes = []
+    if orient:
+        # Generated models come out however the SCAD built them, not how they print best
+        stage("orienting")
+        if len(triangles):
+            triangles, report = await executors.run("cpu", orientation.orient, triangles, intent)
+            if report["rotated"]:
+                changes.append(orientation.format_report(report))
+    if simplify:
+        # Detail below the layer height cannot be printed, but costs slicer time per triangle
+        stage("simplifying")
+        if len(triangles) >= mesh_decimation.MIN_TRIANGLES:
+            tolerance = slicer.layer_height(intent) * mesh_decimation.TOLERANCE_FACTOR
+            triangles, report = await executors.run("cpu", mesh_decimation.decimate, triangles, tolerance)
+            if report["applied"]:
+                changes.append(mesh_decimation.format_report(report))
+    return triangles, changes
+
+async def _plan_slice(model_filename: str, intent: str, validate: bool, simplify: bool, orient: bool,
+                      use_cache: bool, binary: bool | None = None, stage=lambda name: None) -> dict:
+    """
+    The part of slice_model that needs no slicer: picks the output, validates the mesh and looks
+    the slice up in the cache. Cheap enough to run before the job is queued.
+
+    Returns:
+        The plan _run_slice slices by, with "cached" set to the tool output of a cache hit.
+
+    Raises:
+        job_queue.JobFailed: the mesh failed validation.
+    """
+    if binary is None:
+        binary = await use_binary_gcode()
+    output_filename = os.path.splitext(model_filename.lower())[0] + (".bgcode" if binary else ".gcode")
+    plan = {"model_filename": model_filename, "intent": intent, "simplify": simplify, "orient": orient,
+            "binary": binary, "output_filename": output_filename, "output_path": os.path.join(MODELS_DIR, output_filename),
+            "geometry": None, "cache_key": None, "cached": None}
+    await _touch_artifact(model_filename)
+    # PrusaSlicer needs a plain file, compressed models are unpacked into the artifact cache
+    input_path = await executors.run("io", artifacts.resolve, os.path.join(MODELS_DIR, model_filename))
+    plan["input_path"] = input_path = input_path or os.path.join(MODELS_DIR, model_filename)
+
+    # A broken or oversized mesh fails in milliseconds here instead of after a full slicer run
+    stage("validating")
+    if validate and input_path.lower().endswith(".stl") and os.path.exists(input_path):
+        report = await executors.run("cpu", mesh_analysis.validate_mesh, input_path)
+        if report["stats"] and report["stats"]["triangles"]:
+            plan["geometry"] = print_estimator.geometry_from_stats(report["stats"])
+        if not report["ok"]:
+            raise job_queue.JobFailed(f"Mesh validation failed for {model_filename}: {mesh_analysis.format_report(report)}")
+
+    slicer_version = await slicer.get_version() if use_cache and slice_cache.SLICE_CACHE else None
+    # Results of an unidentified slicer build could be served after an upgrade, so they are not cached
+    if slicer_version and slicer_version != UNKNOWN_VERSION and os.path.exists(input_path):
+        # Keyed by content, not name: a model saved under another name reuses the result
+        stage("checking cache")
+        digest = await executors.run("io", slice_cache.file_digest, input_path)
+        plan["cache_key"] = slice_cache.cache_key(digest, slicer.output_args(intent, binary), slicer_version, {
+            "orient": orient and {"weights": orientation.weights_for_intent(intent),
+                                  "overhang_angle": orientation.OVERHANG_ANGLE},
+            "simplify": simplify and {"tolerance_factor": mesh_decimation.TOLERANCE_FACTOR,
+                                      "min_triangles": mesh_decimation.MIN_TRIANGLES},
+        })
+        output_path = plan["output_path"]
+        metadata = await executors.run("io", slice_cache.lookup, plan["cache_key"], output_path)
+        if metadata is not None:
+            index = await executors.run("io", gcode_index.load_index, output_path)
+            await executors.run("cpu", artifacts.finalize, output_path)
+            await _record_artifact(output_filename, source=model_filename,
+                                   metadata={"intent": intent, **index["metadata"]})
+            summary = gcode_index.format_metadata(index["metadata"])
+            plan["cached"] = f"Successfully sliced {model_filename} to {output_filename} (cached)." + (f"\n{summary}" if summary else "")
+    return plan
+
+async def _run_slice(plan: dict, stage=lambda name: None) -> str:
+    """
+    The slicer part of slice_model, run as a slice job: prepares the mesh, slices it and stores
+    the result.
+
+    Raises:
+        job_queue.JobFailed: the slicer failed.
+    """
+    model_filename, intent, binary = plan["model_filename"], plan["intent"], plan["binary"]
+    input_path, output_path, output_filename = plan["input_path"], plan["output_path"], plan["output_filename"]
+    # Without preparation the validated mesh is the one sliced
+    geometry = plan["geometry"]
+    async with _work_dir() as work_dir:
+        notes = ""
+        if (plan["orient"] or plan["simplify"]) and input_path.lower().endswith(".stl") and os.path.exists(input_path):
+            triangles = await executors.run("cpu", mesh_analysis.load_stl, input_path)
+            triangles, changes = await _prepare_mesh(triangles, intent, plan["orient"], plan["simplify"], stage)
+            if geometry is not None:
+                # Calibration samples describe the part as sliced: oriented height, simplified surface
+                geometry = await executors.run("cpu", print_estimator.mesh_geometry, triangles)
+            if changes:
+                stem = os.path.splitext(os.path.basename(input_path))[0]
+                input_path = os.path.join(work_dir, f"{stem}.prepared.stl")
+                await executors.run("cpu", mesh_analysis.write_binary_stl, input_path, triangles)
+                notes += "".join("\n" + change for change in changes)
+
+        # The slicer runs as a bounded subprocess; cancelling the job kills it
+        stage("slicing")
+        artifacts.unshare(output_path)
+        result = await slicer.slice_file(input_path, output_path, intent)
+
+    if not result["success"]:
+        raise job_queue.JobFailed(f"Slicing failed: {result['error']}")
+    slice_metadata = {"intent": intent}
+    if os.path.exists(output_path):
+        # Layer offsets and the footer estimates, cached next to the G-code for status and layer lookups
+        stage("indexing")
+        index = await executors.run("io", gcode_index.load_index, output_path)
+        slice_metadata.update(index["metadata"])
+        if gcode_index.format_metadata(index["metadata"]):
+            notes += "\n" + gcode_index.format_metadata(index["metadata"])
+    if plan["cache_key"] and os.path.exists(output_path):
+        try:
+            # Geometry and arguments make the entry a calibration sample for estimate_print
+            info = {"intent": intent, "args": slicer.output_args(intent, binary), "geometry": geometry}
+            await executors.run("io", slice_cache.store, plan["cache_key"], output_path, info)
+        except OSError as e:
+            # The slice itself succeeded, a full disk only costs the next run
+            notes += f"\nCould not cache the result: {e}"
+    await executors.run("cpu", artifacts.finalize, output_path)
+    if artifacts.exists(output_path):
+        await _record_artifact(output_filename, source=model_filename, metadata=slice_metadata)
+    return f"Successfully sliced {model_filename} to {output_filename}.\nMessage: {result['message']}{notes}"
+
+async def _slice_model(model_filename: str, intent: str, validate: bool, simplify: bool, orient: bool,
+                       use_cache: bool, binary: bool | None = None, stage=lambda name: None) -> str:
+    """Body of submit_slice_job, run as a slice job. stage is called with each step's name."""
+    plan = await _plan_slice(model_filename, intent, validate, simplify, orient, use_cache, binary, stage)
+    return plan["cached"] or await _run_slice(plan, stage)
+
+async def _await_slice_model(model_filename: str, intent: str, validate: bool, simplify: bool, orient: bool,
+                             use_cache: bool, binary: bool | None = None, stage=lambda name: None) -> str:
+    """
+    slice_model: validates and checks the cache right away, so a cache hit never waits for a
+    slicer worker, then slices in the queue. stage is called with each step's name.
+    """
+    try:
+        plan = await _plan_slice(model_filename, intent, validate, simplify, orient, use_cache, binary, stage)
+    except job_queue.JobFailed as e:
+        return str(e)
     except Exception as e:
         return f"Error executing slice: {str(e)}"
+    if plan["cached"]:
+        return plan["cached"]
+
+    def work(job):
+        def job_stage(name):
+            job.set_stage(name)
+            stage(name)
+        return _run_slice(plan, job_stage)
+
+    stage("queued")
+    return await _await_slice_job(f"slice {model_filename}", work)
+
+@mcp.tool()
+@instrumented
+async def slice_model(model_filename: str, intent: str = "default", validate: bool = True, simplify: bool = True,
+                      orient: bool = True, use_cache: bool = True, binary: bool | None = None) -> str:
+    """
+    Slice a 3D model (STL) into G-code with specific settings based on intent.
+    Intent examples: 'draft', 'fast', 'strong', 'detail'.
+    Set validate to false to skip the mesh check (watertight, fits the bed) before slicing.
+    Set simplify to false to slice over-tessellated meshes as they are instead of removing
+    detail finer than the intent's layer height first.
+    Set orient to false to print the model in its modeled orientation instead of the one
+    with the least support material for the intent (see analyze_orientation).
+    Set use_cache to false to run the slicer even if the same model was sliced with the same
+    settings before.
+    Set binary to true or false to force binary (.bgcode) or text (.gcode) G-code; by default
+    text is used unless GCODE_FORMAT is "binary", or "auto" and the printer supports it (see get_printer_info).
+    Waits for the result; for large models use submit_slice_job instead, which returns a job id at once.
+    """
+    return await _await_slice_model(model_filename, intent, validate, simplify, orient, use_cache, binary)
+
+@mcp.tool()
+@instrumented
+async def submit_slice_job(model_filename: str, intent: str = "default", validate: bool = True, simplify: bool = True,
+                           orient: bool = True, use_cache: bool = True, binary: bool | None = None) -> str:
+    """
+    Queue a model for slicing and return a job id immediately, without waiting for the slicer.
+    Takes the same arguments as slice_model. Poll the job with get_slice_job, stop it with cancel_slice_job.
+    """
+    try:
+        job = slice_jobs.submit(f"slice {model_filename}", lambda job: _slice_model(
+            model_filename, intent, validate, simplify, orient, use_cache, binary, job.set_stage))
+    except job_queue.QueueFull as e:
+        return str(e)
+    ahead = slice_jobs.queued() + slice_jobs.running() - 1
+    return (f"Queued slice job {job.id} for {model_filename} ({ahead} jobs ahead of it). "
+            f"Check it with get_slice_job('{job.id}').")
+
+@mcp.tool()
+@instrumented
+async def get_slice_job(job_id: str, wait: bool = False, timeout: float = 60) -> list[types.TextContent]:
+    """
+    Get the status, current stage, timings and (once done) result of a slice job as JSON.
+
+    Args:
+        job_id: Id returned by submit_slice_job.
+        wait: Block until the job finishes (at most timeout seconds).
+        timeout: Maximum seconds to wait when wait is true.
+    """
+    job = slice_jobs.get(job_id)
+    if job is None:
+        return [types.TextContent(type="text", text=f"Slice job not found: {job_id}")]
+    if wait and not job.done:
+        # Unlike wait_for, neither a timeout nor this request being cancelled touches the job
+        await asyncio.wait([job.task], timeout=timeout)
+    return [types.TextContent(type="text", text=json.dumps(job.to_dict()), mimeType="application/json")]
+
+@mcp.tool()
+@instrumented
+async def cancel_slice_job(job_id: str) -> str:
+    """Cancel a queued or running slice job; a running slicer process is killed."""
+    if slice_jobs.get(job_id) is None:
+        return f"Slice job not found: {job_id}"
+    if not slice_jobs.cancel(job_id):
+        return f"Slice job {job_id} already finished."
+    return f"Cancelled slice job {job_id}."
+
+@mcp.tool()
+@instrumented
+async def get_slice_queue_stats() -> list[types.TextContent]:
+    """
+    Slicing queue statistics as JSON: workers, queued and running jobs, job counts by outcome and
+    wait/run time summaries (seconds) of recent jobs.
+    """
+    return [types.TextContent(type="text", text=json.dumps(slice_jobs.stats()), mimeType="application/json")]
+
+@mcp.tool()
+@instrumented
+async def get_executor_stats() -> list[types.TextContent]:
+    """
+    Worker pool occupancy as JSON, by pool: camera captures, CPU-bound mesh and image work, file
+    and database I/O, and external tool waiters. Workers busy now and at peak, tasks queued for a
+    worker and queue wait summaries (milliseconds) of recent tasks.
+    """
+    return [types.TextContent(type="text", text=json.dumps(executors.stats()), mimeType="application/json")]
+
+# Event loop lag, sampled while the server runs; LOOP_BLOCK_DEBUG logs the stack of blocking calls
+loop_lag = loop_monitor.LoopMonitor()
+
+@mcp.tool()
+@instrumented
+async def get_loop_stats() -> list[types.TextContent]:
+    """
+    Event loop lag as JSON: how late the loop ran scheduled work in recent samples (milliseconds)
+    and how many samples exceeded the blocking threshold. Lag means some call blocked every client.
+    """
+    return [types.TextContent(type="text", text=json.dumps(loop_lag.stats()), mimeType="application/json")]
+
+@contextlib.asynccontextmanager
+async def _work_dir():
+    """A temporary directory, created and removed on the I/O pool: removing intermediate meshes takes a while."""
+    work_dir = await executors.run("io", tempfile.mkdtemp)
+    try:
+        yield work_dir
+    finally:
+        await executors.run("io", shutil.rmtree, work_dir, True)
+
+async def _slice_plate(parts: dict[str, int], intent: str, plate_name: str, orient: bool, simplify: bool,
+                       binary: bool | None = None, stage=lambda name: None) -> str:
+    """
+    Body of slice_plate, run as a slice job.
+
+    Raises:
+        job_queue.JobFailed: the parts cannot be plated or the slicer failed.
+    """
+    safe_name = "".join(x for x in plate_name if x.isalnum() or x in "_-") or "plate"
+    if not parts:
+        raise job_queue.JobFailed("No parts given.")
+    if any(quantity < 1 or quantity > plate_packer.MAX_QUANTITY for quantity in parts.values()):
+        raise job_queue.JobFailed(f"Quantities must be between 1 and {plate_packer.MAX_QUANTITY}.")
+    if sum(parts.values()) > plate_packer.MAX_PARTS:
+        raise job_queue.JobFailed(f"A plate holds at most {plate_packer.MAX_PARTS} parts.")
+
+    stage("preparing parts")
+    prepared = []
+    for model_filename, quantity in parts.items():
+        stl_path = await executors.run("io", artifacts.resolve, os.path.join(MODELS_DIR, model_filename))
+        if stl_path is None:
+            raise job_queue.JobFailed(f"Model not found: {model_filename}")
+        report = await executors.run("cpu", mesh_analysis.validate_mesh, stl_path)
+        if not report["ok"]:
+            raise job_queue.JobFailed(f"Mesh validation failed for {model_filename}: {mesh_analysis.format_report(report)}")
+        triangles = await executors.run("cpu", mesh_analysis.load_stl, stl_path)
+        triangles, _ = await _prepare_mesh(triangles, intent, orient, simplify)
+        prepared.append((model_filename, triangles, quantity))
+
+    placed, plate = await executors.run("cpu", plate_packer.build_plate, prepared)
+    if not placed:
+        raise job_queue.JobFailed(f"None of the parts fit on the bed.\n{plate_packer.format_report(plate)}")
+
+    if binary is None:
+        binary = await use_binary_gcode()
+    output_filename = f"{safe_name}.bgcode" if binary else f"{safe_name}.gcode"
+    output_path = os.path.join(MODELS_DIR, output_filename)
+    async with _work_dir() as work_dir:
+        input_paths = await executors.run("cpu", plate_packer.write_plate, placed, work_dir)
+        # One slicer launch for the whole plate instead of one per part
+        stage("slicing")
+        artifacts.unshare(output_path)
+        result = await slicer.slice_plate(input_paths, output_path, intent)
+
+    if not result["success"]:
+        raise job_queue.JobFailed(f"Slicing failed: {result['error']}")
+    await executors.run("cpu", artifacts.finalize, output_path)
+    if artifacts.exists(output_path):
+        await _record_artifact(output_filename, metadata={"intent": intent, "parts": parts})
+    return f"Successfully sliced plate to {output_filename}.\n{plate_packer.format_report(plate)}"
+
+@mcp.tool()
+@instrumented
+async def slice_plate(parts: dict[str, int], intent: str = "default", plate_name: str = "plate",
+                      orient: bool = True, simplify: bool = True, binary: bool | None = None) -> str:
+    """
+    Pack several models onto one build plate and slice them together in a single G-code file.
+    Use this instead of slicing small parts one by one: it fills the bed and runs the slicer once.
+
+    Args:
+        parts: STL filename to number of copies, e.g. {"clip.stl": 6, "gear.stl": 2}.
+        intent: Slicing intent ('draft', 'fast', 'strong', 'detail'), as for slice_model.
+        plate_name: Output name without extension, the G-code is written as <plate_name>.gcode (or .bgcode).
+        orient: Turn every part into its best print orientation first.
+        simplify: Remove detail finer than the layer height from over-tessellated parts.
+        binary: Force binary (.bgcode) or text G-code, as for slice_model.
+    """
+    return await _await_slice_job(f"plate {plate_name}", lambda job: _slice_plate(
+        parts, intent, plate_name, orient, simplify, binary, job.set_stage))
+
+# Intents compared by estimate_print when none are given
+ESTIMATE_INTENTS = ["draft", "default", "strong", "detail"]
+
+@mcp.tool()
+@instrumented
+async def estimate_print(model_filename: str, intents: list[str] | None = None) -> list[types.TextContent]:
+    """
+    Estimate print time and filament for a model at several intents without slicing, in milliseconds.
+    Use it to choose an intent, then slice only that one with slice_model.
+    The estimates come from the mesh volume, surface area and height, in the orientation slice_model
+    prints it in for each intent, and each intent's slicer settings, corrected against earlier
+    real slice results.
+
+    Args:
+        model_filename: STL filename in the local models directory.
+        intents: Intents to compare, defaults to draft, default, strong and detail.
+    """
+    stl_path = await executors.run("io", artifacts.resolve, os.path.join(MODELS_DIR, model_filename))
+    if stl_path is None:
+        return [types.TextContent(type="text", text=f"Model not found: {model_filename}")]
+    try:
+        triangles = await executors.run("cpu", mesh_analysis.load_stl, stl_path)
+    except (OSError, ValueError) as e:
+        return [types.TextContent(type="text", text=f"Could not read {model_filename}: {e}")]
+    intent_args = {intent: slicer.output_args(intent) for intent in (intents or ESTIMATE_INTENTS)}
+    # The height, and so the layer count, is that of the orientation slice_model picks per intent
+    oriented = await asyncio.gather(*(_prepare_mesh(triangles, intent, True, False) for intent in intent_args))
+    geometry = {intent: await executors.run("cpu", print_estimator.mesh_geometry, prepared)
+                for intent, (prepared, _) in zip(intent_args, oriented)}
+    result = {"model": model_filename, "geometry": geometry,
+              **await executors.run("cpu", print_estimator.compare_intents, geometry, intent_args)}
+    return [types.TextContent(type="text", text=json.dumps(result), mimeType="application/json")]
+
+@mcp.tool()
+@instrumented
+async def analyze_orientation(model_filename: str, intent: str = "default", top: int = 5) -> list[types.TextContent]:
+    """
+    Score print orientations of a model: support (overhang) area, bed contact area and height.
+    Returns the best candidates for the intent ('fast' weights height, 'strong' bed contact,
+    'detail' overhangs) and the current orientation as JSON. slice_model applies the best one.
+    """
+    stl_path = await executors.run("io", artifacts.resolve, os.path.join(MODELS_DIR, model_filename))
+    if stl_path is None:
+        return [types.TextContent(type="text", text=f"Model not found: {model_filename}")]
+    try:
+        triangles = await executors.run("cpu", mesh_analysis.load_stl, stl_path)
+        scores = await executors.run("cpu", orientation.score_orientations, triangles, intent)
+    except (OSError, ValueError) as e:
+        return [types.TextContent(type="text", text=f"Could not analyze {model_filename}: {e}")]
+    result = {
+        "intent": intent,
+        "weights": orientation.weights_for_intent(intent),
+        "best": scores[:max(top, 1)],
+        "current": next(s for s in scores if s["current"]),
+    }
+    return [types.TextContent(type="text", text=json.dumps(result), mimeType="application/json")]
 
 
 GENERATOR_URI = "ui://model-generator.html"
@@ -613,61 +1284,485 @@ GENERATOR_URI = "ui://model-generator.html"
 )
 def model_generator_ui() -> str:
     """Model Generator UI resource."""
-    path = os.path.join(os.path.dirname(__file__), "resources/model-generator.html")
+    return ui.html("model-generator.html")
+
+def _mesh_metadata(result: dict) -> dict:
+    """Dimensions and triangle count of a stl_generator.generate_model result, for the artifact index."""
+    mesh = result.get("mesh")
+    return {"size": mesh["size"], "triangles": mesh["triangles"]} if mesh else {}
+
+# How long generate_model waits for the background preview before returning without it
+PREVIEW_WAIT_SECONDS = float(os.getenv("PREVIEW_WAIT_SECONDS", "15"))
+
+# Preview renders keyed by STL filename, so get_model_preview can pick up late results.
+# Finished renders are dropped, their PNG is found on disk
+preview_tasks: dict[str, asyncio.Task] = {}
+
+def _forget_when_done(tasks: dict[str, asyncio.Task], name: str, task: asyncio.Task):
+    """Removes task from tasks once it finishes, unless a newer task took its place by then."""
+    def forget(done: asyncio.Task):
+        if tasks.get(name) is done:
+            del tasks[name]
+    task.add_done_callback(forget)
+
+def start_preview_render(stl_path: str) -> asyncio.Task:
+    """Renders the PNG preview of a finished STL in the background."""
+    filename = os.path.basename(stl_path)
+    previous = preview_tasks.get(filename)
+    if previous and not previous.done():
+        previous.cancel()
+
+    task = asyncio.create_task(stl_generator.render_stl_preview(stl_path))
+    preview_tasks[filename] = task
+    _forget_when_done(preview_tasks, filename, task)
+    return task
+
+async def _await_preview(task: asyncio.Task, timeout: float | None = None) -> str | None:
+    """
+    The PNG path of a preview render, waiting at most timeout seconds without cancelling it.
+
+    Raises:
+        asyncio.TimeoutError: still rendering, or superseded by a newer render of the same model.
+    """
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return "<html><body><h1>Error: model-generator.html not found</h1></body></html>"
+        # Shield so a slow render keeps going after we stop waiting for it
+        return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+    except asyncio.CancelledError:
+        # Only the render being superseded is swallowed, not the cancellation of the caller
+        if not task.cancelled():
+            raise
+        raise asyncio.TimeoutError(f"Preview render of {task.get_name()} was superseded") from None
+
+# Progressive compile: return a low resolution draft fast and build full resolution in the background
+PROGRESSIVE_COMPILE = os.getenv("PROGRESSIVE_COMPILE", "true").lower() == "true"
+
+# Full resolution builds that follow a draft, keyed by final STL filename. Finished builds are
+# dropped, get_generated_model then finds the model on disk
+final_builds: dict[str, asyncio.Task] = {}
+
+async def _remove_draft(final_path: str):
+    """Deletes the draft of a finished full resolution model and its preview, so only the model is listed."""
+    draft_path = stl_generator.draft_path_for(final_path)
+    store = _artifact_store()
+    for name in (os.path.basename(draft_path), os.path.basename(stl_generator.preview_path_for(draft_path))):
+        try:
+            await executors.run("io", store.remove, name)
+        except Exception as e:
+            print(f"Could not remove draft {name}: {e}")
+
+async def build_full_resolution(scad_code: str, final_path: str, session=None, prompt: str | None = None) -> dict:
+    """Compiles the full resolution model after its draft, validates it like the draft and announces the outcome."""
+    filename = os.path.basename(final_path)
+    result = await stl_generator.compile_scad_to_stl(scad_code, final_path)
+    if result["success"]:
+        report = await executors.run("cpu", mesh_analysis.validate_mesh, final_path)
+        result["mesh"] = report["stats"]
+        if not report["ok"]:
+            # The draft stays the usable model
+            await executors.run("io", artifacts.remove, final_path)
+            result.update(success=False, error="Mesh validation failed: " + " ".join(report["errors"]))
+    if result["success"]:
+        await executors.run("cpu", stl_generator.finalize_model, final_path)
+        await _record_artifact(filename, prompt=prompt, metadata=_mesh_metadata(result))
+        await _remove_draft(final_path)
+        start_preview_render(final_path)
+        message = f"Full resolution model ready: {filename}"
+    else:
+        message = f"Full resolution build of {filename} failed: {result['error']}"
+    print(message)
+
+    if session:
+        try:
+            await session.send_log_message(level="info", data=message, logger="generate_model")
+        except Exception as e:
+            # Stateless HTTP sessions are usually gone by now, get_generated_model still has the result
+            print(f"Could not announce full resolution build: {e}")
+    return result
+
+def start_full_resolution_build(scad_code: str, final_path: str, session=None, prompt: str | None = None) -> asyncio.Task:
+    filename = os.path.basename(final_path)
+    previous = final_builds.get(filename)
+    if previous and not previous.done():
+        previous.cancel()
+
+    task = asyncio.create_task(build_full_resolution(scad_code, final_path, session, prompt))
+    final_builds[filename] = task
+    _forget_when_done(final_builds, filename, task)
+    return task
 
 @mcp.tool(meta={
     "ui": {
         "resourceUri": GENERATOR_URI
     }
 })
-async def generate_model(prompt: str, filename: str = "generated_model") -> list[types.TextContent | types.ImageContent]:
+@instrumented
+async def generate_model(prompt: str, filename: str | None = None, preview: bool = True, candidates: int | None = None,
+                         draft: bool | None = None, ctx: Context | None = None) -> list[types.TextContent | types.ImageContent]:
     """
     Generate a 3D model (STL) from a text description using OpenSCAD.
     Returns the generated image preview.
     
     Args:
         prompt: Description of the object to generate (e.g. "a 20mm cube", "a gear with 10 teeth").
-        filename: Optional filename for the generated output (without extension). Defaults to "generated_model".
+        filename: Optional filename for the generated output (without extension). Defaults to a
+            generated_model name that no existing model has.
+        preview: Render a PNG preview of the model. If it is not ready in time, fetch it later with get_model_preview.
+        candidates: Number of alternative designs to generate and compile in parallel; the first one that
+            compiles wins. Higher values cost more Gemini calls but rarely fail. Defaults to the server setting.
+        draft: Return a quick low resolution draft first and build the full resolution model in the
+            background (fetch it with get_generated_model). Defaults to the server setting.
     """
     if not client:
         return [types.TextContent(type="text", text="Gemini API key not configured, cannot generate model.")]
     
     # Ensure filename is safe
-    safe_filename = "".join(x for x in filename if x.isalnum() or x in "_-")
-    if not safe_filename:
-        safe_filename = "generated_model"
+    safe_filename = await _model_name(filename)
 
-    # Use asyncio.to_thread since stl_generator is synchronous (subprocess/network)
-    result = await asyncio.to_thread(stl_generator.generate_model, prompt, safe_filename, client)
+    # The preview is rendered separately so the STL path is returned as soon as the mesh exists
+    if draft is None:
+        draft = PROGRESSIVE_COMPILE
+    result = await stl_generator.generate_model(prompt, safe_filename, client, preview=False, candidates=candidates, draft=draft)
     
     content = []
     
     if result["status"] == "success":
-        content.append(types.TextContent(type="text", text=f"Successfully generated model at {result['path']}"))
-        if result.get("image_base64"):
-             content.append(types.ImageContent(type="image", data=result["image_base64"], mimeType="image/png"))
+        final_filename = os.path.basename(result["final_path"])
+        await _record_artifact(result["filename"], prompt=prompt, metadata=_mesh_metadata(result))
+        if result["draft"]:
+            start_full_resolution_build(result["scad_code"], result["final_path"], ctx.session if ctx else None, prompt)
+            content.append(types.TextContent(type="text", text=(
+                f"Generated a low resolution draft at {result['path']}. "
+                f"The full resolution model {final_filename} is building in the background; "
+                f"fetch it with get_generated_model('{final_filename}')."
+            )))
+        else:
+            content.append(types.TextContent(type="text", text=f"Successfully generated model at {result['path']}"))
+        if result.get("mesh"):
+            size = " x ".join(f"{v:g}" for v in result["mesh"]["size"])
+            content.append(types.TextContent(type="text", text=f"Model size: {size} mm, {result['mesh']['triangles']} triangles."))
+        if preview:
+            task = start_preview_render(result["path"])
+            try:
+                png_path = await _await_preview(task, PREVIEW_WAIT_SECONDS)
+                image_base64 = await executors.run("io", stl_generator.read_preview_base64, png_path)
+                if image_base64:
+                    content.append(types.ImageContent(type="image", data=image_base64, mimeType="image/png"))
+            except asyncio.TimeoutError:
+                content.append(types.TextContent(type="text", text=f"Preview is still rendering. Use get_model_preview('{result['filename']}') to fetch it."))
     else:
         content.append(types.TextContent(type="text", text=f"Failed to generate model: {result['message']}"))
         
     return content
 
+@mcp.tool(meta={
+    "ui": {
+        "resourceUri": GENERATOR_URI
+    }
+})
+@instrumented
+async def get_model_preview(model_filename: str, wait: bool = True) -> list[types.TextContent | types.ImageContent]:
+    """
+    Get the PNG preview of a generated model, rendering it if it does not exist yet.
+
+    Args:
+        model_filename: STL filename in the local models directory (e.g. "gear.stl").
+        wait: Block until a pending preview render finishes.
+    """
+    if not model_filename.endswith(".stl"):
+        model_filename += ".stl"
+    stl_path = os.path.join(MODELS_DIR, model_filename)
+
+    task = preview_tasks.get(model_filename)
+    if task is None:
+        png_path = stl_generator.preview_path_for(stl_path)
+        if not await executors.run("io", os.path.exists, png_path):
+            if not await executors.run("io", artifacts.exists, stl_path):
+                return [types.TextContent(type="text", text=f"Model not found: {model_filename}")]
+            task = start_preview_render(stl_path)
+
+    if task is not None:
+        if not task.done() and not wait:
+            return [types.TextContent(type="text", text=f"Preview for {model_filename} is still rendering.")]
+        try:
+            png_path = await _await_preview(task)
+        except asyncio.TimeoutError:
+            # Superseded, a newer render of the same model is running
+            return [types.TextContent(type="text", text=f"Preview for {model_filename} is still rendering.")]
+
+    image_base64 = await executors.run("io", stl_generator.read_preview_base64, png_path)
+    if not image_base64:
+        return [types.TextContent(type="text", text=f"No preview available for {model_filename}.")]
+    return [types.ImageContent(type="image", data=image_base64, mimeType="image/png")]
+
+@mcp.tool(meta={
+    "ui": {
+        "resourceUri": GENERATOR_URI
+    }
+})
+@instrumented
+async def get_generated_model(model_filename: str, wait: bool = False, timeout: float = 300) -> list[types.TextContent | types.ImageContent]:
+    """
+    Get the full resolution model that generate_model builds in the background after a draft.
+
+    Args:
+        model_filename: Final STL filename (e.g. "gear.stl").
+        wait: Block until the build finishes (at most timeout seconds).
+        timeout: Maximum seconds to wait when wait is true.
+    """
+    if not model_filename.endswith(".stl"):
+        model_filename += ".stl"
+    final_path = os.path.join(MODELS_DIR, model_filename)
+
+    task = final_builds.get(model_filename)
+    if task is None:
+        if not artifacts.exists(final_path):
+            draft_path = stl_generator.draft_path_for(final_path)
+            if artifacts.exists(draft_path):
+                return [types.TextContent(type="text", text=(
+                    f"Full resolution build of {model_filename} did not finish; "
+                    f"the draft is still at {draft_path}."))]
+            return [types.TextContent(type="text", text=f"Model not found: {model_filename}")]
+    elif not task.done():
+        if not wait:
+            return [types.TextContent(type="text", text=f"Full resolution model {model_filename} is still building.")]
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            return [types.TextContent(type="text", text=f"Full resolution model {model_filename} is still building after {timeout}s.")]
+
+    if task is not None:
+        if task.cancelled():
+            return [types.TextContent(type="text", text=f"Full resolution build of {model_filename} was superseded by a newer generation.")]
+        result = task.result()
+        if not result["success"]:
+            return [types.TextContent(type="text", text=f"Full resolution build of {model_filename} failed: {result['error']}")]
+
+    content = [types.TextContent(type="text", text=f"Full resolution model ready at {final_path}")]
+    content.extend(c for c in await get_model_preview(model_filename, wait=True) if c.type == "image")
+    return content
+
+def _load_gcode_index(gcode_filename: str):
+    """(plain G-code path, layer index) of a local G-code file, None if it does not exist. Blocking."""
+    gcode_path = os.path.join(MODELS_DIR, gcode_filename)
+    plain_path = artifacts.resolve(gcode_path)
+    if plain_path is None:
+        return None
+    # The index stays next to the logical name, compressed files are indexed through their plain copy
+    return plain_path, gcode_index.load_index(plain_path, gcode_index.index_path_for(gcode_path))
+
 @mcp.tool()
-async def upload_model(gcode_filename: str) -> str:
+@instrumented
+async def get_gcode_info(gcode_filename: str) -> list[types.TextContent]:
     """
-    Upload a G-code file from the local models directory to the printer.
+    Summary of a sliced G-code file as JSON: estimated print time, filament use, layer count,
+    maximum height and the height of every layer. Read from a cached index, not the whole file.
+    """
+    try:
+        loaded = await executors.run("io", _load_gcode_index, gcode_filename)
+    except (OSError, ValueError) as e:
+        return [types.TextContent(type="text", text=f"Could not index {gcode_filename}: {e}")]
+    if loaded is None:
+        return [types.TextContent(type="text", text=f"G-code not found: {gcode_filename}")]
+    _, index = loaded
+    result = {
+        "filename": gcode_filename,
+        "metadata": index["metadata"],
+        "layers": gcode_index.layer_count(index),
+        "layer_z": index["z"],
+    }
+    return [types.TextContent(type="text", text=json.dumps(result), mimeType="application/json")]
+
+@mcp.tool()
+@instrumented
+async def get_gcode_layer(gcode_filename: str, layer: int) -> str:
+    """
+    Get the G-code of a single layer (1 based, as printers and slicer previews count them).
+    Use get_gcode_info for the layer count and heights.
     """
+    try:
+        loaded = await executors.run("io", _load_gcode_index, gcode_filename)
+        if loaded is None:
+            return f"G-code not found: {gcode_filename}"
+        plain_path, index = loaded
+        if gcode_filename.lower().endswith(".bgcode"):
+            return f"{gcode_filename} is binary G-code; slice with binary=false to read single layers."
+        if not 1 <= layer <= gcode_index.layer_count(index):
+            return f"Layer {layer} out of range, {gcode_filename} has {gcode_index.layer_count(index)} layers."
+        data = await executors.run("io", gcode_index.read_layer, plain_path, index, layer - 1)
+    except (OSError, ValueError) as e:
+        return f"Could not read layer {layer} of {gcode_filename}: {e}"
+    return data.decode("utf-8", errors="replace")
+
+async def _upload_model(gcode_filename: str) -> str:
+    """upload_model without the tool instrumentation, for the pipeline's own uploading stage."""
     try:
         file_path = os.path.join(MODELS_DIR, gcode_filename)
-        result = await printer.upload_file(file_path)
+        # Printers take plain G-code, compressed files are unpacked into the artifact cache
+        plain_path = await executors.run("io", artifacts.resolve, file_path) or file_path
+        result = await printer.upload_file(plain_path, os.path.basename(file_path))
+        await _touch_artifact(os.path.basename(file_path))
         return f"Upload result: {result.get('message', 'Unknown status')}"
     except Exception as e:
         return f"Error uploading file: {str(e)}"
 
+@mcp.tool()
+@instrumented
+async def upload_model(gcode_filename: str) -> str:
+    """
+    Upload a G-code file from the local models directory to the printer.
+    """
+    return await _upload_model(gcode_filename)
+
+# Critical path stages of print_from_prompt in order, for progress notifications; the slicing
+# stages are those of _plan_slice and _run_slice
+PIPELINE_STAGES = ["generating", "validating", "checking cache", "queued", "orienting", "simplifying",
+                   "slicing", "indexing", "uploading"]
+
+async def _timed(coro, timings: dict, name: str):
+    """Awaits coro and records its wall time under name, for work running beside the critical path."""
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = round(time.perf_counter() - started, 3)
+
+@mcp.tool(meta={
+    "ui": {
+        "resourceUri": GENERATOR_URI
+    }
+})
+@instrumented
+async def print_from_prompt(prompt: str, filename: str | None = None, intent: str = "default", upload: bool = True,
+                            candidates: int | None = None, ctx: Context | None = None) -> list[types.TextContent | types.ImageContent]:
+    """
+    Generate a model from a text description, validate and slice it, and upload the G-code to
+    the printer, in one call. Sends a progress notification as each stage starts and returns a
+    JSON summary with the time every stage took, followed by the model preview. If a stage fails,
+    the summary has status "failed" and names the stage and its error.
+
+    The printer capability check runs during generation, and the preview render and G-code
+    metadata read run beside slicing and upload, so they add no time to the critical path.
+
+    Args:
+        prompt: Description of the object to generate (e.g. "a 20mm cube").
+        filename: Filename for the model and G-code (without extension). Defaults to a new generated_model name.
+        intent: Slicing intent, as for slice_model ('draft', 'default', 'strong', 'detail').
+        upload: Upload the G-code to the printer. Set to false to stop after slicing.
+        candidates: Designs to generate in parallel, as for generate_model.
+    """
+    if not client:
+        return [types.TextContent(type="text", text="Gemini API key not configured, cannot generate model.")]
+
+    safe_filename = await _model_name(filename)
+    started = time.perf_counter()
+    notifications = []
+
+    def notify(stage: str):
+        # Called synchronously from inside the slice job, so the notification is sent as a task
+        if ctx:
+            notifications.append(asyncio.ensure_future(
+                ctx.report_progress(PIPELINE_STAGES.index(stage) + 1, len(PIPELINE_STAGES), stage)))
+
+    timer = job_queue.StageTimer(on_stage=notify)
+    # Wall time of the work running beside the critical path
+    background = {}
+    summary = {"prompt": prompt, "intent": intent, "status": "failed"}
+
+    def finish(content: list) -> list:
+        timer.finish()
+        summary["timings"] = {"stages": timer.breakdown(), "background": background,
+                              "total": round(time.perf_counter() - started, 3)}
+        return [types.TextContent(type="text", text=json.dumps(summary), mimeType="application/json")] + content
+
+    # With GCODE_FORMAT=auto whether to slice binary G-code depends on the printer, ask it while the model generates
+    printer_task = asyncio.create_task(_timed(use_binary_gcode(), background, "printer"))
+    try:
+        timer.start("generating")
+        # The full resolution model is needed for printing, a draft would only be sliced twice
+        generated = await stl_generator.generate_model(prompt, safe_filename, client, preview=False,
+                                                       candidates=candidates, draft=False)
+        if generated["status"] != "success":
+            summary.update(stage="generating", error=generated["message"])
+            return finish([])
+        model_filename = generated["filename"]
+        summary["model"] = model_filename
+        await _record_artifact(model_filename, prompt=prompt, metadata=_mesh_metadata(generated))
+        preview_started = time.perf_counter()
+        preview_task = start_preview_render(generated["path"])
+        preview_task.add_done_callback(
+            lambda task: background.setdefault("preview", round(time.perf_counter() - preview_started, 3)))
+        binary = await printer_task
+
+        sliced = await _await_slice_model(model_filename, intent, True, True, True, True, binary, timer.start)
+        summary["slice"] = sliced
+        if not sliced.startswith("Successfully sliced"):
+            summary.update(stage=timer.current, error=sliced)
+            return finish([])
+        gcode_filename = os.path.splitext(model_filename.lower())[0] + (".bgcode" if binary else ".gcode")
+        summary["gcode"] = gcode_filename
+
+        # The index was built while slicing, reading its metadata back overlaps the upload
+        metadata_task = asyncio.create_task(_timed(executors.run("io", _load_gcode_index, gcode_filename),
+                                                   background, "metadata"))
+        if upload:
+            timer.start("uploading")
+            summary["upload"] = await _upload_model(gcode_filename)
+            if summary["upload"].startswith("Error"):
+                summary.update(stage="uploading", error=summary["upload"])
+                return finish([])
+        timer.finish()
+        try:
+            loaded = await metadata_task
+            summary["metadata"] = loaded[1]["metadata"] if loaded else {}
+        except (OSError, ValueError) as e:
+            summary["metadata"] = {}
+            print(f"Could not read G-code metadata of {gcode_filename}: {e}")
+        summary["status"] = "uploaded" if upload else "sliced"
+
+        content = []
+        try:
+            # Rendered while slicing, usually long finished by now
+            png_path = await _await_preview(preview_task, PREVIEW_WAIT_SECONDS)
+            image_base64 = await executors.run("io", stl_generator.read_preview_base64, png_path)
+            if image_base64:
+                content.append(types.ImageContent(type="image", data=image_base64, mimeType="image/png"))
+        except asyncio.TimeoutError:
+            content.append(types.TextContent(type="text", text=f"Preview is still rendering. Use get_model_preview('{model_filename}') to fetch it."))
+        except Exception as e:
+            # The G-code is on its way either way, a failed render only loses the picture
+            print(f"Could not render the preview of {model_filename}: {e}")
+        return finish(content)
+    except Exception as e:
+        # Whatever raised, the caller gets the summary so far and the stage it stopped in
+        summary.update(stage=timer.current, error=f"{type(e).__name__}: {e}")
+        return finish([])
+    finally:
+        # printer_task is left to finish on failure, its answer is cached for the next slice
+        if notifications:
+            await asyncio.gather(*notifications, return_exceptions=True)
+
+
+# Pool occupancy and loop lag, read when /metrics is scraped
+metrics.registry.register(metrics.CallbackGauge(
+    "executor_running_tasks", "Worker threads busy, by pool.", ["pool"],
+    lambda: {(name, ): stats["running"] for name, stats in executors.stats().items()}))
+metrics.registry.register(metrics.CallbackGauge(
+    "executor_queued_tasks", "Tasks waiting for a worker, by pool.", ["pool"],
+    lambda: {(name, ): stats["queued"] for name, stats in executors.stats().items()}))
+metrics.registry.register(metrics.CallbackGauge(
+    "executor_max_workers", "Worker threads, by pool.", ["pool"],
+    lambda: {(name, ): stats["max_workers"] for name, stats in executors.stats().items()}))
+metrics.registry.register(metrics.CallbackGauge(
+    "event_loop_lag_seconds", "Event loop lag of the last sample and the maximum seen.", ["stat"],
+    lambda: {("last", ): loop_lag.last_lag, ("max", ): loop_lag.max_lag}))
+metrics.registry.register(metrics.CallbackGauge(
+    "event_loop_blocked_samples", "Lag samples beyond the blocking threshold since start.", [],
+    lambda: {(): loop_lag.blocked}))
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Tool and external call latencies, errors and in-flight counts, in the Prometheus text format."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 if __name__ == "__main__":
     allowed_hosts = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")]
@@ -680,6 +1775,10 @@ if __name__ == "__main__":
     if "http://localhost:*" not in allowed_origins: allowed_origins.append("http://localhost:*")
     if "http://127.0.0.1:*" not in allowed_origins: allowed_origins.append("http://127.0.0.1:*")
     
+    # Read the UI once and inline its CDN assets before serving, the only place that may wait on the network
+    print(f"Loaded UI resources: {', '.join(ui.load_all())}")
+    sop_library.refresh()
+
     print(f"Allowed Hosts: {allowed_hosts}")
     print(f"Allowed Origins: {allowed_origins}")
     
@@ -697,4 +1796,12 @@ if __name__ == "__main__":
         allow_headers=["*"],
     )
     print(f"Generative Manufacturing Server listening on http://{HOST}:{PORT}/mcp")
-    uvicorn.run(app, host=HOST, port=PORT)
+
+    async def serve():
+        loop_lag.start()
+        try:
+            await uvicorn.Server(uvicorn.Config(app, host=HOST, port=PORT)).serve()
+        finally:
+            await loop_lag.stop()
+
+    asyncio.run(serve())
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import shutil
+import logging
+from typing import Optional
+
+import gcode_index
+
+logger = logging.getLogger(__name__)
+
+# Sliced G-code by content, shared by every model file with the same bytes
+CACHE_DIR = os.getenv("SLICE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "assets", "models", ".slice_cache"))
+CACHE_MAX_BYTES = int(float(os.getenv("SLICE_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+SLICE_CACHE = os.getenv("SLICE_CACHE", "true").lower() == "true"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(content_digest: str, slicer_args: list[str], slicer_version: str, options: dict = None) -> str:
+    """
+    Key of one slice result: the model's bytes, the exact slicer arguments, the slicer build and
+    any preprocessing options that change what the slicer sees (orientation, simplification).
+    """
+    material = json.dumps({
+        "content": content_digest,
+        "args": list(slicer_args),
+        "slicer": slicer_version,
+        "options": options or {},
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _entry_paths(key: str) -> tuple[str, str]:
+    return os.path.join(CACHE_DIR, f"{key}.gcode"), os.path.join(CACHE_DIR, f"{key}.json")
+
+
+def _copy(source: str, destination: str):
+    """
+    Copies through a temporary file so readers never see half a file. Never a hard link:
+    a slicer writing the output in place would otherwise corrupt the cache entry.
+    """
+    temp_path = destination + ".tmp"
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, destination)
+
+
+def lookup(key: str, output_path: str) -> Optional[dict]:
+    """
+    Writes a cached slice result to output_path.
+
+    Returns:
+        The stored metadata on a hit, None on a miss.
+    """
+    gcode_path, meta_path = _entry_paths(key)
+    if not (os.path.exists(gcode_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        _copy(gcode_path, output_path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Dropping unreadable slice cache entry {key}: {e}")
+        remove(key)
+        return None
+
+    # Mark as recently used for the LRU trim
+    os.utime(gcode_path)
+    os.utime(meta_path)
+    return metadata
+
+
+def store(key: str, gcode_path: str, info: dict = None) -> dict:
+    """
+    Adds a fresh slice result to the cache and trims it to CACHE_MAX_BYTES.
+
+    Returns:
+        The metadata stored with it (footer values plus info).
+    """
+    metadata = {**gcode_index.read_metadata(gcode_path), **(info or {})}
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached_gcode, meta_path = _entry_paths(key)
+    _copy(gcode_path, cached_gcode)
+    temp_path = meta_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    os.replace(temp_path, meta_path)
+    trim()
+    return metadata
+
+
+def remove(key: str):
+    for path in _entry_paths(key):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def trim(max_bytes: int = None):
+    """Evicts least recently used entries until the cache fits the disk budget."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".gcode"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(".gcode")]))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total <= max_bytes:
+            break
+        remove(key)
+        total -= size
+
+
+def stats() -> dict:
+    """Entry count and size of the cache."""
+    entries = 0
+    size = 0
+    if os.path.isdir(CACHE_DIR):
+        for entry in os.scandir(CACHE_DIR):
+            if entry.is_file() and entry.name.endswith(".gcode"):
+                entries += 1
+                size += entry.stat().st_size
+    return {"entries": entries, "bytes": size, "max_bytes": CACHE_MAX_BYTES}
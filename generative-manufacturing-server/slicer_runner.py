@@ -1,10 +1,39 @@
-import subprocess
 import os
+import re
 import logging
 from typing import Optional
 
+from process_runner import ProcessLimits, ProcessRunner, default_runner
+
+# PrusaSlicer is multi-threaded, so only wall clock and memory are bounded by default
+SLICER_LIMITS = ProcessLimits.from_env("SLICER", timeout=600, memory_mb=8192)
+
+# Slicer build per executable, detection costs a process launch
+_slicer_versions = {}
+UNKNOWN_VERSION = "unknown"
+
+# Keywords of a natural language intent per print profile, checked in this order
+INTENT_KEYWORDS = {
+    "draft": ("draft", "fast"),
+    "strong": ("strong", "strength", "heavy"),
+    "detail": ("detail", "quality", "pretty"),
+}
+
+def intent_profile(intent: str) -> str:
+    """Maps a natural language intent to "draft", "strong", "detail" or "default"."""
+    intent = intent.lower()
+    for profile, keywords in INTENT_KEYWORDS.items():
+        if any(keyword in intent for keyword in keywords):
+            return profile
+    return "default"
+
+def is_binary_gcode(path: str) -> bool:
+    """Whether a G-code path names binary G-code; the slicer writes the format its output is named for."""
+    return path.lower().endswith(".bgcode")
+
 class SlicerRunner:
-    def __init__(self, slicer_path: Optional[str] = None):
+    def __init__(self, slicer_path: Optional[str] = None, runner: Optional[ProcessRunner] = None):
+        self.runner = runner or default_runner
         if slicer_path:
             self.slicer_path = slicer_path
         else:
@@ -27,23 +56,23 @@ class SlicerRunner:
         """
         Maps a natural language intent to Slicer CLI arguments.
         """
-        intent = intent.lower()
+        profile = intent_profile(intent)
         args = []
 
         # Basic profiles (assuming standard Prusa profiles exist/are loaded)
         # Note: In a real environment, we'd need exact profile names or config bundles.
         # For this prototype, we'll use CLI overrides which are safer than guessing profile names.
         
-        if "draft" in intent or "fast" in intent:
+        if profile == "draft":
             args.extend(["--layer-height", "0.25"])
             args.extend(["--fill-density", "10%"])
             args.extend(["--fill-pattern", "grid"])
-        elif "strong" in intent or "strength" in intent or "heavy" in intent:
+        elif profile == "strong":
              args.extend(["--layer-height", "0.2"])
              args.extend(["--fill-density", "40%"])
              args.extend(["--perimeters", "4"])
              args.extend(["--fill-pattern", "gyroid"])
-        elif "detail" in intent or "quality" in intent or "pretty" in intent:
+        elif profile == "detail":
              args.extend(["--layer-height", "0.10"])
              args.extend(["--fill-density", "15%"])
         else:
@@ -53,9 +82,47 @@ class SlicerRunner:
             
         return args
 
-    def slice_file(self, input_path: str, output_path: str, intent: str = "default") -> dict:
+    def layer_height(self, intent: str) -> float:
+        """Layer height in mm that _get_preset_args picks for an intent."""
+        args = self._get_preset_args(intent)
+        return float(args[args.index("--layer-height") + 1])
+
+    def output_args(self, intent: str, binary: bool = False) -> list[str]:
+        """Every argument that shapes the G-code: the intent's presets and the output format."""
+        args = self._get_preset_args(intent)
+        if binary:
+            args.append("--binary-gcode")
+        return args
+
+    async def get_version(self) -> str:
+        """
+        Returns the slicer build (e.g. "2.7.1+linux-x64-GTK3"), UNKNOWN_VERSION if it cannot be run.
+        Part of the slice cache key, so upgrading PrusaSlicer invalidates cached G-code.
+        Only a detected version is remembered, a slicer that failed to start is asked again next time.
+        """
+        if self.slicer_path in _slicer_versions:
+            return _slicer_versions[self.slicer_path]
+        try:
+            result = await self.runner.run([self.slicer_path, "--help"], ProcessLimits(timeout=30))
+        except OSError as e:
+            logging.warning(f"Could not query slicer version: {e}")
+            return UNKNOWN_VERSION
+        output = (result.stdout + result.stderr).strip()
+        match = re.search(r"PrusaSlicer-(\S+)", output)
+        if match:
+            version = match.group(1)
+        elif result.ok and output:
+            version = output.splitlines()[0]
+        else:
+            logging.warning(f"Could not query slicer version, exit code {result.returncode}")
+            return UNKNOWN_VERSION
+        _slicer_versions[self.slicer_path] = version
+        return version
+
+    async def slice_file(self, input_path: str, output_path: str, intent: str = "default") -> dict:
         """
         Slices the input file using CLI overrides based on intent.
+        An output_path ending in .bgcode gets PrusaSlicer's binary G-code, a fraction of the text size.
         """
         if not os.path.exists(input_path):
              return {"success": False, "error": f"Input file not found: {input_path}"}
@@ -69,25 +136,51 @@ class SlicerRunner:
             "--output", output_path
         ]
         
-        cmd.extend(self._get_preset_args(intent))
-        
+        cmd.extend(self.output_args(intent, is_binary_gcode(output_path)))
+        return await self._run_slicer(cmd, output_path)
+
+    async def slice_plate(self, input_paths: list[str], output_path: str, intent: str = "default") -> dict:
+        """
+        Slices several already placed parts into one G-code file in a single slicer run.
+        The parts keep their XY positions, so they must be laid out in bed coordinates.
+        """
+        missing = [path for path in input_paths if not os.path.exists(path)]
+        if missing:
+            return {"success": False, "error": f"Input file not found: {missing[0]}"}
+
+        # prusa-slicer-console -g part1.stl part2.stl --merge --dont-arrange --output plate.gcode [args]
+        # Without --merge every input is sliced as its own model, each overwriting the same output
+        cmd = [self.slicer_path, "-g", *input_paths, "--merge", "--dont-arrange", "--output", output_path]
+        cmd.extend(self.output_args(intent, is_binary_gcode(output_path)))
+        return await self._run_slicer(cmd, output_path)
+
+    async def _run_slicer(self, cmd: list[str], output_path: str) -> dict:
         logging.info(f"Running slicer command: {' '.join(cmd)}")
         
         try:
             # Check if slicer is available first
             # We assume it's in PATH or absolute path provided
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            result = await self.runner.run(cmd, SLICER_LIMITS)
+            if result.timed_out:
+                logging.error(f"Slicing timed out after {SLICER_LIMITS.timeout}s")
+                return {
+                    "success": False,
+                    "error": f"Slicing timed out after {SLICER_LIMITS.timeout}s",
+                    "usage": result.usage()
+                }
+            if result.returncode != 0:
+                logging.error(f"Slicing failed: {result.stderr}")
+                return {
+                    "success": False, 
+                    "error": f"Slicing failed with code {result.signal or result.returncode}: {result.stderr}",
+                    "usage": result.usage()
+                }
             return {
                 "success": True,
                 "message": "Slicing successful",
                 "stdout": result.stdout,
-                "output_path": output_path
-            }
-        except subprocess.CalledProcessError as e:
-            logging.error(f"Slicing failed: {e.stderr}")
-            return {
-                "success": False, 
-                "error": f"Slicing failed with code {e.returncode}: {e.stderr}"
+                "output_path": output_path,
+                "usage": result.usage()
             }
         except FileNotFoundError:
              return {
@@ -0,0 +1,157 @@
+import math
+import os
+import re
+import time
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SOP_DIR = os.path.join(os.path.dirname(__file__), "assets", "sop")
+# Seconds between checks for added, edited or deleted SOP files
+CHECK_INTERVAL = 5.0
+# Share of the query's weight that must match names, aliases or headings; body text alone never qualifies
+MIN_SCORE = 0.5
+
+# Other names an SOP answers to, one comment line anywhere in the file:
+#   <!-- aliases: shifted layers, skipped steps -->
+_ALIASES = re.compile(r"<!--\s*aliases:(.*?)-->", re.IGNORECASE | re.DOTALL)
+_HEADING = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DOUBLED = re.compile(r"([bcdfghjkmnpqrtvwxy])\1$")
+
+# Weight of a token by where it appears in an SOP
+FIELD_WEIGHTS = {"name": 1.0, "alias": 1.0, "heading": 0.8, "body": 0.1}
+# Words of SOP headings and issue names that say nothing about which problem it is
+STOP_WORDS = {"a", "an", "and", "the", "of", "on", "in", "to", "is", "sop", "procedure", "protocol", "protocols",
+              "failure", "issue", "problem", "error", "detected"}
+
+
+def stem(token: str) -> str:
+    """Crude English suffix stripping, enough for "shifted", "shifting" and "shifts" to meet at "shift"."""
+    if len(token) > 4:
+        if token.endswith("ies"):
+            return token[:-3] + "y"
+        for suffix in ("ing", "ed", "s"):
+            if token.endswith(suffix) and not token.endswith("ss") and len(token) - len(suffix) >= 4:
+                token = token[:-len(suffix)]
+                # "skipped" -> "skipp" -> "skip"
+                return _DOUBLED.sub(r"\1", token)
+    return token
+
+
+def tokens(text: str) -> list[str]:
+    """Lowercased, stemmed words of text; underscores, dashes and punctuation separate words."""
+    return [stem(t) for t in _TOKEN.findall(text.lower().replace("_", " ")) if t not in STOP_WORDS]
+
+
+@dataclass
+class SOP:
+    name: str
+    title: str
+    content: str
+    aliases: list[str] = field(default_factory=list)
+
+
+class SOPIndex:
+    """
+    Standard operating procedures of a directory, held in memory with an inverted index from
+    normalized tokens to the SOPs that mention them.
+
+    refresh rebuilds the index when a file was added, edited or removed, checking at most every
+    check_interval seconds; it reads the disk, so call it from a worker thread. Lookups only read
+    the index built last and cost a few dictionary reads whatever the library size.
+    """
+
+    def __init__(self, directory: str = SOP_DIR, check_interval: float = CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        # The documents and postings (token -> {SOP name: field weight}) of the last build, replaced
+        # as one, so a lookup never pairs the postings of one build with the documents of another
+        self._index: tuple[dict[str, SOP], dict[str, dict[str, float]]] = ({}, {})
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _scan(self) -> tuple:
+        try:
+            entries = [(entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                       for entry in os.scandir(self.directory) if entry.name.endswith(".md")]
+        except FileNotFoundError:
+            return ()
+        return tuple(sorted(entries))
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuilds the index if the directory changed since the last build. Returns True if it rebuilt."""
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            signature = self._scan()
+            if not force and signature == self._signature:
+                return False
+
+            documents, postings = {}, {}
+            for filename, _, _ in signature:
+                try:
+                    with open(os.path.join(self.directory, filename), "r", encoding="utf-8") as f:
+                        content = f.read()
+                except OSError as e:
+                    logger.warning(f"Could not read SOP {filename}: {e}")
+                    continue
+                name = filename[:-len(".md")]
+                aliases = [a.strip() for match in _ALIASES.findall(content) for a in match.split(",") if a.strip()]
+                heading = _HEADING.search(content)
+                documents[name] = SOP(name=name, title=name.replace("_", " ").title(), content=content, aliases=aliases)
+
+                fields = {
+                    "name": tokens(name),
+                    "alias": tokens(" ".join(aliases)),
+                    "heading": tokens(heading.group(1)) if heading else [],
+                    "body": tokens(_ALIASES.sub(" ", content)),
+                }
+                for field_name, field_tokens in fields.items():
+                    for token in set(field_tokens):
+                        weights = postings.setdefault(token, {})
+                        weights[name] = max(weights.get(name, 0.0), FIELD_WEIGHTS[field_name])
+
+            self._index, self._signature = (documents, postings), signature
+            logger.info(f"Indexed {len(documents)} SOPs from {self.directory}")
+            return True
+
+    def search(self, text: str, limit: int = 3) -> list[dict]:
+        """
+        SOPs matching a problem description, best first.
+
+        Each query token counts by its rarity across SOPs (idf) times the weight of the field it
+        appears in; the score is the share of the query's total weight an SOP covers.
+
+        Returns:
+            Dicts with name, title and score, only those scoring at least MIN_SCORE.
+        """
+        query = set(tokens(text))
+        documents, postings = self._index
+        if not query or not documents:
+            return []
+
+        scores, total = {}, 0.0
+        for token in query:
+            matches = postings.get(token, {})
+            idf = math.log(1 + len(documents) / (len(matches) or 0.5))
+            total += idf
+            for name, weight in matches.items():
+                scores[name] = scores.get(name, 0.0) + weight * idf
+
+        ranked = sorted(((score / total, name) for name, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return [{"name": name, "title": documents[name].title, "score": round(score, 3)}
+                for score, name in ranked[:limit] if score >= MIN_SCORE]
+
+    @property
+    def documents(self) -> dict[str, SOP]:
+        return self._index[0]
+
+    def get(self, name: str) -> Optional[SOP]:
+        return self.documents.get(name)
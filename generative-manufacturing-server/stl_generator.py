@@ -1,6 +1,6 @@
 import os
+import asyncio
 import base64
-import subprocess
 import re
 import tempfile
 import logging
@@ -8,6 +8,13 @@ import shutil
 from google import genai
 from google.genai import types
 
+import artifacts
+import executors
+import metrics
+import mesh_analysis
+import mesh_render
+from process_runner import ProcessLimits, ProcessRunner, default_runner
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +33,38 @@ def get_openscad_path():
 
 OPENSCAD_PATH = get_openscad_path()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# A huge $fn or nested minkowski can run forever, so every OpenSCAD job is bounded
+OPENSCAD_LIMITS = ProcessLimits.from_env("OPENSCAD", timeout=300, cpu_seconds=300, memory_mb=8192)
+PREVIEW_LIMITS = ProcessLimits.from_env("OPENSCAD_PREVIEW", timeout=60, cpu_seconds=60, memory_mb=4096)
+MODELS_DIR = os.path.join(os.path.dirname(__file__), "assets", "models")
+
+# CSG backend: "auto" picks the fastest one the installed OpenSCAD supports, "manifold" or "cgal" force one
+OPENSCAD_BACKEND = os.getenv("OPENSCAD_BACKEND", "auto").lower()
+FAST_BACKEND = "manifold"
+DEFAULT_BACKEND = "cgal"
+
+# Speculative generation: candidates raced per round and repair rounds after a failed round
+SCAD_CANDIDATES = int(os.getenv("SCAD_CANDIDATES", "1"))
+SCAD_REPAIR_ROUNDS = int(os.getenv("SCAD_REPAIR_ROUNDS", "0"))
+MAX_CANDIDATES = 8
+
+# Draft compiles cap curve resolution; $fa/$fs are raised to OpenSCAD's own defaults
+DRAFT_MAX_FN = int(os.getenv("SCAD_DRAFT_MAX_FN", "16"))
+DRAFT_MIN_FA = 12
+DRAFT_MIN_FS = 2
+
+# Parsed `openscad --help` output per executable, detection costs a process launch
+_openscad_help = {}
+
+# "stl" keeps only the binary STL, "3mf" also writes a compact indexed 3MF next to it
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "stl").lower()
+
+# "numpy" draws previews in-process, "openscad" renders them with OpenSCAD (needs OpenGL)
+PREVIEW_RENDERER = os.getenv("PREVIEW_RENDERER", "numpy").lower()
+PREVIEW_SIZE = (800, 600)
+# Comma separated mesh_render views tiled into one preview, e.g. "iso,front,top,right"
+PREVIEW_VIEWS = tuple(v.strip() for v in os.getenv("PREVIEW_VIEWS", "iso").split(",") if v.strip())
+THUMBNAIL_SIZE = (200, 150)
 
 def format_prompt(prompt: str) -> str:
     return f"""
@@ -44,74 +83,400 @@ def format_prompt(prompt: str) -> str:
     6. Output ONLY the OpenSCAD code. Do not include markdown formatting or explanations.
     """
 
+def format_repair_prompt(prompt: str, scad_code: str, error: str) -> str:
+    # OpenSCAD can print pages of warnings, the actual error is at the end
+    error = error.strip()[-2000:]
+    return f"""
+    The following OpenSCAD script was written to create a 3D model of: {prompt}.
+    It failed to compile to a valid STL.
+
+    Script:
+    {scad_code}
+
+    OpenSCAD output:
+    {error}
+
+    Fix the script. All requirements still apply:
+    - The model must be centered at [0,0,0] and manifold, with walls > 1-2mm.
+    - Use standard OpenSCAD primitives and transformations only.
+    - Output ONLY the corrected OpenSCAD code. Do not include markdown formatting or explanations.
+    """
+
 def clean_code(code: str) -> str:
     """Removes markdown code fences and whitespace."""
     code = re.sub(r"```openscad", "", code, flags=re.IGNORECASE)
     code = re.sub(r"```", "", code)
     return code.strip()
 
-def generate_scad_code(prompt: str, client: genai.Client = None) -> str:
-    """Generates OpenSCAD code using Gemini."""
+async def generate_scad_code(prompt: str, client: genai.Client = None, full_prompt: str = None) -> str:
+    """Generates OpenSCAD code using Gemini. full_prompt replaces the default instructions, e.g. for repairs."""
     if not client:
         if not GEMINI_API_KEY:
              raise ValueError("GEMINI_API_KEY not set and no client provided.")
         client = genai.Client(api_key=GEMINI_API_KEY)
 
-    full_prompt = format_prompt(prompt)
+    full_prompt = full_prompt or format_prompt(prompt)
     
     try:
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview", 
-            contents=full_prompt,
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(include_thoughts=True)
+        with metrics.track("gemini", "generate_scad"):
+            response = await client.aio.models.generate_content(
+                model="gemini-3-flash-preview", 
+                contents=full_prompt,
+                config=types.GenerateContentConfig(
+                    thinking_config=types.ThinkingConfig(include_thoughts=True)
+                )
             )
-        )
         return clean_code(response.text)
     except Exception as e:
         logger.error(f"Error generating SCAD code: {e}")
         raise
 
 
-def compile_scad_to_stl(scad_code: str, output_path: str) -> bool:
-    """Compiles SCAD code to STL using OpenSCAD CLI. Also generates a PNG preview."""
+def apply_draft_resolution(scad_code: str, max_fn: int = None) -> str:
+    """
+    Returns a low resolution variant of the script for quick draft compiles.
+
+    Literal $fn values are capped at max_fn and literal $fa/$fs values are raised to
+    OpenSCAD's defaults, both for global assignments and per-call arguments. Scripts
+    that never ask for finer curves come back unchanged.
+    """
+    max_fn = max_fn or DRAFT_MAX_FN
+    number = r"(\d+(?:\.\d*)?|\.\d+)"
+
+    def clamp(pattern: str, limit: float, keep) -> None:
+        nonlocal scad_code
+        def repl(match):
+            value = float(match.group(2))
+            if keep(value, limit):
+                return match.group(0)
+            return f"{match.group(1)}{limit:g}"
+        scad_code = re.sub(pattern + number, repl, scad_code)
+
+    # $fn = 0 means "use $fa/$fs", so only positive values above the cap are lowered
+    clamp(r"(\$fn\s*=\s*)", max_fn, lambda value, limit: value <= limit)
+    clamp(r"(\$fa\s*=\s*)", DRAFT_MIN_FA, lambda value, limit: value >= limit)
+    clamp(r"(\$fs\s*=\s*)", DRAFT_MIN_FS, lambda value, limit: value >= limit)
+    return scad_code
+
+async def get_openscad_help(runner: ProcessRunner = None) -> str:
+    """Returns the lowercased `openscad --help` text, queried once per executable."""
+    if OPENSCAD_PATH not in _openscad_help:
+        try:
+            result = await (runner or default_runner).run([OPENSCAD_PATH, "--help"], ProcessLimits(timeout=30))
+            # OpenSCAD prints its usage to stderr
+            _openscad_help[OPENSCAD_PATH] = (result.stdout + result.stderr).lower()
+        except OSError as e:
+            logger.warning(f"Could not query OpenSCAD for its options: {e}")
+            _openscad_help[OPENSCAD_PATH] = ""
+    return _openscad_help[OPENSCAD_PATH]
+
+async def detect_backend_args(backend: str, runner: ProcessRunner = None) -> list[str] | None:
+    """
+    Returns the CLI flags selecting a CSG backend, or None if this OpenSCAD build lacks it.
+
+    Releases since 2024 take --backend=manifold, the 2023 development snapshots only
+    offer Manifold as the experimental --enable=manifold feature, and 2021.01 has CGAL only.
+    """
+    help_text = await get_openscad_help(runner)
+    has_backend_flag = "--backend" in help_text
+
+    if backend == DEFAULT_BACKEND:
+        return [f"--backend={DEFAULT_BACKEND}"] if has_backend_flag else []
+    if backend == FAST_BACKEND:
+        if has_backend_flag:
+            return [f"--backend={FAST_BACKEND}"]
+        if FAST_BACKEND in help_text:
+            return [f"--enable={FAST_BACKEND}"]
+        return None
+    raise ValueError(f"Unknown OpenSCAD backend: {backend}")
+
+async def export_format_args(runner: ProcessRunner = None) -> list[str]:
+    """Flags for binary STL export. OpenSCAD writes ASCII STL unless told otherwise (2021.01+)."""
+    help_text = await get_openscad_help(runner)
+    return ["--export-format", "binstl"] if "--export-format" in help_text else []
+
+async def _run_openscad(scad_path: str, output_path: str, backend_args: list[str], runner: ProcessRunner) -> dict:
+    # Run OpenSCAD in headless mode for STL
+    # openscad.exe -o output.stl input.scad
+    cmd_stl = [OPENSCAD_PATH, *backend_args, *await export_format_args(runner), "-o", output_path, scad_path]
+    logger.info(f"Running OpenSCAD STL: {' '.join(cmd_stl)}")
+
+    result_stl = await runner.run(cmd_stl, OPENSCAD_LIMITS)
+
+    if result_stl.timed_out:
+        logger.error(f"OpenSCAD STL timed out after {OPENSCAD_LIMITS.timeout}s")
+        return {"success": False, "error": f"OpenSCAD timed out after {OPENSCAD_LIMITS.timeout}s", "timed_out": True, "usage": result_stl.usage()}
+
+    if result_stl.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        logger.error(f"OpenSCAD STL failed. Output: {result_stl.stderr}")
+        error = result_stl.stderr.strip() or f"OpenSCAD exited with {result_stl.signal or result_stl.returncode}"
+        return {"success": False, "error": error, "timed_out": False, "usage": result_stl.usage()}
+
+    return {"success": True, "error": None, "timed_out": False, "usage": result_stl.usage()}
+
+async def compile_scad_to_stl(scad_code: str, output_path: str, runner: ProcessRunner = None, backend: str = None) -> dict:
+    """
+    Compiles SCAD code to STL using OpenSCAD CLI.
+
+    Args:
+        backend: "auto", "manifold" or "cgal". Defaults to OPENSCAD_BACKEND. In auto mode
+            Manifold is used when available and CGAL is retried if Manifold fails.
+
+    Returns:
+        Dictionary with success, error (OpenSCAD's stderr on failure), the backend used and usage of the run.
+    """
     if not os.path.exists(OPENSCAD_PATH):
         logger.error(f"OpenSCAD executable not found at {OPENSCAD_PATH}")
-        return False
+        return {"success": False, "error": f"OpenSCAD executable not found at {OPENSCAD_PATH}", "backend": None, "usage": None}
+
+    runner = runner or default_runner
+    backend = (backend or OPENSCAD_BACKEND).lower()
+    artifacts.unshare(output_path)
+
+    if backend == "auto":
+        attempts = [FAST_BACKEND, DEFAULT_BACKEND]
+    else:
+        attempts = [backend]
 
     with tempfile.NamedTemporaryFile(mode='w', suffix='.scad', delete=False) as temp_scad:
         temp_scad.write(scad_code)
         temp_scad_path = temp_scad.name
 
     try:
-        # Run OpenSCAD in headless mode for STL
-        # openscad.exe -o output.stl input.scad
-        cmd_stl = [OPENSCAD_PATH, "-o", output_path, temp_scad_path]
-        logger.info(f"Running OpenSCAD STL: {' '.join(cmd_stl)}")
-        
-        result_stl = subprocess.run(cmd_stl, capture_output=True, text=True, check=True)
-        
-        if result_stl.returncode != 0 or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-            logger.error(f"OpenSCAD STL failed. Output: {result_stl.stderr}")
-            return False
+        result = None
+        for attempt in attempts:
+            backend_args = await detect_backend_args(attempt, runner)
+            if backend_args is None:
+                logger.info(f"OpenSCAD at {OPENSCAD_PATH} has no {attempt} backend")
+                continue
+
+            result = await _run_openscad(temp_scad_path, output_path, backend_args, runner)
+            result["backend"] = attempt
+            timed_out = result.pop("timed_out")
+            # Syntax errors and timeouts would fail on every backend, only retry backend failures
+            if result["success"] or timed_out or "parser error" in result["error"].lower():
+                break
+            if attempt != attempts[-1]:
+                logger.warning(f"OpenSCAD {attempt} backend failed, falling back")
+
+        if result is None:
+            return {"success": False, "error": f"OpenSCAD backend '{backend}' is not supported by {OPENSCAD_PATH}", "backend": None, "usage": None}
+        if result["success"]:
+            # Builds without --export-format write ASCII, which is several times larger and slower to read
+            await executors.run("cpu", mesh_analysis.ensure_binary_stl, output_path)
+        return result
+
+    finally:
+        if os.path.exists(temp_scad_path):
+            os.remove(temp_scad_path)
+
+def finalize_model(stl_path: str) -> str:
+    """
+    Writes the optional 3MF export and stores the STL per ARTIFACT_COMPRESSION.
+    Blocking, run it in a worker thread. Returns where the STL is stored.
+    """
+    if MODEL_FORMAT == "3mf":
+        mesh_analysis.write_3mf(os.path.splitext(stl_path)[0] + ".3mf", mesh_analysis.load_stl(stl_path))
+    return artifacts.finalize(stl_path)
+
+def preview_path_for(stl_path: str) -> str:
+    """Returns the PNG preview path that belongs to an STL path."""
+    return os.path.splitext(stl_path)[0] + ".png"
 
-        # Generate PNG Preview
-        png_path = output_path.replace(".stl", ".png")
-        cmd_png = [OPENSCAD_PATH, "-o", png_path, "--imgsize=800,600", "--colorscheme=DeepOcean", temp_scad_path]
+def thumbnail_path_for(stl_path: str) -> str:
+    """Returns the cached thumbnail path of an STL, kept out of the models listing."""
+    directory, filename = os.path.split(stl_path)
+    return os.path.join(directory, ".thumbnails", os.path.splitext(filename)[0] + ".png")
+
+async def render_stl_preview(stl_path: str, png_path: str = None, runner: ProcessRunner = None) -> str | None:
+    """
+    Renders a PNG preview of an already compiled STL.
+
+    By default the mesh is drawn in a worker thread by mesh_render, which needs neither
+    OpenSCAD nor OpenGL and also works for uploaded STLs without SCAD source.
+
+    Returns:
+        The PNG path on success, otherwise None.
+    """
+    png_path = png_path or preview_path_for(stl_path)
+
+    plain_stl_path = await executors.run("io", artifacts.resolve, stl_path)
+    if not plain_stl_path:
+        logger.error(f"Cannot render preview, STL not found: {stl_path}")
+        return None
+
+    if PREVIEW_RENDERER == "openscad":
+        return await _render_openscad_preview(plain_stl_path, png_path, runner)
+    try:
+        width, height = PREVIEW_SIZE
+        return await executors.run("cpu", mesh_render.render_stl_to_png, plain_stl_path, png_path, width, height, PREVIEW_VIEWS)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Preview render failed for {stl_path}: {e}")
+        return None
+
+def _check_thumbnail(stl_path: str) -> tuple[bool, bool]:
+    """(whether the STL exists, whether its thumbnail is newer than it). Blocks on the disk."""
+    stored_path = artifacts.stored_path(stl_path)
+    if not stored_path:
+        return False, False
+    thumbnail_path = thumbnail_path_for(stl_path)
+    try:
+        if os.path.getmtime(thumbnail_path) >= os.path.getmtime(stored_path):
+            return True, True
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    return True, False
+
+async def render_stl_thumbnail(stl_path: str) -> str | None:
+    """Returns a small iso view of an STL, rendering it only if the model changed since."""
+    exists, fresh = await executors.run("io", _check_thumbnail, stl_path)
+    if not exists:
+        return None
+    thumbnail_path = thumbnail_path_for(stl_path)
+    if fresh:
+        return thumbnail_path
+
+    plain_stl_path = await executors.run("io", artifacts.resolve, stl_path)
+    try:
+        width, height = THUMBNAIL_SIZE
+        return await executors.run("cpu", mesh_render.render_stl_to_png, plain_stl_path, thumbnail_path, width, height)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Thumbnail render failed for {stl_path}: {e}")
+        return None
+
+async def _render_openscad_preview(stl_path: str, png_path: str, runner: ProcessRunner = None) -> str | None:
+    """
+    Renders the preview with OpenSCAD. The STL is imported into a one-line wrapper script,
+    so OpenSCAD only has to draw the finished mesh instead of re-evaluating the CSG tree.
+    """
+    if not os.path.exists(OPENSCAD_PATH):
+        logger.error(f"OpenSCAD executable not found at {OPENSCAD_PATH}")
+        return None
+
+    # OpenSCAD string literals treat backslashes as escapes, forward slashes work on every OS
+    import_path = os.path.abspath(stl_path).replace("\\", "/")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.scad', delete=False) as temp_scad:
+        temp_scad.write(f'import("{import_path}");\n')
+        temp_scad_path = temp_scad.name
+
+    try:
+        cmd_png = [OPENSCAD_PATH, "-o", png_path, "--imgsize=800,600", "--colorscheme=DeepOcean", "--viewall", "--autocenter", temp_scad_path]
         logger.info(f"Running OpenSCAD PNG: {' '.join(cmd_png)}")
-        
-        subprocess.run(cmd_png, capture_output=True, text=True, check=False) # Don't fail if PNG fails
-        
-        return True
 
-    except subprocess.CalledProcessError as e:
-        logger.error(f"OpenSCAD execution error: {e.stderr}")
-        return False
+        result_png = await (runner or default_runner).run(cmd_png, PREVIEW_LIMITS)
+
+        if not result_png.ok or not os.path.exists(png_path):
+            logger.warning(f"OpenSCAD PNG preview failed. Output: {result_png.stderr}")
+            return None
+
+        return png_path
     finally:
         if os.path.exists(temp_scad_path):
             os.remove(temp_scad_path)
 
-def generate_model(prompt: str, output_filename: str, client: genai.Client = None) -> dict:
+def read_preview_base64(png_path: str) -> str | None:
+    """Reads a PNG preview and returns it base64 encoded, or None if it does not exist."""
+    if not png_path or not os.path.exists(png_path):
+        return None
+    with open(png_path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode('utf-8')
+
+async def _build_candidate(prompt: str, full_prompt: str, candidate_path: str, client: genai.Client, draft: bool = False) -> dict:
+    """Generates and compiles one SCAD candidate. Never raises, except on cancellation."""
+    scad_code = None
+    try:
+        scad_code = await generate_scad_code(prompt, client, full_prompt)
+        compiled_code = apply_draft_resolution(scad_code) if draft else scad_code
+        compiled = await compile_scad_to_stl(compiled_code, candidate_path)
+        # A draft of a script without fine curves is already the full resolution model
+        compiled["draft"] = compiled_code != scad_code
+        if compiled["success"]:
+            # A broken mesh loses the race like a compile error, and its problems feed the repair prompt
+            report = await executors.run("cpu", mesh_analysis.validate_mesh, candidate_path)
+            compiled["mesh"] = report["stats"]
+            if not report["ok"]:
+                compiled.update(success=False, error="Mesh validation failed: " + " ".join(report["errors"]))
+        compiled.update(scad_code=scad_code, path=candidate_path)
+        return compiled
+    except Exception as e:
+        logger.error(f"Candidate failed: {e}")
+        return {"success": False, "error": str(e), "scad_code": scad_code, "path": candidate_path, "usage": None}
+
+def _remove_candidate_files(paths: list[str]):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+async def compile_first_candidate(prompt: str, output_path: str, client: genai.Client = None, candidates: int = 1,
+                                  repair_rounds: int = 0, draft: bool = False) -> dict:
+    """
+    Requests SCAD candidates concurrently and keeps the first one that compiles to a non-empty mesh.
+
+    Every round races up to `candidates` generate+compile jobs through the shared process
+    runner; as soon as one succeeds the others are cancelled, which kills their OpenSCAD
+    processes. If a whole round fails, the compile errors are fed back to Gemini for at
+    most `repair_rounds` further rounds. With draft=True the candidates are compiled at
+    draft resolution and the winner's "draft" flag says whether a full build is still needed.
+
+    Returns:
+        The winning compile result (with scad_code, path moved to output_path, round and
+        attempts), or the last failure.
+    """
+    candidates = max(1, min(candidates, MAX_CANDIDATES))
+    base_prompt = format_prompt(prompt)
+    full_prompts = [base_prompt] * candidates
+    candidate_paths = []
+    attempts = 0
+    failures = []
+
+    try:
+        for round_index in range(repair_rounds + 1):
+            tasks = set()
+            for full_prompt in full_prompts:
+                candidate_path = f"{os.path.splitext(output_path)[0]}.candidate{len(candidate_paths)}.stl"
+                candidate_paths.append(candidate_path)
+                tasks.add(asyncio.create_task(_build_candidate(prompt, full_prompt, candidate_path, client, draft)))
+            attempts += len(tasks)
+
+            failures = []
+            try:
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((t.result() for t in done if t.result()["success"]), None)
+                    if winner:
+                        os.replace(winner["path"], output_path)
+                        winner.update(path=output_path, round=round_index, attempts=attempts)
+                        logger.info(f"Candidate won in round {round_index} after {attempts} attempts")
+                        return winner
+                    failures.extend(t.result() for t in done)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    # Wait for the losers so their OpenSCAD processes are gone before cleanup
+                    await asyncio.gather(*tasks, return_exceptions=True)
+
+            if round_index < repair_rounds:
+                logger.info(f"All {len(failures)} candidates failed, starting repair round {round_index + 1}")
+                # Candidates whose generation failed outright have no code to repair, retry them from scratch
+                full_prompts = [
+                    format_repair_prompt(prompt, f["scad_code"], f["error"]) if f["scad_code"] else base_prompt
+                    for f in failures
+                ]
+
+        last_failure = failures[-1]
+        last_failure.update(round=repair_rounds, attempts=attempts)
+        return last_failure
+    finally:
+        _remove_candidate_files([p for p in candidate_paths if p != output_path])
+
+def draft_path_for(stl_path: str) -> str:
+    """Returns the path of the low resolution draft that belongs to an STL path."""
+    return os.path.splitext(stl_path)[0] + ".draft.stl"
+
+async def generate_model(prompt: str, output_filename: str, client: genai.Client = None, preview: bool = True,
+                         candidates: int = None, repair_rounds: int = None, draft: bool = False) -> dict:
     """
     Orchestrates the generation of an STL component from a prompt.
     
@@ -119,44 +484,69 @@ def generate_model(prompt: str, output_filename: str, client: genai.Client = Non
         prompt: User description of the object.
         output_filename: Name of the file to save (e.g. "gear.stl")
         client: Optional Gemini client.
+        preview: Render a PNG preview from the finished STL. Callers that want the
+            STL path as soon as the mesh exists pass False and call
+            render_stl_preview themselves.
+        candidates: SCAD candidates to generate and compile in parallel, the first
+            valid mesh wins. Defaults to SCAD_CANDIDATES.
+        repair_rounds: Rounds of feeding compile errors back to Gemini. Defaults to SCAD_REPAIR_ROUNDS.
+        draft: Compile a low resolution variant first. If the script asks for finer curves
+            than the draft allows, path points at the draft, "draft" is True and the caller
+            compiles scad_code to final_path itself (see compile_scad_to_stl).
     
     Returns:
         Dictionary with status, path, and image_base64.
     """
     
     # Ensure assets/models directory exists
-    models_dir = os.path.join(os.path.dirname(__file__), "assets", "models")
-    os.makedirs(models_dir, exist_ok=True)
+    os.makedirs(MODELS_DIR, exist_ok=True)
     
-    full_output_path = os.path.join(models_dir, output_filename)
+    full_output_path = os.path.join(MODELS_DIR, output_filename)
     if not full_output_path.endswith(".stl"):
         full_output_path += ".stl"
+
+    if candidates is None:
+        candidates = SCAD_CANDIDATES
+    if repair_rounds is None:
+        repair_rounds = SCAD_REPAIR_ROUNDS
         
     try:
-        logger.info(f"Generating SCAD code for: {prompt}")
-        scad_code = generate_scad_code(prompt, client)
+        logger.info(f"Generating {candidates} SCAD candidate(s) for: {prompt}")
+        compile_path = draft_path_for(full_output_path) if draft else full_output_path
+        compiled = await compile_first_candidate(prompt, compile_path, client, candidates, repair_rounds, draft)
         
-        logger.info("Compiling to STL...")
-        success = compile_scad_to_stl(scad_code, full_output_path)
-        
-        if success:
-            png_path = full_output_path.replace(".stl", ".png")
+        if compiled["success"]:
+            is_draft = compiled.get("draft", False)
+            if draft and not is_draft:
+                os.replace(compile_path, full_output_path)
+                compile_path = full_output_path
+            await executors.run("cpu", finalize_model, compile_path)
+
+            png_path = preview_path_for(compile_path)
             image_base64 = None
-            if os.path.exists(png_path):
-                 with open(png_path, "rb") as image_file:
-                    image_base64 = base64.b64encode(image_file.read()).decode('utf-8')
+            if preview:
+                image_base64 = read_preview_base64(await render_stl_preview(compile_path, png_path))
 
             return {
                 "status": "success",
-                "path": full_output_path,
-                "filename": os.path.basename(full_output_path),
+                "path": compile_path,
+                "filename": os.path.basename(compile_path),
+                "final_path": full_output_path,
+                "draft": is_draft,
+                "png_path": png_path,
                 "image_base64": image_base64,
+                "scad_code": compiled["scad_code"],
+                "mesh": compiled.get("mesh"),
+                "attempts": compiled["attempts"],
+                "usage": compiled["usage"],
                 "message": f"Successfully generated {output_filename}"
             }
         else:
              return {
                 "status": "error",
-                "message": "Failed to compile OpenSCAD code to STL."
+                "message": f"Failed to compile OpenSCAD code to STL after {compiled['attempts']} attempt(s): {compiled['error']}",
+                "attempts": compiled["attempts"],
+                "usage": compiled["usage"]
             }
 
     except Exception as e:
@@ -165,4 +555,3 @@ def generate_model(prompt: str, output_filename: str, client: genai.Client = Non
             "status": "error",
             "message": str(e)
         }
-
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+# Closed tetrahedron, the smallest mesh that passes validation
+TETRA_STL = b"""solid x
+facet normal 0 0 -1
+outer loop
+vertex 0 0 0
+vertex 0 10 0
+vertex 10 0 0
+endloop
+endfacet
+facet normal 0 -1 0
+outer loop
+vertex 0 0 0
+vertex 10 0 0
+vertex 0 0 10
+endloop
+endfacet
+facet normal -1 0 0
+outer loop
+vertex 0 0 0
+vertex 0 0 10
+vertex 0 10 0
+endloop
+endfacet
+facet normal 1 1 1
+outer loop
+vertex 10 0 0
+vertex 0 10 0
+vertex 0 0 10
+endloop
+endfacet
+endsolid x
+"""
+
+
+@pytest.fixture
+def tetra_stl() -> bytes:
+    """ASCII STL of a closed 10 mm tetrahedron."""
+    return TETRA_STL
+
+
+# Unit cube corners and the two triangles of each outward facing side
+CORNERS = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float32)
+QUADS = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+UNIT_CUBE = np.array([CORNERS[[a, b, c]] for a, b, c, d in QUADS] + [CORNERS[[a, c, d]] for a, b, c, d in QUADS])
+
+
+@pytest.fixture
+def box():
+    """Builds the (N, 3, 3) triangles of an axis aligned box: box(low, high)."""
+    def make(low, high) -> np.ndarray:
+        return (np.array(low) + UNIT_CUBE * (np.array(high) - np.array(low))).astype(np.float32)
+    return make
+
+
+GCODE_FOOTER = b"""; filament used [mm] = 1234.56
+; filament used [g] = 3.71
+; estimated printing time (normal mode) = 1h 2m 3s
+; total layers count = 3
+; layer_height = 0.2
+"""
+
+
+@pytest.fixture
+def sliced_gcode():
+    """
+    Builds G-code shaped like PrusaSlicer output: start code, layers with M73 progress,
+    end code, footer. sliced_gcode(layers=3) -> bytes
+    """
+    def make(layers: int = 3) -> bytes:
+        parts = [b"M73 P0 R10\nG28\n"]
+        for i in range(layers):
+            parts.append(f";LAYER_CHANGE\n;Z:{0.2 * (i + 1):.1f}\n;HEIGHT:0.2\n".encode())
+            parts.append(f"M73 P{i * 100 // layers} R5\nG1 X{i} Y{i} E1\n".encode())
+        parts.append(b"G1 Z20\nM84\n\n")
+        parts.append(GCODE_FOOTER)
+        return b"".join(parts)
+    return make
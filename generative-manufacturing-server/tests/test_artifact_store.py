@@ -0,0 +1,157 @@
+import gzip
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import artifact_store
+import artifacts
+
+DATA = b"solid cube\n" + b"facet normal 0 0 1\n" * 200 + b"endsolid cube\n"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return artifact_store.ArtifactStore(str(tmp_path), quota_bytes=0)
+
+
+def write(tmp_path, name, data=DATA):
+    (tmp_path / name).write_bytes(data)
+    return name
+
+
+def test_register_keeps_prompt_and_metadata(store, tmp_path):
+    write(tmp_path, "gear.stl")
+
+    item = store.register("gear.stl", prompt="a gear", metadata={"size": [20, 20, 5]})
+    again = store.register("gear.stl", metadata={"triangles": 12})
+
+    assert item["kind"] == "model"
+    assert item["content_hash"] == artifact_store.content_digest(str(tmp_path / "gear.stl"))
+    assert again["prompt"] == "a gear"
+    assert again["metadata"] == {"size": [20, 20, 5], "triangles": 12}
+    assert again["created_at"] == item["created_at"]
+
+
+def test_identical_content_shares_one_file(store, tmp_path):
+    write(tmp_path, "a.gcode")
+    write(tmp_path, "b.gcode")
+    store.register("a.gcode")
+    store.register("b.gcode")
+
+    assert os.stat(tmp_path / "a.gcode").st_ino == os.stat(tmp_path / "b.gcode").st_ino
+    assert store.usage() == len(DATA)
+
+    # Writers that rewrite a file in place get their own copy first
+    artifacts.unshare(str(tmp_path / "b.gcode"))
+    write(tmp_path, "b.gcode", b"G1 X1\n")
+    assert (tmp_path / "a.gcode").read_bytes() == DATA
+
+
+def test_previews_are_not_shared(store, tmp_path):
+    write(tmp_path, "a.png")
+    write(tmp_path, "b.png")
+    store.register("a.png")
+    store.register("b.png")
+
+    assert os.stat(tmp_path / "a.png").st_ino != os.stat(tmp_path / "b.png").st_ino
+
+
+def test_sync_follows_the_directory(store, tmp_path):
+    write(tmp_path, "old.stl")
+    with gzip.open(tmp_path / "packed.stl.gz", "wb") as f:
+        f.write(DATA + b"x")
+    write(tmp_path, "part.gcode")
+    write(tmp_path, "part.gcode.index.json", b"{}")
+
+    assert store.sync()
+    assert not store.sync()
+    assert {item["name"] for item in store.list()["items"]} == {"old.stl", "packed.stl", "part.gcode"}
+
+    os.remove(tmp_path / "old.stl")
+    assert [item["name"] for item in store.list(kind="model")["items"]] == ["packed.stl"]
+
+
+def test_list_pages_and_searches(store, tmp_path):
+    for i in range(5):
+        write(tmp_path, f"part{i}.stl", DATA + bytes([i]))
+        store.register(f"part{i}.stl", prompt="a hook" if i % 2 else "a 50%_bracket")
+        time.sleep(0.01)
+
+    page = store.list(kind="model", limit=2, offset=1)
+    assert page["total"] == 5
+    assert [item["name"] for item in page["items"]] == ["part3.stl", "part2.stl"]
+    assert store.list(search="HOOK")["total"] == 2
+    assert store.list(search="50%_")["total"] == 3
+    assert store.list(search="%")["total"] == 3
+
+
+def test_unique_name(store, tmp_path):
+    assert store.unique_name("generated_model.stl") == "generated_model.stl"
+    write(tmp_path, "generated_model.stl")
+    with gzip.open(tmp_path / "generated_model_2.stl.gz", "wb") as f:
+        f.write(DATA)
+
+    assert store.unique_name("generated_model.stl") == "generated_model_3.stl"
+
+
+def test_collect_garbage_removes_least_recently_used(store, tmp_path, mocker):
+    mocker.patch.object(artifact_store, "MIN_AGE_SECONDS", 0)
+    for name in ["old.gcode", "used.gcode", "new.gcode"]:
+        write(tmp_path, name, DATA + name.encode())
+        store.register(name)
+        time.sleep(0.01)
+    write(tmp_path, "old.stl", b"solid old\n")
+    store.register("old.stl")
+    store.touch("old.gcode")
+
+    result = store.collect_garbage(quota_bytes=2 * len(DATA) + 40)
+
+    assert result["removed"] == ["used.gcode"]
+    assert not (tmp_path / "used.gcode").exists()
+    assert store.get("used.gcode") is None
+    assert result["usage"] == store.usage() <= 2 * len(DATA) + 40
+
+
+def test_models_are_never_collected(store, tmp_path, mocker):
+    mocker.patch.object(artifact_store, "MIN_AGE_SECONDS", 0)
+    write(tmp_path, "part.stl")
+    store.register("part.stl")
+    write(tmp_path, "part.gcode", b"G1 X1\n")
+    store.register("part.gcode")
+
+    result = store.collect_garbage(quota_bytes=1)
+
+    assert result["removed"] == ["part.gcode"]
+    assert (tmp_path / "part.stl").exists()
+    assert store.get("part.stl") is not None
+
+
+def test_recent_artifacts_are_never_collected(store, tmp_path):
+    write(tmp_path, "part.stl")
+    store.register("part.stl")
+
+    assert store.collect_garbage(quota_bytes=1)["removed"] == []
+    assert (tmp_path / "part.stl").exists()
+
+
+@pytest.mark.asyncio
+async def test_server_lists_from_the_index(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    write(tmp_path, "generated_model.stl")
+    await server._record_artifact("generated_model.stl", prompt="a bracket", metadata={"size": [20, 10, 5]})
+    write(tmp_path, "gear.stl", DATA + b"gear")
+    write(tmp_path, "gear.gcode", b"G1 X1\n")
+
+    listing = await server.list_local_models()
+    assert "generated_model.stl (20 x 10 x 5 mm, \"a bracket\")" in listing
+    assert "gear.stl" in listing and "gear.gcode" not in listing
+    assert "gear.gcode" in await server.list_local_models(kind="gcode")
+    assert "use offset=1 for more" in await server.list_local_models(limit=1)
+    assert await server.list_local_models(search="nothing") == "No matching files found in models directory."
+
+    assert await server._model_name(None) == "generated_model_2"
+    assert await server._model_name("my gear!") == "mygear"
@@ -0,0 +1,95 @@
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import artifacts
+
+DATA = b"solid x\nendsolid x\n" * 100
+
+
+@pytest.fixture
+def gzip_storage(mocker):
+    mocker.patch.object(artifacts, "ARTIFACT_COMPRESSION", "gzip")
+
+
+def test_plain_storage_leaves_file_alone(tmp_path):
+    path = str(tmp_path / "model.stl")
+    with open(path, "wb") as f:
+        f.write(DATA)
+
+    assert artifacts.finalize(path) == path
+    assert artifacts.resolve(path) == path
+
+
+def test_finalize_compresses_and_keeps_plain_copy_cached(tmp_path, gzip_storage):
+    path = str(tmp_path / "model.stl")
+    with open(path, "wb") as f:
+        f.write(DATA)
+
+    stored = artifacts.finalize(path)
+
+    assert stored == path + ".gz"
+    assert not os.path.exists(path)
+    with gzip.open(stored, "rb") as f:
+        assert f.read() == DATA
+    assert artifacts.exists(path)
+    plain = artifacts.resolve(path)
+    assert plain == os.path.join(str(tmp_path), ".cache", "model.stl")
+    with open(plain, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_resolve_decompresses_missing_cache_entry(tmp_path, gzip_storage):
+    path = str(tmp_path / "model.stl")
+    with gzip.open(path + ".gz", "wb") as f:
+        f.write(DATA)
+
+    with open(artifacts.resolve(path), "rb") as f:
+        assert f.read() == DATA
+    assert artifacts.resolve(str(tmp_path / "missing.stl")) is None
+
+
+def test_cache_trim_keeps_recoverable_copies_only(tmp_path, gzip_storage, mocker):
+    mocker.patch.object(artifacts, "CACHE_MAX_BYTES", len(DATA))
+    for name in ("a.stl", "b.stl"):
+        path = str(tmp_path / name)
+        with open(path, "wb") as f:
+            f.write(DATA)
+        artifacts.finalize(path)
+        os.utime(os.path.join(str(tmp_path), ".cache", name), (0, 0) if name == "a.stl" else None)
+    artifacts._trim_cache(os.path.join(str(tmp_path), ".cache"))
+
+    assert sorted(os.listdir(tmp_path / ".cache")) == ["b.stl"]
+    # The evicted model is still readable from its compressed original
+    with open(artifacts.resolve(str(tmp_path / "a.stl")), "rb") as f:
+        assert f.read() == DATA
+
+
+def test_logical_name_and_remove(tmp_path, gzip_storage):
+    path = str(tmp_path / "model.stl")
+    with open(path, "wb") as f:
+        f.write(DATA)
+    artifacts.finalize(path)
+
+    assert artifacts.logical_name("model.stl.gz") == "model.stl"
+    artifacts.remove(path)
+    assert not artifacts.exists(path)
+    assert artifacts.resolve(path) is None
+
+
+@pytest.mark.asyncio
+async def test_server_lists_and_slices_compressed_models(tmp_path, gzip_storage, mocker):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    with gzip.open(str(tmp_path / "gear.stl.gz"), "wb") as f:
+        f.write(DATA)
+    slice_file = mocker.patch.object(server.slicer, "slice_file", return_value={"success": False, "error": "boom"})
+
+    assert "gear.stl" in await server.list_local_models()
+    await server.slice_model("gear.stl", validate=False)
+
+    # The slicer gets the decompressed copy
+    assert slice_file.call_args[0][0] == os.path.join(str(tmp_path), ".cache", "gear.stl")
@@ -0,0 +1,83 @@
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import prusa_printer
+from slicer_runner import SlicerRunner
+
+
+def test_firmware_support():
+    assert prusa_printer.supports_binary_gcode("5.1.2+13478")
+    assert prusa_printer.supports_binary_gcode("6.0.0")
+    assert not prusa_printer.supports_binary_gcode("5.0.1")
+    assert not prusa_printer.supports_binary_gcode("3.14.1")
+    assert not prusa_printer.supports_binary_gcode("")
+
+
+def test_binary_output_is_part_of_the_slicer_args():
+    slicer = SlicerRunner("/opt/prusa-slicer")
+
+    assert "--binary-gcode" in slicer.output_args("draft", binary=True)
+    assert "--binary-gcode" not in slicer.output_args("draft")
+
+
+@pytest.mark.asyncio
+async def test_text_gcode_is_the_default(mocker):
+    import server
+    mocker.patch.object(server, "printer_binary_gcode", None)
+    get_info = mocker.patch.object(server.printer, "get_info", AsyncMock(return_value={"binary_gcode": True}))
+
+    assert server.GCODE_FORMAT == "text"
+    assert await server.use_binary_gcode() is False
+    get_info.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_slice_model_picks_the_format_from_printer_capabilities(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "GCODE_FORMAT", "auto")
+    mocker.patch.object(server, "printer_binary_gcode", None)
+    get_info = mocker.patch.object(server.printer, "get_info", AsyncMock(return_value={"binary_gcode": True}))
+    slice_file = mocker.patch.object(server.slicer, "slice_file", AsyncMock(return_value={"success": True, "message": "ok"}))
+    (tmp_path / "part.stl").write_bytes(b"solid x\nendsolid x\n")
+
+    output = await server.slice_model("part.stl", validate=False, orient=False, simplify=False, use_cache=False)
+    await server.slice_model("part.stl", validate=False, orient=False, simplify=False, use_cache=False, binary=False)
+
+    assert "part.bgcode" in output
+    assert slice_file.call_args_list[0].args[1] == os.path.join(str(tmp_path), "part.bgcode")
+    assert slice_file.call_args_list[1].args[1] == os.path.join(str(tmp_path), "part.gcode")
+    # Capabilities are asked once
+    assert get_info.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_offline_printer_gets_text_gcode(mocker):
+    import server
+    mocker.patch.object(server, "GCODE_FORMAT", "auto")
+    mocker.patch.object(server, "printer_binary_gcode", None)
+    mocker.patch.object(server.printer, "get_info", AsyncMock(side_effect=OSError("unreachable")))
+
+    assert await server.use_binary_gcode() is False
+    assert server.printer_binary_gcode is None
+
+
+@pytest.mark.asyncio
+async def test_upload_sends_the_file_named(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "printer_binary_gcode", True)
+    upload = mocker.patch.object(server.printer, "upload_file", AsyncMock(return_value={"message": "uploaded"}))
+    (tmp_path / "part.gcode").write_text("G28\n")
+    # A binary file of an older slice must not replace the G-code asked for
+    (tmp_path / "part.bgcode").write_bytes(b"GCDE")
+
+    await server.upload_model("part.gcode")
+    assert upload.call_args.args == (os.path.join(str(tmp_path), "part.gcode"), "part.gcode")
+
+    await server.upload_model("part.bgcode")
+    assert upload.call_args.args == (os.path.join(str(tmp_path), "part.bgcode"), "part.bgcode")
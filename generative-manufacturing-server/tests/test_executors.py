@@ -0,0 +1,73 @@
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import executors
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.mark.asyncio
+async def test_run_keeps_context_and_counts_tasks():
+    pool = executors.Pool("test", 2)
+    request_id.set("abc")
+
+    assert await pool.run(request_id.get) == "abc"
+    with pytest.raises(ZeroDivisionError):
+        await pool.run(lambda: 1 / 0)
+
+    stats = pool.stats()
+    assert stats["submitted"] == stats["completed"] == 2
+    assert stats["failed"] == 1
+    assert stats["running"] == stats["queued"] == 0
+    assert stats["wait_ms"]["max"] >= stats["wait_ms"]["mean"] >= 0
+    pool.shutdown()
+
+
+def test_stats_show_busy_workers_and_queue():
+    pool = executors.Pool("test", 1)
+    release = threading.Event()
+    started = threading.Event()
+    first = pool.submit(lambda: started.set() or release.wait(5))
+    second = pool.submit(lambda: None)
+    third = pool.submit(lambda: None)
+    started.wait(5)
+
+    third.cancel()
+    stats = pool.stats()
+    assert stats["running"] == 1 and stats["utilization"] == 1.0
+    assert stats["queued"] == 1
+
+    release.set()
+    first.result(5)
+    second.result(5)
+    assert pool.stats()["peak_running"] == 1
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_camera_is_not_starved_by_cpu_work(mocker):
+    mocker.patch.object(executors, "_pools", {})
+    mocker.patch.dict(executors.POOL_SIZES, {"camera": 1, "cpu": 1})
+    release = threading.Event()
+    busy = asyncio.ensure_future(executors.run("cpu", release.wait, 5))
+    await asyncio.sleep(0.05)
+
+    assert await asyncio.wait_for(executors.run("camera", lambda: "frame"), 1) == "frame"
+    assert set(executors.stats()) == {"camera", "cpu"}
+    assert executors.stats()["cpu"]["running"] == 1
+
+    release.set()
+    await busy
+    with pytest.raises(KeyError):
+        executors.pool("nothing")
+
+
+def test_process_runner_waiters_are_reported():
+    from process_runner import default_runner
+    assert executors.pool("tools") is default_runner.executor
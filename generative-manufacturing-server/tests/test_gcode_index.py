@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gcode_index
+
+def test_read_metadata_parses_the_footer(tmp_path, sliced_gcode):
+    path = tmp_path / "part.gcode"
+    path.write_bytes(sliced_gcode())
+
+    metadata = gcode_index.read_metadata(str(path))
+
+    assert metadata == {"filament_mm": "1234.56", "filament_g": "3.71", "print_time": "1h 2m 3s",
+                        "layers": "3", "layer_height": "0.2"}
+    assert gcode_index.format_metadata(metadata) == "estimated print time 1h 2m 3s, 3.71 g filament, 3 layers"
+
+
+def test_scan_indexes_layers(tmp_path, sliced_gcode):
+    path = tmp_path / "part.gcode"
+    data = sliced_gcode()
+    path.write_bytes(data)
+
+    index = gcode_index.scan(str(path))
+
+    assert index["z"] == [0.2, 0.4, 0.6]
+    assert index["progress"] == [0, 33, 66]
+    assert index["metadata"]["max_z"] == 0.6
+    assert [data[offset:offset + 13] for offset in index["offsets"]] == [b";LAYER_CHANGE"] * 3
+    assert data[index["end"]:].startswith(b"; filament used [mm]")
+
+
+def test_read_layer(tmp_path, sliced_gcode):
+    path = tmp_path / "part.gcode"
+    path.write_bytes(sliced_gcode())
+    index = gcode_index.load_index(str(path))
+
+    layer = gcode_index.read_layer(str(path), index, 1)
+
+    assert layer.startswith(b";LAYER_CHANGE\n;Z:0.4")
+    assert b"G1 X1 Y1" in layer and b"X2" not in layer
+    assert gcode_index.read_layer(str(path), index, 2).endswith(b"M84\n\n")
+    with pytest.raises(IndexError):
+        gcode_index.read_layer(str(path), index, 3)
+
+
+def test_index_is_cached_and_follows_content(tmp_path, mocker, sliced_gcode):
+    path = tmp_path / "part.gcode"
+    path.write_bytes(sliced_gcode())
+    gcode_index.load_index(str(path))
+    assert json.loads((tmp_path / "part.gcode.index.json").read_text())["z"] == [0.2, 0.4, 0.6]
+
+    scan = mocker.spy(gcode_index, "scan")
+    gcode_index.load_index(str(path))
+    assert scan.call_count == 0
+
+    path.write_bytes(sliced_gcode(5))
+    assert gcode_index.layer_count(gcode_index.load_index(str(path))) == 5
+    assert scan.call_count == 1
+
+
+def test_layer_at_progress(tmp_path, sliced_gcode):
+    path = tmp_path / "part.gcode"
+    path.write_bytes(sliced_gcode(10))
+    index = gcode_index.load_index(str(path))
+
+    assert gcode_index.layer_at_progress(index, 0) == 0
+    assert gcode_index.layer_at_progress(index, 45) == 4
+    assert gcode_index.layer_at_progress(index, 100) == 9
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.gcode"
+    path.write_bytes(b"")
+
+    index = gcode_index.load_index(str(path))
+
+    assert gcode_index.layer_count(index) == 0
+    assert gcode_index.layer_at_progress(index, 50) is None
+
+
+@pytest.mark.asyncio
+async def test_server_gcode_tools(mocker, tmp_path, sliced_gcode):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    (tmp_path / "part.gcode").write_bytes(sliced_gcode(10))
+    mocker.patch.object(server.printer, "get_status", return_value={
+        "state": "Printing", "temp_nozzle": 215, "target_nozzle": 215, "temp_bed": 60, "target_bed": 60,
+        "temp_chamber": 0, "target_chamber": 0, "progress": 45, "time_remaining": 100, "file_name": "part.gcode",
+    })
+
+    info = json.loads((await server.get_gcode_info("part.gcode"))[0].text)
+    assert info["layers"] == 10
+    assert info["metadata"]["max_z"] == 2.0
+
+    assert (await server.get_gcode_layer("part.gcode", 2)).startswith(";LAYER_CHANGE\n;Z:0.4")
+    assert "out of range" in await server.get_gcode_layer("part.gcode", 11)
+    assert "Layer: 5 / 10 (Z 1 mm)" in await server.get_printer_status()
+
+
+def binary_gcode(metadata: dict[int, str]) -> bytes:
+    """A .bgcode file with uncompressed INI metadata blocks, a thumbnail and one G-code block, CRC32 checksums."""
+    import struct
+    import zlib
+
+    def block(block_type, params, data, compression=0):
+        header = struct.pack("<HHI", block_type, compression, len(data))
+        body = header + params + data
+        return body + struct.pack("<I", zlib.crc32(body))
+
+    parts = [b"GCDE" + struct.pack("<IH", 1, 1)]
+    for block_type, text in metadata.items():
+        parts.append(block(block_type, struct.pack("<H", 0), text.encode()))
+    parts.append(block(5, struct.pack("<HHH", 0, 16, 16), b"\x89PNG" + b"\x00" * 60))
+    parts.append(block(1, struct.pack("<H", 0), b";LAYER_CHANGE\n;Z:0.2\nG1 X1\n"))
+    return b"".join(parts)
+
+
+def test_binary_gcode_metadata(tmp_path):
+    path = tmp_path / "part.bgcode"
+    path.write_bytes(binary_gcode({
+        0: "Producer=PrusaSlicer 2.7.1\n",
+        3: "printer_model=MK4\nfilament used [g]=3.71\nestimated printing time (normal mode)=1h 2m 3s\nmax_layer_z=12.4\n",
+    }))
+
+    index = gcode_index.load_index(str(path))
+
+    assert gcode_index.is_binary(str(path))
+    assert index["metadata"] == {"printer_model": "MK4", "filament_g": "3.71", "print_time": "1h 2m 3s", "max_z": 12.4}
+    # Layers sit inside compressed G-code blocks
+    assert gcode_index.layer_count(index) == 0
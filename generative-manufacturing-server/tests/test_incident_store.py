@@ -0,0 +1,92 @@
+import base64
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import incident_store
+
+FRAME = b"\xff\xd8\xff\xe0" + b"frame" * 100 + b"\xff\xd9"
+FAILURE = {"status": "failure", "issues": [{"type": "Spaghetti", "confidence": 0.9}], "recommendation": "stop"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return incident_store.IncidentStore(str(tmp_path), max_incidents=0, max_age_seconds=0)
+
+
+def test_identical_frames_are_stored_once(store, tmp_path):
+    first = store.record(FAILURE, FRAME, source="deep_print_check")
+    second = store.record({"status": "ok"}, FRAME)
+
+    assert first["frame_id"] == second["frame_id"]
+    assert first["frame_uri"] == "incident://frames/" + first["frame_id"]
+    assert first["analysis"] == FAILURE and first["source"] == "deep_print_check"
+    assert os.listdir(tmp_path / "frames") == [first["frame_id"] + ".jpg"]
+    assert store.read_frame(first["frame_id"]) == (FRAME, "image/jpeg")
+    assert store.read_frame("missing") is None
+    assert store.stats()["frame_bytes"] == len(FRAME)
+
+
+def test_latest_skips_ok_checks(store):
+    failure = store.record(FAILURE)
+    store.record({"status": "ok"})
+
+    assert store.latest()["id"] == failure["id"]
+    assert store.latest(exclude_status=None)["status"] == "ok"
+
+
+def test_list_filters_and_pages(store):
+    for i in range(5):
+        store.record(FAILURE if i % 2 else {"status": "ok"})
+
+    page = store.list(status="ok", limit=2, offset=1)
+    assert page["total"] == 3
+    assert [item["id"] for item in page["items"]] == [3, 1]
+
+
+def test_retention_deletes_old_incidents_and_their_frames(tmp_path):
+    store = incident_store.IncidentStore(str(tmp_path), max_incidents=2, max_age_seconds=3600)
+    old = store.record(FAILURE, b"old frame")
+    store.record(FAILURE, b"frame a")
+    store.record(FAILURE, b"frame b")
+
+    assert store.get(old["id"]) is None
+    assert store.read_frame(old["frame_id"]) is None
+    assert not (tmp_path / "frames" / (old["frame_id"] + ".jpg")).exists()
+    assert store.stats()["incidents"] == 2
+
+    aged = store.record(FAILURE, b"frame b")
+    store.max_age_seconds = 1e-6
+    time.sleep(0.01)
+    assert store.prune()["incidents"] == 2
+    assert store.get(aged["id"]) is None and store.stats()["frames"] == 0
+
+
+@pytest.mark.asyncio
+async def test_review_stores_the_frame_and_returns_its_uri(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "incidents", incident_store.IncidentStore(str(tmp_path)))
+
+    result = json.loads((await server.simulate_spaghetti_incident())[0].text)
+
+    assert "image" not in result
+    assert result["analysis"]["status"] == "failure"
+    frame_id = result["frame_uri"][len("incident://frames/"):]
+    assert await server.incident_frame(frame_id) == server.incidents.read_frame(frame_id)[0]
+    image = (await server.get_incident_frame(result["frame_uri"]))[0]
+    assert base64.b64decode(image.data) == server.incidents.read_frame(frame_id)[0]
+
+    # Without arguments, and by id, the stored incident is reviewed again
+    latest = json.loads((await server.review_latest_incident())[0].text)
+    assert latest["incident_id"] == result["incident_id"] and latest["sops"] == result["sops"]
+    by_id = json.loads((await server.review_latest_incident(incident_id=result["incident_id"]))[0].text)
+    assert by_id["frame_uri"] == result["frame_uri"]
+    assert "not found" in json.loads((await server.review_latest_incident(incident_id=99))[0].text)["error"]
+
+    listing = json.loads((await server.list_incidents(status="failure"))[0].text)
+    assert listing["total"] == 1
+    assert "Invalid base64" in json.loads((await server.review_latest_incident(FAILURE, "not base64!"))[0].text)["error"]
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import job_queue
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_the_background_within_the_worker_limit():
+    queue = job_queue.JobQueue(workers=2)
+    release = asyncio.Event()
+    running = []
+
+    async def work(job):
+        running.append(job.id)
+        job.set_stage("working")
+        await release.wait()
+        return job.name
+
+    jobs = [queue.submit(f"job {i}", work) for i in range(3)]
+    await asyncio.sleep(0.01)
+
+    assert len(running) == 2
+    assert [job.status for job in jobs] == ["running", "running", "queued"]
+    assert jobs[0].stage == "working"
+    assert queue.stats()["queued"] == 1
+
+    release.set()
+    assert await asyncio.gather(*(job.task for job in jobs)) == ["job 0", "job 1", "job 2"]
+    assert all(job.status == "done" for job in jobs)
+    stats = queue.stats()
+    assert stats["done"] == 3
+    assert stats["wait_time"]["count"] == 3
+    assert stats["run_time"]["max"] >= 0
+    assert stats["max_queued_seen"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_and_running_jobs():
+    queue = job_queue.JobQueue(workers=1)
+    never = asyncio.Event()
+
+    async def work(job):
+        await never.wait()
+
+    running = queue.submit("running", work)
+    waiting = queue.submit("waiting", work)
+    await asyncio.sleep(0.01)
+
+    assert queue.cancel(waiting.id)
+    assert queue.cancel(running.id)
+    await asyncio.wait([running.task, waiting.task])
+
+    assert running.status == waiting.status == "cancelled"
+    assert waiting.started_at is None
+    assert not queue.cancel(running.id)
+    assert queue.stats()["cancelled"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_keep_the_error():
+    queue = job_queue.JobQueue(workers=1)
+
+    async def work(job):
+        raise ValueError("bad mesh")
+
+    job = queue.submit("broken", work)
+    await job.task
+
+    assert job.status == "failed"
+    assert job.error == "bad mesh"
+    assert job.to_dict()["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions():
+    queue = job_queue.JobQueue(workers=1, max_queued=1)
+    never = asyncio.Event()
+
+    async def work(job):
+        await never.wait()
+
+    first = queue.submit("first", work)
+    await asyncio.sleep(0.01)
+    second = queue.submit("second", work)
+
+    with pytest.raises(job_queue.QueueFull):
+        queue.submit("third", work)
+    assert queue.stats()["rejected"] == 1
+    first.task.cancel()
+    second.task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_server_slice_jobs(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "slice_jobs", job_queue.JobQueue(workers=1))
+    release = asyncio.Event()
+
+    async def slice_file(input_path, output_path, intent):
+        await release.wait()
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    (tmp_path / "part.stl").write_bytes(b"solid x\nendsolid x\n")
+
+    message = await server.submit_slice_job("part.stl", validate=False, use_cache=False)
+    job_id = message.split()[3]
+    await asyncio.sleep(0.01)
+    status = json.loads((await server.get_slice_job(job_id))[0].text)
+    assert status["status"] == "running"
+    assert status["stage"] == "slicing"
+
+    release.set()
+    status = json.loads((await server.get_slice_job(job_id, wait=True, timeout=5))[0].text)
+    assert status["status"] == "done"
+    assert status["result"].startswith("Successfully sliced part.stl")
+    assert await server.cancel_slice_job(job_id) == f"Slice job {job_id} already finished."
+    assert json.loads((await server.get_slice_queue_stats())[0].text)["done"] == 1
+
+
+
+@pytest.mark.asyncio
+async def test_failed_slices_fail_their_job(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "slice_jobs", job_queue.JobQueue(workers=1))
+    mocker.patch.object(server.slicer, "slice_file", AsyncMock(return_value={"success": False, "error": "no bed"}))
+    (tmp_path / "part.stl").write_bytes(b"solid x\nendsolid x\n")
+
+    message = await server.submit_slice_job("part.stl", validate=False, use_cache=False)
+    status = json.loads((await server.get_slice_job(message.split()[3], wait=True, timeout=5))[0].text)
+
+    assert status["status"] == "failed"
+    assert status["error"] == "Slicing failed: no bed"
+    assert await server.slice_model("part.stl", validate=False, use_cache=False) == "Slicing failed: no bed"
+    assert json.loads((await server.get_slice_queue_stats())[0].text)["failed"] == 2
+
+
+def test_stage_timer_adds_up_repeated_stages(mocker):
+    clock = mocker.patch("job_queue.time.perf_counter", side_effect=[0.0, 1.0, 1.0, 3.0, 3.0, 3.5, 4.0])
+    started = []
+    timer = job_queue.StageTimer(on_stage=started.append)
+
+    timer.start("a")
+    timer.start("b")
+    timer.start("a")
+    assert timer.breakdown() == {"a": 1.5, "b": 2.0}
+    timer.finish()
+
+    assert started == ["a", "b", "a"]
+    assert timer.durations == {"a": 2.0, "b": 2.0}
+    assert clock.call_count == 7
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import loop_monitor
+
+
+def block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_measures_lag_of_a_blocking_call():
+    monitor = loop_monitor.LoopMonitor(interval=0.02, block_threshold=0.05, debug=False)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    block_the_loop(0.15)
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    stats = monitor.stats()
+    assert not stats["running"]
+    assert stats["samples"] >= 2
+    assert stats["blocked"] >= 1
+    assert stats["lag_ms"]["max"] >= 90
+    assert stats["stacks_logged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_debug_logs_the_blocking_stack(caplog):
+    monitor = loop_monitor.LoopMonitor(interval=0.02, block_threshold=0.05, debug=True)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    with caplog.at_level(logging.WARNING, logger="loop_monitor"):
+        block_the_loop(0.3)
+        await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    # One per stall, but a slow scheduler can add a stall of its own
+    assert monitor.stacks_logged >= 1
+    assert "block_the_loop" in caplog.text and "time.sleep" in caplog.text
+
+
+def test_stats_before_start():
+    stats = loop_monitor.LoopMonitor(interval=1).stats()
+    assert stats["samples"] == 0 and "lag_ms" not in stats
+
+
+@pytest.mark.asyncio
+async def test_server_reports_loop_lag(mocker):
+    import server
+    mocker.patch.object(server, "loop_lag", loop_monitor.LoopMonitor(interval=0.01))
+    server.loop_lag.start()
+    await asyncio.sleep(0.05)
+
+    stats = json.loads((await server.get_loop_stats())[0].text)
+    await server.loop_lag.stop()
+    assert stats["running"] and stats["samples"] >= 1
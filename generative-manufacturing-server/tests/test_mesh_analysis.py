@@ -0,0 +1,158 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+
+# Closed tetrahedron with outward facing winding, volume 1000/6 mm^3
+A, B, C, D = [0, 0, 0], [10, 0, 0], [0, 10, 0], [0, 0, 10]
+TETRA = np.array([[A, C, B], [A, B, D], [A, D, C], [B, C, D]], dtype=np.float32)
+
+
+def write_binary(path, triangles):
+    records = np.zeros(len(triangles), dtype=mesh_analysis.STL_DTYPE)
+    records["vertices"] = triangles
+    with open(path, "wb") as f:
+        f.write(b"\0" * 80)
+        f.write(np.uint32(len(triangles)).tobytes())
+        f.write(records.tobytes())
+
+
+def write_ascii(path, triangles):
+    lines = ["solid test"]
+    for tri in triangles:
+        lines += ["facet normal 0 0 0", "outer loop"]
+        lines += [f"vertex {x:e} {y:e} {z:e}" for x, y, z in tri]
+        lines += ["endloop", "endfacet"]
+    lines.append("endsolid test")
+    with open(path, "w") as f:
+        f.write("\n".join(lines))
+
+
+@pytest.mark.parametrize("writer", [write_binary, write_ascii])
+def test_closed_mesh_stats(tmp_path, writer):
+    path = str(tmp_path / "tetra.stl")
+    writer(path, TETRA)
+
+    report = mesh_analysis.validate_mesh(path)
+
+    assert report["ok"], report
+    stats = report["stats"]
+    assert stats["triangles"] == 4
+    assert stats["vertices"] == 4
+    assert stats["volume"] == pytest.approx(1000 / 6, rel=1e-5)
+    assert stats["surface_area"] == pytest.approx(150 + 50 * np.sqrt(3), rel=1e-5)
+    assert stats["size"] == [10, 10, 10]
+    assert stats["watertight"] and stats["manifold"]
+    assert stats["inconsistent_edges"] == 0
+
+
+def test_binary_load_is_memory_mapped(tmp_path):
+    path = str(tmp_path / "tetra.stl")
+    write_binary(path, TETRA)
+
+    triangles = mesh_analysis.load_stl(path)
+
+    assert not triangles.flags.owndata
+    np.testing.assert_array_equal(triangles, TETRA)
+
+
+def test_open_mesh_is_rejected(tmp_path):
+    path = str(tmp_path / "open.stl")
+    write_binary(path, TETRA[:3])
+
+    report = mesh_analysis.validate_mesh(path)
+
+    assert not report["ok"]
+    assert report["stats"]["boundary_edges"] == 3
+    assert "not watertight" in report["errors"][0]
+
+
+def test_flipped_face_is_reported(tmp_path):
+    path = str(tmp_path / "flipped.stl")
+    flipped = TETRA.copy()
+    flipped[3] = flipped[3][::-1]
+    write_binary(path, flipped)
+
+    report = mesh_analysis.validate_mesh(path)
+
+    assert report["stats"]["inconsistent_edges"] == 3
+    assert any("winding" in w for w in report["warnings"])
+
+
+def test_inside_out_mesh_is_rejected(tmp_path):
+    path = str(tmp_path / "inverted.stl")
+    write_binary(path, TETRA[:, ::-1])
+
+    report = mesh_analysis.validate_mesh(path)
+
+    assert not report["ok"]
+    assert report["stats"]["volume"] < 0
+
+
+def test_bed_fit_allows_rotation_on_the_bed(tmp_path):
+    path = str(tmp_path / "long.stl")
+    # 240 mm along Y does not fit a 250 x 210 bed unless turned 90 degrees
+    write_binary(path, TETRA * np.array([2, 24, 1], dtype=np.float32))
+
+    assert mesh_analysis.validate_mesh(path, bed=(250, 210, 220))["ok"]
+    report = mesh_analysis.validate_mesh(path, bed=(200, 200, 200))
+    assert not report["ok"]
+    assert "does not fit" in report["errors"][0]
+
+
+def test_empty_and_missing_files(tmp_path):
+    path = str(tmp_path / "empty.stl")
+    write_binary(path, TETRA[:0])
+
+    assert mesh_analysis.validate_mesh(path)["errors"] == ["Mesh has no triangles."]
+    assert not mesh_analysis.validate_mesh(str(tmp_path / "missing.stl"))["ok"]
+
+
+def test_ascii_is_converted_to_binary_in_place(tmp_path):
+    path = str(tmp_path / "tetra.stl")
+    write_ascii(path, TETRA)
+
+    assert mesh_analysis.ensure_binary_stl(path)
+    assert mesh_analysis.is_binary_stl(path)
+    assert os.path.getsize(path) == mesh_analysis.STL_HEADER_SIZE + 50 * len(TETRA)
+    np.testing.assert_array_equal(mesh_analysis.load_stl(path), TETRA)
+    assert not mesh_analysis.ensure_binary_stl(path)
+
+
+def test_gzipped_stl_loads(tmp_path):
+    import gzip
+    path = str(tmp_path / "tetra.stl")
+    write_binary(path, TETRA)
+    with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+        target.write(source.read())
+
+    np.testing.assert_array_equal(mesh_analysis.load_stl(path + ".gz"), TETRA)
+
+
+def test_3mf_has_indexed_vertices(tmp_path):
+    import zipfile
+    path = str(tmp_path / "tetra.3mf")
+
+    mesh_analysis.write_3mf(path, TETRA)
+
+    with zipfile.ZipFile(path) as package:
+        model = package.read("3D/3dmodel.model").decode()
+    assert model.count("<vertex ") == 4
+    assert model.count("<triangle ") == 4
+
+
+@pytest.mark.asyncio
+async def test_slice_model_rejects_broken_mesh_before_slicing(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    slice_file = mocker.patch.object(server.slicer, "slice_file")
+    write_binary(str(tmp_path / "open.stl"), TETRA[:3])
+
+    output = await server.slice_model("open.stl")
+
+    assert output.startswith("Mesh validation failed for open.stl")
+    slice_file.assert_not_called()
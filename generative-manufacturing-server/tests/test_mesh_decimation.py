@@ -0,0 +1,96 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import mesh_decimation
+from slicer_runner import SlicerRunner
+
+
+def tessellated_cube(n, size=20.0, sphere=False):
+    """Closed cube with every side split into an n x n grid, optionally projected onto a sphere."""
+    t = np.linspace(-1, 1, n + 1)
+    u, v = np.meshgrid(t, t, indexing="ij")
+    sides = []
+    for axis in range(3):
+        for sign in (-1, 1):
+            p = np.zeros((n + 1, n + 1, 3))
+            p[..., axis] = sign
+            p[..., (axis + 1) % 3] = u
+            p[..., (axis + 2) % 3] = v
+            a, b, c, d = p[:-1, :-1], p[1:, :-1], p[1:, 1:], p[:-1, 1:]
+            side = np.concatenate([np.stack([a, b, c], 2).reshape(-1, 3, 3), np.stack([a, c, d], 2).reshape(-1, 3, 3)])
+            sides.append(side if sign > 0 else side[:, ::-1])
+    tris = np.concatenate(sides)
+    if sphere:
+        tris = tris / np.linalg.norm(tris, axis=2, keepdims=True)
+    return (tris * size / 2).astype(np.float32)
+
+
+def test_flat_faces_collapse_and_keep_corners():
+    cube = tessellated_cube(40)
+
+    simplified, report = mesh_decimation.decimate(cube, tolerance=0.1)
+
+    assert report["applied"]
+    assert report["triangles_after"] < len(cube) / 10
+    assert report["triangles_removed"] == len(cube) - len(simplified)
+    stats = mesh_analysis.analyze_mesh(simplified)
+    assert stats["watertight"] and stats["inconsistent_edges"] == 0
+    assert stats["size"] == pytest.approx([20, 20, 20], abs=1e-3)
+    assert stats["volume"] == pytest.approx(8000, rel=1e-3)
+
+
+def test_curved_surface_stays_within_tolerance():
+    sphere = tessellated_cube(60, sphere=True)
+
+    simplified, report = mesh_decimation.decimate(sphere, tolerance=0.1)
+
+    assert report["applied"]
+    assert report["triangles_after"] < len(sphere) / 4
+    assert 0 < report["max_deviation"] <= 0.1
+    # Every simplified vertex still lies on the sphere within the tolerance
+    radii = np.linalg.norm(simplified.reshape(-1, 3), axis=1)
+    assert np.abs(radii - 10).max() <= 0.1 + 1e-4
+    assert mesh_analysis.analyze_mesh(simplified)["watertight"]
+
+
+def test_small_meshes_are_left_alone(tmp_path):
+    path = str(tmp_path / "cube.stl")
+    output_path = str(tmp_path / "out.stl")
+    mesh_analysis.write_binary_stl(path, tessellated_cube(4))
+
+    report = mesh_decimation.decimate_file(path, output_path, tolerance=0.1, min_triangles=1000)
+
+    assert not report["applied"]
+    assert not os.path.exists(output_path)
+
+
+@pytest.mark.parametrize("intent, height", [("draft", 0.25), ("strong", 0.2), ("detail", 0.1), ("default", 0.2)])
+def test_tolerance_follows_layer_height(intent, height):
+    assert SlicerRunner(slicer_path="prusa-slicer").layer_height(intent) == height
+
+
+@pytest.mark.asyncio
+async def test_slice_model_slices_the_simplified_mesh(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(mesh_decimation, "MIN_TRIANGLES", 1000)
+    sliced = {}
+
+    async def slice_file(input_path, output_path, intent):
+        sliced["triangles"] = len(mesh_analysis.load_stl(input_path))
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    mesh_analysis.write_binary_stl(str(tmp_path / "cube.stl"), tessellated_cube(40))
+
+    output = await server.slice_model("cube.stl", intent="detail")
+
+    assert "Simplified mesh for slicing" in output
+    assert sliced["triangles"] < 40 * 40 * 12 / 2
+    # The stored model keeps its full resolution
+    assert len(mesh_analysis.load_stl(str(tmp_path / "cube.stl"))) == 40 * 40 * 12
@@ -0,0 +1,133 @@
+import asyncio
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import mesh_render
+
+# 20 mm cube centered on the origin, outward facing
+CORNERS = np.array([[x, y, z] for x in (-10, 10) for y in (-10, 10) for z in (-10, 10)], dtype=np.float32)
+QUADS = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+CUBE = np.array([CORNERS[[a, b, c]] for a, b, c, d in QUADS] + [CORNERS[[a, c, d]] for a, b, c, d in QUADS])
+
+
+def decode(png: bytes) -> np.ndarray:
+    image = cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return image[:, :, ::-1]
+
+
+def is_background(pixels: np.ndarray) -> np.ndarray:
+    return np.all(pixels == mesh_render.BACKGROUND.astype(np.uint8), axis=-1)
+
+
+def test_png_round_trip():
+    image = np.random.default_rng(0).integers(0, 256, (7, 5, 3), dtype=np.uint8)
+
+    np.testing.assert_array_equal(decode(mesh_render.encode_png(image)), image)
+
+
+def test_cube_fills_the_frame_front_on():
+    assert mesh_analysis.analyze_mesh(CUBE)["volume"] > 0
+
+    image = mesh_render.render(CUBE, 100, 100, "front")
+
+    # A square seen face on: covered in the middle, background only in the margin
+    assert not is_background(image[10:90, 10:90]).any()
+    assert is_background(image[:3]).all() and is_background(image[:, :3]).all()
+    # One face, flat shaded, one color
+    assert len(np.unique(image[10:90, 10:90].reshape(-1, 3), axis=0)) == 1
+
+
+def test_iso_view_shows_three_shades():
+    image = mesh_render.render(CUBE, 200, 200, "iso")
+
+    colors = image[~is_background(image)].reshape(-1, 3)
+    values, counts = np.unique(colors, axis=0, return_counts=True)
+    # Three visible faces dominate, anti-aliased edges make up the rest
+    assert (counts > 0.1 * len(colors)).sum() == 3
+
+
+@pytest.mark.parametrize("triangles", [CUBE, CUBE[:, ::-1]], ids=["outward", "inside_out"])
+def test_flipped_meshes_still_render(triangles):
+    image = mesh_render.render(triangles, 100, 100, "top")
+
+    assert not is_background(image[10:90, 10:90]).any()
+
+
+def test_views_are_tiled(tmp_path):
+    stl_path = str(tmp_path / "cube.stl")
+    png_path = str(tmp_path / "cube.png")
+    mesh_analysis.write_binary_stl(stl_path, CUBE)
+
+    mesh_render.render_stl_to_png(stl_path, png_path, 400, 300, ("iso", "front", "top", "right"))
+
+    with open(png_path, "rb") as f:
+        image = decode(f.read())
+    assert image.shape == (300, 400, 3)
+    # Every quadrant holds a model
+    for quadrant in (image[:150, :200], image[:150, 200:], image[150:, :200], image[150:, 200:]):
+        assert not is_background(quadrant[75, 100])
+
+
+@pytest.mark.asyncio
+async def test_list_local_models_with_thumbnails(mocker, tmp_path):
+    import server
+    import stl_generator
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mesh_analysis.write_binary_stl(str(tmp_path / "cube.stl"), CUBE)
+    render = mocker.spy(mesh_render, "render_stl_to_png")
+
+    content = await server.list_local_models(thumbnails=True)
+    await server.list_local_models(thumbnails=True)
+
+    assert [c.type for c in content] == ["text", "text", "image"]
+    assert content[1].text == "cube.stl"
+    assert os.path.exists(stl_generator.thumbnail_path_for(str(tmp_path / "cube.stl")))
+    # The second listing reuses the cached thumbnail
+    assert render.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_freshness_is_checked_off_the_loop(mocker, tmp_path):
+    import executors
+    import stl_generator
+    mesh_analysis.write_binary_stl(str(tmp_path / "cube.stl"), CUBE)
+    run = mocker.spy(executors, "run")
+
+    path = await stl_generator.render_stl_thumbnail(str(tmp_path / "cube.stl"))
+    assert await stl_generator.render_stl_thumbnail(str(tmp_path / "cube.stl")) == path
+
+    checks = [call.args for call in run.call_args_list if call.args[1] is stl_generator._check_thumbnail]
+    assert [args[0] for args in checks] == ["io", "io"]
+    assert await stl_generator.render_stl_thumbnail(str(tmp_path / "missing.stl")) is None
+
+
+@pytest.mark.asyncio
+async def test_thumbnail_renders_are_bounded(mocker, tmp_path):
+    import server
+    import stl_generator
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "THUMBNAIL_CONCURRENCY", 2)
+    for i in range(6):
+        mesh_analysis.write_binary_stl(str(tmp_path / f"cube{i}.stl"), CUBE)
+    running = peak = 0
+
+    async def render(stl_path):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return None
+
+    mocker.patch.object(stl_generator, "render_stl_thumbnail", side_effect=render)
+
+    await server.list_local_models(thumbnails=True)
+
+    assert stl_generator.render_stl_thumbnail.call_count == 6
+    assert peak == 2
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_seconds", "Test.", ["op"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, ("a\"b",))
+
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{op="a\\"b",le="0.1"} 1',
+        'test_seconds_bucket{op="a\\"b",le="1.0"} 3',
+        'test_seconds_bucket{op="a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{op="a\\"b"} 6.05',
+        'test_seconds_count{op="a\\"b"} 4',
+    ]
+
+
+def test_metric_needs_samples():
+    with pytest.raises(TypeError):
+        metrics.Metric("plain", "No samples.")
+
+
+def test_registry_refuses_duplicates():
+    registry = metrics.Registry()
+    registry.register(metrics.Counter("things_total", "Things."))
+    with pytest.raises(ValueError):
+        registry.register(metrics.Counter("things_total", "Things."))
+    assert registry.render() == "# HELP things_total Things.\n# TYPE things_total counter\n"
+
+
+@pytest.mark.asyncio
+async def test_timed_counts_errors_of_sync_and_async_calls():
+    @metrics.timed("test_service")
+    async def fetch(fail):
+        assert metrics.external_in_flight.value(("test_service",)) == 1
+        if fail:
+            raise ConnectionError("offline")
+        return "ok"
+
+    @metrics.timed("test_service", "capture")
+    def capture():
+        return b"frame"
+
+    assert await fetch(False) == "ok"
+    with pytest.raises(ConnectionError):
+        await fetch(True)
+    assert capture() == b"frame"
+
+    assert metrics.external_duration.count(("test_service", "fetch")) == 2
+    assert metrics.external_errors.value(("test_service", "fetch")) == 1
+    assert metrics.external_duration.count(("test_service", "capture")) == 1
+    assert metrics.external_in_flight.value(("test_service",)) == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_processes_count_as_errors():
+    from process_runner import ProcessRunner
+    operation = os.path.splitext(os.path.basename(sys.executable))[0]
+    before = metrics.external_errors.value(("process", operation))
+
+    result = await ProcessRunner(max_workers=1).run([sys.executable, "-c", "import sys; sys.exit(3)"])
+
+    assert result.returncode == 3
+    assert metrics.external_errors.value(("process", operation)) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_tools_called_through_mcp_are_measured():
+    import server
+    before = metrics.tool_duration.count(("get_loop_stats",))
+
+    await server.mcp.call_tool("get_loop_stats", {})
+
+    assert metrics.tool_duration.count(("get_loop_stats",)) == before + 1
+    assert metrics.tool_in_flight.value(("get_loop_stats",)) == 0
+    response = await server.metrics_endpoint(None)
+    text = response.body.decode()
+    assert response.media_type.startswith("text/plain")
+    assert 'mcp_tool_duration_seconds_count{tool="get_loop_stats"}' in text
+    assert "# TYPE event_loop_lag_seconds gauge" in text
+    assert 'executor_max_workers{pool="tools"}' in text
+
+
+@pytest.mark.asyncio
+async def test_tools_registered_later_are_measured():
+    import server
+
+    @server.mcp.tool()
+    @server.instrumented
+    async def late_test_tool() -> str:
+        return "ok"
+
+    try:
+        await server.mcp.call_tool("late_test_tool", {})
+    finally:
+        server.mcp.remove_tool("late_test_tool")
+    assert metrics.tool_duration.count(("late_test_tool",)) == 1
+
+
+def test_capture_without_a_frame_counts_as_error(mocker):
+    import server
+    mocker.patch.object(server, "MOCK_MODE", False)
+    before = metrics.external_errors.value(("camera", "capture"))
+
+    assert server.capture_frame_base64(None) is None
+    assert metrics.external_errors.value(("camera", "capture")) == before + 1
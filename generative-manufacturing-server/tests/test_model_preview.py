@@ -0,0 +1,111 @@
+import asyncio
+import base64
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stl_generator
+from process_runner import ProcessResult
+
+
+@pytest.fixture
+def fake_openscad(mocker, tmp_path, tetra_stl):
+    """Pretends OpenSCAD exists and records every invocation."""
+    mocker.patch.object(stl_generator, "OPENSCAD_PATH", str(tmp_path / "openscad"))
+    mocker.patch.object(stl_generator, "MODELS_DIR", str(tmp_path))
+    (tmp_path / "openscad").write_text("")
+    calls = []
+
+    async def run(cmd, limits=None, cwd=None):
+        if cmd[-1] == "--help":
+            return ProcessResult(cmd=cmd, returncode=0, stdout="", stderr="Usage: openscad [options] file.scad", wall_time=0.0)
+        calls.append((cmd, open(cmd[-1]).read()))
+        with open(cmd[cmd.index("-o") + 1], "wb") as f:
+            f.write(tetra_stl)
+        return ProcessResult(cmd=cmd, returncode=0, stdout="", stderr="", wall_time=0.1)
+
+    mocker.patch.object(stl_generator.default_runner, "run", side_effect=run)
+    mocker.patch.dict(stl_generator._openscad_help, clear=True)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_generate_model_renders_preview_in_process(fake_openscad, mocker):
+    mocker.patch.object(stl_generator, "generate_scad_code", AsyncMock(return_value="cube(10);"))
+
+    result = await stl_generator.generate_model("a cube", "cube", client=MagicMock(), preview=True)
+
+    assert result["status"] == "success"
+    assert base64.b64decode(result["image_base64"]).startswith(b"\x89PNG")
+    # Only the SCAD compile launches OpenSCAD
+    assert len(fake_openscad) == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_model_evaluates_scad_once(fake_openscad, mocker):
+    mocker.patch.object(stl_generator, "generate_scad_code", AsyncMock(return_value="cube(10);"))
+    mocker.patch.object(stl_generator, "PREVIEW_RENDERER", "openscad")
+
+    result = await stl_generator.generate_model("a cube", "cube", client=MagicMock(), preview=True)
+
+    assert result["status"] == "success"
+    assert result["image_base64"]
+    # One full evaluation of the SCAD source, then a preview of the finished mesh
+    assert len(fake_openscad) == 2
+    assert fake_openscad[0][1] == "cube(10);"
+    assert fake_openscad[1][1].startswith("import(")
+    assert "cube.stl" in fake_openscad[1][1]
+
+
+@pytest.mark.asyncio
+async def test_generate_model_without_preview(fake_openscad, mocker):
+    mocker.patch.object(stl_generator, "generate_scad_code", AsyncMock(return_value="cube(10);"))
+
+    result = await stl_generator.generate_model("a cube", "cube", client=MagicMock(), preview=False)
+
+    assert result["status"] == "success"
+    assert result["image_base64"] is None
+    assert result["usage"]["wall_time"] == 0.1
+    assert len(fake_openscad) == 1
+
+
+@pytest.mark.asyncio
+async def test_finished_preview_renders_are_forgotten(mocker, tmp_path):
+    import server
+    mocker.patch.object(stl_generator, "render_stl_preview", AsyncMock(return_value=str(tmp_path / "cube.png")))
+
+    task = server.start_preview_render(str(tmp_path / "cube.stl"))
+    assert server.preview_tasks["cube.stl"] is task
+    await task
+    await asyncio.sleep(0)
+
+    assert "cube.stl" not in server.preview_tasks
+
+
+@pytest.mark.asyncio
+async def test_superseded_preview_render_is_still_rendering(mocker, tmp_path):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    release = asyncio.Event()
+
+    async def render_stl_preview(stl_path, png_path=None):
+        await release.wait()
+        return None
+
+    mocker.patch.object(stl_generator, "render_stl_preview", side_effect=render_stl_preview)
+    first = server.start_preview_render(str(tmp_path / "cube.stl"))
+    waiting = asyncio.create_task(server.get_model_preview("cube.stl"))
+    await asyncio.sleep(0)
+
+    # A second render of the same model cancels the first one
+    server.start_preview_render(str(tmp_path / "cube.stl"))
+    content = await waiting
+    release.set()
+
+    assert first.cancelled()
+    assert content[0].text == "Preview for cube.stl is still rendering."
+    with pytest.raises(asyncio.TimeoutError):
+        await server._await_preview(first, 1)
@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import orientation
+
+@pytest.fixture
+def mushroom(box):
+    """A wide cap on a thin stem: upside down, the whole cap overhangs."""
+    return np.concatenate([box([-2, -2, 0], [2, 2, 20]), box([-15, -15, 20], [15, 15, 24])])
+
+
+def test_rotation_to_bed_points_down_at_the_bed():
+    for down in ([0, 0, -1], [0, 0, 1], [1, 0, 0], [0.3, -0.5, 0.8]):
+        rotation = orientation.rotation_to_bed(down)
+        np.testing.assert_allclose(rotation @ (np.array(down) / np.linalg.norm(down)), [0, 0, -1], atol=1e-9)
+        np.testing.assert_allclose(rotation @ rotation.T, np.eye(3), atol=1e-9)
+
+
+def test_scores_measure_overhang_contact_and_height(mushroom):
+    scores = orientation.score_orientations(mushroom, directions=np.array([[0, 0, -1], [0, 0, 1]]))
+    by_down = {tuple(s["down"]): s for s in scores}
+
+    upright = by_down[(0.0, 0.0, -1.0)]
+    assert upright["current"]
+    assert upright["contact_area"] == pytest.approx(16)
+    assert upright["height"] == pytest.approx(24)
+    # Cap underside, minus the part covered by the stem, plus the stem's end resting on the cap
+    assert upright["overhang_area"] == pytest.approx(900)
+    flipped = by_down[(0.0, 0.0, 1.0)]
+    assert flipped["contact_area"] == pytest.approx(900)
+    assert scores[0] is flipped
+
+
+def test_orient_flips_the_mushroom_onto_its_cap(mushroom):
+    oriented, report = orientation.orient(mushroom)
+
+    assert report["rotated"]
+    stats = mesh_analysis.analyze_mesh(oriented)
+    assert stats["bbox_min"][2] == pytest.approx(0, abs=1e-4)
+    assert stats["size"] == pytest.approx([30, 30, 24], abs=1e-3)
+    assert stats["volume"] == pytest.approx(mesh_analysis.analyze_mesh(mushroom)["volume"], rel=1e-4)
+    assert "overhang 900 -> 16" in orientation.format_report(report)
+
+
+def test_intent_weights_change_the_choice(box):
+    # A tall post on a small base: lying down is quick to print but leaves the post on supports
+    post = np.concatenate([box([-10, -10, 0], [10, 10, 3]), box([-3, -3, 3], [3, 3, 63])])
+
+    _, fast = orientation.orient(post, "fast")
+    _, detail = orientation.orient(post, "pretty detail")
+
+    assert fast["rotated"]
+    assert fast["chosen"]["height"] == pytest.approx(20, abs=1e-3)
+    assert not detail["rotated"]
+    assert detail["chosen"]["height"] == pytest.approx(63, abs=1e-3)
+
+
+def test_intents_map_to_the_slicer_profiles():
+    assert orientation.weights_for_intent("fast draft") is orientation.INTENT_WEIGHTS["draft"]
+    assert orientation.weights_for_intent("Heavy duty") is orientation.INTENT_WEIGHTS["strong"]
+    assert orientation.weights_for_intent("pretty detail") is orientation.INTENT_WEIGHTS["detail"]
+    assert orientation.weights_for_intent("a vase") is orientation.INTENT_WEIGHTS["default"]
+
+
+def test_symmetric_model_keeps_its_orientation(box):
+    cube = box([0, 0, 0], [20, 20, 20])
+
+    oriented, report = orientation.orient(cube)
+
+    assert not report["rotated"]
+    assert oriented is cube
+
+
+def test_orientation_must_fit_the_bed(box):
+    # Lying flat would be lowest, but needs 200 mm of a 150 mm bed
+    pole = box([0, 0, 0], [10, 10, 200])
+    bed = (150, 150, 220)
+
+    oriented, report = orientation.orient(pole, "fast", bed=bed)
+
+    assert report["chosen"]["height"] > 10
+    assert mesh_analysis.fits_bed(np.ptp(oriented.reshape(-1, 3), axis=0), bed)
+
+
+@pytest.mark.asyncio
+async def test_slice_model_slices_the_oriented_mesh(mocker, tmp_path, mushroom):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    sliced = {}
+
+    async def slice_file(input_path, output_path, intent):
+        sliced["bbox"] = mesh_analysis.analyze_mesh(mesh_analysis.load_stl(input_path))["bbox_max"]
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    mesh_analysis.write_binary_stl(str(tmp_path / "mushroom.stl"), mushroom)
+
+    output = await server.slice_model("mushroom.stl")
+
+    assert "Reoriented for printing" in output
+    assert sliced["bbox"][2] == pytest.approx(24, abs=1e-3)
+
+    scores = json.loads((await server.analyze_orientation("mushroom.stl", top=2))[0].text)
+    assert len(scores["best"]) == 2
+    assert scores["current"]["overhang_area"] == pytest.approx(900)
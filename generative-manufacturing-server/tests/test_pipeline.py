@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import job_queue
+import mesh_analysis
+import server
+import stl_generator
+
+
+@pytest.fixture
+def pipeline(mocker, tmp_path, box, sliced_gcode):
+    """server with a generator writing a box, a slicer writing G-code and a printer that reads binary G-code."""
+    mocker.patch.object(server, "client", MagicMock())
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "GCODE_FORMAT", "auto")
+    mocker.patch.object(server, "printer_binary_gcode", None)
+    mocker.patch.object(server, "slice_jobs", job_queue.JobQueue(workers=1))
+    mocker.patch.object(server.slice_cache, "SLICE_CACHE", False)
+    calls = []
+
+    async def generate_model(prompt, output_filename, client=None, preview=True, candidates=None, draft=False):
+        calls.append("generate")
+        path = str(tmp_path / f"{output_filename}.stl")
+        mesh_analysis.write_binary_stl(path, box([0, 0, 0], [20, 20, 10]))
+        return {"status": "success", "path": path, "filename": os.path.basename(path), "final_path": path,
+                "draft": False, "message": "Successfully generated"}
+
+    async def get_info():
+        calls.append("printer")
+        return {"binary_gcode": False}
+
+    async def render_stl_preview(stl_path, png_path=None):
+        calls.append("preview")
+        return None
+
+    async def slice_file(input_path, output_path, intent, binary=False):
+        calls.append("slice")
+        with open(output_path, "wb") as f:
+            f.write(sliced_gcode(10))
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(stl_generator, "generate_model", side_effect=generate_model)
+    mocker.patch.object(stl_generator, "render_stl_preview", side_effect=render_stl_preview)
+    mocker.patch.object(server.printer, "get_info", side_effect=get_info)
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    mocker.patch.object(server.printer, "upload_file", AsyncMock(return_value={"message": "File uploaded"}))
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_runs_every_stage(pipeline, tmp_path):
+    ctx = MagicMock()
+    ctx.report_progress = AsyncMock()
+
+    content = await server.print_from_prompt("a box", filename="box", intent="draft", ctx=ctx)
+    summary = json.loads(content[0].text)
+
+    assert summary["status"] == "uploaded"
+    assert summary["gcode"] == "box.gcode"
+    assert summary["upload"] == "Upload result: File uploaded"
+    assert summary["metadata"]["layers"] == "3"
+    server.printer.upload_file.assert_called_once_with(str(tmp_path / "box.gcode"), "box.gcode")
+
+    stages = summary["timings"]["stages"]
+    # The mesh is validated before the job is queued for a slicer worker
+    assert list(stages) == ["generating", "validating", "queued", "orienting", "simplifying", "slicing",
+                            "indexing", "uploading"]
+    assert set(summary["timings"]["background"]) == {"printer", "preview", "metadata"}
+    assert summary["timings"]["total"] >= sum(stages.values()) - 0.01
+    # The printer is asked while the model generates, the preview renders beside slicing
+    assert pipeline.index("printer") < pipeline.index("slice")
+    assert pipeline.index("preview") < pipeline.index("slice")
+
+    messages = [call.args for call in ctx.report_progress.call_args_list]
+    assert messages[0] == (1, len(server.PIPELINE_STAGES), "generating")
+    assert messages[-1] == (len(server.PIPELINE_STAGES), len(server.PIPELINE_STAGES), "uploading")
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_can_stop_after_slicing(pipeline):
+    content = await server.print_from_prompt("a box", filename="box", upload=False)
+    summary = json.loads(content[0].text)
+
+    assert summary["status"] == "sliced"
+    assert "uploading" not in summary["timings"]["stages"]
+    server.printer.upload_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_reports_the_failing_stage(pipeline, mocker):
+    mocker.patch.object(server.slicer, "slice_file", AsyncMock(return_value={"success": False, "error": "no bed"}))
+
+    content = await server.print_from_prompt("a box", filename="box")
+    summary = json.loads(content[0].text)
+
+    assert summary["status"] == "failed"
+    assert summary["stage"] == "slicing"
+    assert summary["error"] == "Slicing failed: no bed"
+    server.printer.upload_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_generation_failure(pipeline, mocker):
+    mocker.patch.object(stl_generator, "generate_model", AsyncMock(return_value={"status": "error", "message": "no luck"}))
+
+    summary = json.loads((await server.print_from_prompt("a box"))[0].text)
+
+    assert summary["stage"] == "generating"
+    assert summary["error"] == "no luck"
+    assert list(summary["timings"]["stages"]) == ["generating"]
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_reports_exceptions_with_their_stage(pipeline, mocker):
+    mocker.patch.object(stl_generator, "generate_model", AsyncMock(side_effect=RuntimeError("quota exceeded")))
+
+    summary = json.loads((await server.print_from_prompt("a box"))[0].text)
+
+    assert summary["status"] == "failed"
+    assert summary["stage"] == "generating"
+    assert summary["error"] == "RuntimeError: quota exceeded"
+    server.printer.upload_file.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_print_from_prompt_is_not_counted_as_an_upload_tool_call(pipeline):
+    import metrics
+    before = metrics.tool_duration.count(("upload_model",))
+
+    summary = json.loads((await server.print_from_prompt("a box", filename="box"))[0].text)
+
+    assert summary["status"] == "uploaded"
+    assert metrics.tool_duration.count(("upload_model",)) == before
@@ -0,0 +1,107 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import plate_packer
+
+
+def overlaps(a, b):
+    return a["x"] < b["x"] + b["width"] and b["x"] < a["x"] + a["width"] and a["y"] < b["y"] + b["depth"] and b["y"] < a["y"] + a["depth"]
+
+
+def test_pack_rectangles_fills_the_area_without_overlap():
+    sizes = [(50, 50)] * 4 + [(100, 25)] * 4
+
+    positions = plate_packer.pack_rectangles(sizes, 200, 150)
+
+    assert all(p is not None for p in positions)
+    rects = []
+    for (w, h), (x, y, rotated) in zip(sizes, positions):
+        w, h = (h, w) if rotated else (w, h)
+        assert 0 <= x and x + w <= 200 and 0 <= y and y + h <= 150
+        rects.append({"x": x, "y": y, "width": w, "depth": h})
+    assert not any(overlaps(a, b) for i, a in enumerate(rects) for b in rects[i + 1:])
+
+
+def test_rectangles_turn_to_fit():
+    assert plate_packer.pack_rectangles([(30, 120)], 150, 50) == [(0.0, 0.0, True)]
+    assert plate_packer.pack_rectangles([(160, 10)], 150, 150) == [None]
+
+
+def test_build_plate_places_copies_in_bed_coordinates(box):
+    clip = box([-5, -5, 3], [15, 5, 8])
+    bed = (100, 100, 100)
+
+    placed, report = plate_packer.build_plate([("clip.stl", clip, 18)], bed=bed, spacing=5, margin=5)
+
+    # 20 x 10 mm parts with 5 mm gaps in a 90 x 90 mm area: at least 3 per row in 6 rows
+    assert report["parts"] == 18 and not report["unplaced"]
+    assert report["utilization"] == pytest.approx(18 * 200 / 10000)
+    for i, (placement, triangles) in enumerate(placed):
+        low = triangles.reshape(-1, 3).min(axis=0)
+        high = triangles.reshape(-1, 3).max(axis=0)
+        assert low[2] == pytest.approx(0) and low[0] >= 5 - 1e-4 and low[1] >= 5 - 1e-4
+        assert high[0] <= 95 + 1e-4 and high[1] <= 95 + 1e-4
+        for other, _ in placed[i + 1:]:
+            assert not overlaps(vars(placement), vars(other))
+        # Moving and turning keeps the part's shape and winding
+        assert mesh_analysis.analyze_mesh(triangles)["volume"] == pytest.approx(20 * 10 * 5, rel=1e-4)
+
+
+def test_parts_that_do_not_fit_are_reported(box):
+    big = box([0, 0, 0], [60, 60, 10])
+
+    _, report = plate_packer.build_plate([("big.stl", big, 3)], bed=(100, 130, 100), spacing=5, margin=0)
+
+    assert report["parts"] == 2
+    assert report["unplaced"] == [{"name": "big.stl", "copy": 2}]
+    assert "Did not fit: 1 x big.stl" in plate_packer.format_report(report)
+
+
+@pytest.mark.asyncio
+async def test_slice_plate_runs_the_slicer_once(mocker, tmp_path, box):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mesh_analysis.write_binary_stl(str(tmp_path / "clip.stl"), box([0, 0, 0], [20, 10, 5]))
+    mesh_analysis.write_binary_stl(str(tmp_path / "gear.stl"), box([0, 0, 0], [30, 30, 8]))
+    calls = []
+
+    async def slice_plate(input_paths, output_path, intent):
+        calls.append([mesh_analysis.analyze_mesh(mesh_analysis.load_stl(p))["bbox_min"] for p in input_paths])
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_plate", side_effect=slice_plate)
+
+    output = await server.slice_plate({"clip.stl": 3, "gear.stl": 2}, plate_name="batch")
+
+    assert output.startswith("Successfully sliced plate to batch.gcode")
+    assert "5 parts on the plate" in output
+    assert len(calls) == 1 and len(calls[0]) == 5
+    # Every part sits at its own spot on the bed
+    assert len({tuple(p[:2]) for p in calls[0]}) == 5
+
+
+@pytest.mark.asyncio
+async def test_slicer_command_keeps_positions(mocker, tmp_path):
+    from slicer_runner import SlicerRunner
+    runner = mocker.MagicMock()
+    slicer = SlicerRunner(slicer_path="prusa-slicer", runner=runner)
+    paths = []
+    for name in ("a.stl", "b.stl"):
+        (tmp_path / name).write_bytes(b"")
+        paths.append(str(tmp_path / name))
+    run = mocker.AsyncMock(return_value=mocker.MagicMock(timed_out=False, returncode=0, stdout="", usage=lambda: {}))
+    runner.run = run
+
+    result = await slicer.slice_plate(paths, str(tmp_path / "plate.gcode"))
+
+    assert result["success"]
+    cmd = run.call_args[0][0]
+    assert cmd[:4] == ["prusa-slicer", "-g", *paths]
+    # One model of all parts, kept where the packer placed them
+    assert "--merge" in cmd
+    assert "--dont-arrange" in cmd
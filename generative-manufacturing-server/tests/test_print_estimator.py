@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import print_estimator
+import slice_cache
+
+DRAFT = ["--layer-height", "0.25", "--fill-density", "10%"]
+STRONG = ["--layer-height", "0.2", "--fill-density", "40%", "--perimeters", "4"]
+DETAIL = ["--layer-height", "0.10", "--fill-density", "15%"]
+
+
+@pytest.fixture
+def cube(box):
+    return box((0, 0, 0), (20, 20, 20))
+
+
+@pytest.fixture
+def cache_dir(mocker, tmp_path):
+    mocker.patch.object(slice_cache, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_parse_and_format_duration():
+    assert print_estimator.parse_duration("1d 2h 3m 4s") == 93784
+    assert print_estimator.parse_duration("42m 10s") == 2530
+    assert print_estimator.parse_duration("") is None
+    assert print_estimator.format_duration(3725) == "1h 02m"
+    assert print_estimator.format_duration(600) == "10m"
+
+
+def test_mesh_geometry(cube):
+    geometry = print_estimator.mesh_geometry(cube)
+
+    assert geometry == {"volume": 8000.0, "surface_area": 2400.0, "height": 20.0}
+
+
+def test_intents_rank_as_expected(cache_dir, cube):
+    geometry = print_estimator.mesh_geometry(cube)
+
+    geometries = dict.fromkeys(["draft", "strong", "detail"], geometry)
+    result = print_estimator.compare_intents(geometries, {"draft": DRAFT, "strong": STRONG, "detail": DETAIL})
+    estimates = result["estimates"]
+
+    assert estimates["draft"]["print_time_s"] < estimates["strong"]["print_time_s"]
+    assert estimates["draft"]["print_time_s"] < estimates["detail"]["print_time_s"]
+    assert estimates["draft"]["filament_g"] < estimates["strong"]["filament_g"]
+    assert estimates["detail"]["layers"] == 200
+    assert result["calibration"]["calibrated"] is False
+
+
+def test_calibration_from_cached_slices(cache_dir, cube):
+    geometry = print_estimator.mesh_geometry(cube)
+    raw = print_estimator.estimate(geometry, DRAFT, {"time_factor": 1.0, "filament_factor": 1.0})
+    for i, ratio in enumerate([1.9, 2.0, 2.1, 50.0]):
+        (cache_dir / f"{i}.json").write_text(json.dumps({
+            "print_time": f"{raw['print_time_s'] * ratio}s",
+            "filament_g": str(raw["filament_g"] * 0.5),
+            "args": DRAFT,
+            "geometry": geometry,
+        }))
+    # Entries without geometry (slices that skipped validation) are ignored
+    (cache_dir / "other.json").write_text(json.dumps({"print_time": "1h"}))
+
+    calibration = print_estimator.calibrate()
+    calibrated = print_estimator.estimate(geometry, DRAFT)
+
+    assert calibration["samples"] == 4
+    assert calibration["calibrated"]
+    # The median ignores the outlier
+    assert 1.9 < calibration["time_factor"] < 2.1
+    assert calibrated["filament_g"] == pytest.approx(raw["filament_g"] * 0.5, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_slice_model_stores_calibration_samples(mocker, tmp_path, cache_dir, cube):
+    import server
+    import mesh_analysis
+    models = tmp_path / "models"
+    models.mkdir()
+    mocker.patch.object(server, "MODELS_DIR", str(models))
+    mocker.patch.dict("slicer_runner._slicer_versions", {server.slicer.slicer_path: "2.7.1"})
+
+    async def slice_file(input_path, output_path, intent):
+        with open(output_path, "w") as f:
+            f.write("G28\n; estimated printing time (normal mode) = 1h 2m 3s\n; filament used [g] = 12.5\n")
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    mesh_analysis.write_binary_stl(str(models / "cube.stl"), cube)
+
+    await server.slice_model("cube.stl", intent="draft", orient=False, simplify=False)
+    samples = print_estimator.load_samples()
+    result = json.loads((await server.estimate_print("cube.stl"))[0].text)
+
+    assert len(samples) == 1
+    assert samples[0]["print_time_s"] == 3723
+    assert samples[0]["geometry"]["volume"] == 8000.0
+    assert set(result["estimates"]) == {"draft", "default", "strong", "detail"}
+
+
+@pytest.mark.asyncio
+async def test_samples_and_estimates_use_the_oriented_mesh(mocker, tmp_path, cache_dir, box):
+    import server
+    import mesh_analysis
+    import orientation
+    models = tmp_path / "models"
+    models.mkdir()
+    mocker.patch.object(server, "MODELS_DIR", str(models))
+    mocker.patch.dict("slicer_runner._slicer_versions", {server.slicer.slicer_path: "2.7.1"})
+
+    async def slice_file(input_path, output_path, intent):
+        with open(output_path, "w") as f:
+            f.write("G28\n; estimated printing time (normal mode) = 1h\n; filament used [g] = 10\n")
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    # A tall slab that prints lying down
+    slab = box((0, 0, 0), (40, 4, 60))
+    mesh_analysis.write_binary_stl(str(models / "slab.stl"), slab)
+    oriented, report = orientation.orient(slab, "draft")
+    assert report["rotated"]
+
+    await server.slice_model("slab.stl", intent="draft", simplify=False)
+    result = json.loads((await server.estimate_print("slab.stl", ["draft"]))[0].text)
+
+    height = print_estimator.mesh_geometry(oriented)["height"]
+    assert height < 60
+    assert print_estimator.load_samples()[0]["geometry"]["height"] == height
+    assert result["geometry"]["draft"]["height"] == height
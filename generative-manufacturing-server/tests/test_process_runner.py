@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from process_runner import ProcessLimits, ProcessRunner
+
+
+@pytest.mark.asyncio
+async def test_run_reports_output_and_usage():
+    runner = ProcessRunner(max_workers=2)
+    result = await runner.run([sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr)"])
+
+    assert result.ok
+    assert result.stdout.strip() == "out"
+    assert result.stderr.strip() == "err"
+    usage = result.usage()
+    assert usage["returncode"] == 0
+    assert usage["wall_time"] > 0
+    if hasattr(os, "wait4"):
+        assert usage["max_rss_kb"] > 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_kills_process():
+    runner = ProcessRunner(max_workers=1)
+    start = time.monotonic()
+    result = await runner.run([sys.executable, "-c", "import time; time.sleep(30)"], ProcessLimits(timeout=0.5))
+
+    assert result.timed_out
+    assert not result.ok
+    assert time.monotonic() - start < 10
+
+
+@pytest.mark.skipif(os.name != "posix", reason="process groups are POSIX only")
+@pytest.mark.asyncio
+async def test_cancel_kills_process_group(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    # The tool spawns a grandchild, which must die with it
+    script = (
+        "import subprocess, sys, time\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+        f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+        "time.sleep(30)\n"
+    )
+    runner = ProcessRunner(max_workers=1)
+    task = asyncio.create_task(runner.run([sys.executable, "-c", script]))
+    for _ in range(100):
+        if pid_file.exists() and pid_file.read_text():
+            break
+        await asyncio.sleep(0.05)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    grandchild = int(pid_file.read_text())
+    for _ in range(100):
+        try:
+            os.kill(grandchild, 0)
+        except ProcessLookupError:
+            break
+        await asyncio.sleep(0.05)
+    else:
+        pytest.fail("grandchild process survived cancellation")
+
+
+@pytest.mark.asyncio
+async def test_worker_count_bounds_concurrency():
+    runner = ProcessRunner(max_workers=1)
+    cmd = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+    start = time.monotonic()
+    await asyncio.gather(runner.run(cmd), runner.run(cmd))
+
+    assert time.monotonic() - start >= 0.6
+
+
+@pytest.mark.skipif(not hasattr(resource, "prlimit"), reason="limits are applied with prlimit, Linux only")
+@pytest.mark.asyncio
+async def test_cpu_limit_stops_runaway_process():
+    runner = ProcessRunner(max_workers=1)
+    result = await runner.run([sys.executable, "-c", "while True: pass"], ProcessLimits(timeout=20, cpu_seconds=1))
+
+    assert not result.ok
+    assert not result.timed_out
+    assert result.signal in ("SIGXCPU", "SIGKILL")
+
+
+
+@pytest.mark.skipif(not hasattr(resource, "prlimit"), reason="limits are applied with prlimit, Linux only")
+@pytest.mark.asyncio
+async def test_memory_limit_applies_to_process():
+    runner = ProcessRunner(max_workers=1)
+    script = "import resource, time; time.sleep(0.2); print(resource.getrlimit(resource.RLIMIT_AS)[0])"
+    result = await runner.run([sys.executable, "-c", script], ProcessLimits(memory_bytes=512 * 1024 * 1024))
+
+    assert result.ok
+    assert int(result.stdout) == 512 * 1024 * 1024
+
+
+def test_limits_from_env(monkeypatch):
+    monkeypatch.setenv("TOOL_TIMEOUT", "12")
+    monkeypatch.setenv("TOOL_MEMORY_MB", "0")
+    limits = ProcessLimits.from_env("TOOL", timeout=300, cpu_seconds=60, memory_mb=1024)
+
+    assert limits.timeout == 12
+    assert limits.cpu_seconds == 60
+    assert limits.memory_bytes is None
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server
+import stl_generator
+
+
+def test_draft_caps_fine_curves():
+    code = "$fn = 200;\ncylinder(r=5, h=2, $fn=128);\nsphere(r=3, $fa=1, $fs=0.1);"
+
+    draft = stl_generator.apply_draft_resolution(code, max_fn=16)
+
+    assert draft == "$fn = 16;\ncylinder(r=5, h=2, $fn=16);\nsphere(r=3, $fa=12, $fs=2);"
+
+
+def test_draft_leaves_coarse_scripts_alone():
+    code = "$fn = 0;\ncylinder(r=5, h=2, $fn=6);\ncube(10);"
+
+    assert stl_generator.apply_draft_resolution(code, max_fn=16) == code
+
+
+@pytest.mark.asyncio
+async def test_generate_model_returns_draft_and_builds_final(mocker, tmp_path, tetra_stl):
+    mocker.patch.object(server, "client", MagicMock())
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    final_path = str(tmp_path / "gear.stl")
+    mocker.patch.object(stl_generator, "generate_model", AsyncMock(return_value={
+        "status": "success",
+        "path": str(tmp_path / "gear.draft.stl"),
+        "filename": "gear.draft.stl",
+        "final_path": final_path,
+        "draft": True,
+        "scad_code": "$fn=200; sphere(10);",
+    }))
+    release = asyncio.Event()
+
+    async def compile_scad(scad_code, output_path, runner=None, backend=None):
+        await release.wait()
+        open(output_path, "wb").write(tetra_stl)
+        return {"success": True, "error": None, "backend": "cgal", "usage": None}
+
+    (tmp_path / "gear.draft.stl").write_bytes(tetra_stl)
+    compile_mock = mocker.patch.object(stl_generator, "compile_scad_to_stl", side_effect=compile_scad)
+    mocker.patch.object(stl_generator, "render_stl_preview", AsyncMock(return_value=None))
+
+    content = await server.generate_model("a gear", filename="gear", preview=False, draft=True)
+
+    assert "draft" in content[0].text
+    assert "get_generated_model('gear.stl')" in content[0].text
+    await asyncio.sleep(0)
+    compile_mock.assert_called_once_with("$fn=200; sphere(10);", final_path)
+
+    pending = await server.get_generated_model("gear")
+    assert "still building" in pending[0].text
+
+    release.set()
+    ready = await server.get_generated_model("gear", wait=True, timeout=5)
+    assert ready[0].text == f"Full resolution model ready at {final_path}"
+    # The draft is gone from the models directory and the finished build from the task table
+    assert not (tmp_path / "gear.draft.stl").exists()
+    assert "gear.stl" not in server.final_builds
+    again = await server.get_generated_model("gear")
+    assert again[0].text == f"Full resolution model ready at {final_path}"
+
+
+@pytest.mark.asyncio
+async def test_full_build_is_validated_and_keeps_the_draft_on_failure(mocker, tmp_path):
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    final_path = str(tmp_path / "gear.stl")
+    (tmp_path / "gear.draft.stl").write_text("solid x\nendsolid x\n")
+
+    async def compile_scad(scad_code, output_path, runner=None, backend=None):
+        open(output_path, "w").write("solid x\nendsolid x\n")
+        return {"success": True, "error": None, "backend": "cgal", "usage": None}
+
+    mocker.patch.object(stl_generator, "compile_scad_to_stl", side_effect=compile_scad)
+
+    result = await server.start_full_resolution_build("$fn=200; sphere(10);", final_path)
+
+    assert not result["success"]
+    assert result["error"] == "Mesh validation failed: Mesh has no triangles."
+    assert not os.path.exists(final_path)
+    assert (tmp_path / "gear.draft.stl").exists()
+    failed = await server.get_generated_model("gear")
+    assert "did not finish" in failed[0].text
@@ -0,0 +1,117 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import mesh_analysis
+import stl_generator
+from process_runner import ProcessResult
+
+NEW_HELP = "  --backend arg   3D rendering backend to use: 'CGAL' (old/slow) [default] or 'Manifold' (new/fast)"
+SNAPSHOT_HELP = "  --enable arg   enable experimental features (specify 'all' for enabling all available features): manifold | fast-csg"
+OLD_HELP = "  -o arg   output specified file instead of running the GUI"
+EXPORT_HELP = NEW_HELP + "\n  --export-format arg   overrides format of exported scad file when using option '-o'"
+
+ASCII_FACET = b"""solid x
+facet normal 0 0 1
+outer loop
+vertex 0 0 0
+vertex 1 0 0
+vertex 0 1 0
+endloop
+endfacet
+endsolid x
+"""
+
+
+@pytest.fixture
+def fake_openscad(mocker, tmp_path):
+    """Fake OpenSCAD whose help text and per-backend outcome the test controls."""
+    mocker.patch.object(stl_generator, "OPENSCAD_PATH", str(tmp_path / "openscad"))
+    (tmp_path / "openscad").write_text("")
+    mocker.patch.dict(stl_generator._openscad_help, clear=True)
+    state = {"help": NEW_HELP, "failing": set(), "stderr": "ERROR: CGAL error", "calls": [], "commands": []}
+
+    async def run(cmd, limits=None, cwd=None):
+        if cmd[-1] == "--help":
+            return ProcessResult(cmd=cmd, returncode=0, stdout="", stderr=state["help"], wall_time=0.0)
+        flags = [c for c in cmd if c.startswith("--backend") or c.startswith("--enable")]
+        state["calls"].append(flags)
+        state["commands"].append(cmd)
+        if any(backend in flag for flag in flags for backend in state["failing"]):
+            return ProcessResult(cmd=cmd, returncode=1, stdout="", stderr=state["stderr"], wall_time=0.1)
+        with open(cmd[cmd.index("-o") + 1], "wb") as f:
+            f.write(ASCII_FACET)
+        return ProcessResult(cmd=cmd, returncode=0, stdout="", stderr="", wall_time=0.1)
+
+    mocker.patch.object(stl_generator.default_runner, "run", side_effect=run)
+    return state
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("help_text, expected", [
+    (NEW_HELP, ["--backend=manifold"]),
+    (SNAPSHOT_HELP, ["--enable=manifold"]),
+    (OLD_HELP, None),
+])
+async def test_detect_fast_backend(fake_openscad, help_text, expected):
+    fake_openscad["help"] = help_text
+    assert await stl_generator.detect_backend_args("manifold") == expected
+
+
+@pytest.mark.asyncio
+async def test_auto_prefers_manifold(fake_openscad, tmp_path):
+    result = await stl_generator.compile_scad_to_stl("cube(1);", str(tmp_path / "out.stl"), backend="auto")
+
+    assert result["success"]
+    assert result["backend"] == "manifold"
+    assert fake_openscad["calls"] == [["--backend=manifold"]]
+
+
+@pytest.mark.asyncio
+async def test_auto_falls_back_to_cgal(fake_openscad, tmp_path):
+    fake_openscad["failing"] = {"manifold"}
+
+    result = await stl_generator.compile_scad_to_stl("cube(1);", str(tmp_path / "out.stl"), backend="auto")
+
+    assert result["success"]
+    assert result["backend"] == "cgal"
+    assert fake_openscad["calls"] == [["--backend=manifold"], ["--backend=cgal"]]
+
+
+@pytest.mark.asyncio
+async def test_parser_errors_are_not_retried(fake_openscad, tmp_path):
+    fake_openscad["failing"] = {"manifold"}
+    fake_openscad["stderr"] = "ERROR: Parser error in line 1: syntax error"
+
+    result = await stl_generator.compile_scad_to_stl("cube(1", str(tmp_path / "out.stl"), backend="auto")
+
+    assert not result["success"]
+    assert "Parser error" in result["error"]
+    assert len(fake_openscad["calls"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_old_openscad_uses_default_backend(fake_openscad, tmp_path):
+    fake_openscad["help"] = OLD_HELP
+
+    result = await stl_generator.compile_scad_to_stl("cube(1);", str(tmp_path / "out.stl"), backend="auto")
+
+    assert result["success"]
+    assert result["backend"] == "cgal"
+    assert fake_openscad["calls"] == [[]]
+    assert len(mesh_analysis.load_stl(str(tmp_path / "out.stl"))) == 1
+    # ASCII output of builds without --export-format is converted after the compile
+    assert mesh_analysis.is_binary_stl(str(tmp_path / "out.stl"))
+
+
+@pytest.mark.asyncio
+async def test_binary_export_requested_when_supported(fake_openscad, tmp_path):
+    fake_openscad["help"] = EXPORT_HELP
+
+    result = await stl_generator.compile_scad_to_stl("cube(1);", str(tmp_path / "out.stl"), backend="auto")
+
+    assert result["success"]
+    cmd = fake_openscad["commands"][0]
+    assert cmd[cmd.index("--export-format") + 1] == "binstl"
@@ -0,0 +1,171 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import slice_cache
+from process_runner import ProcessResult
+
+GCODE = b"""G1 X10 Y10
+G1 X20 Y10
+; filament used [mm] = 1234.56
+; filament used [g] = 3.71
+; estimated printing time (normal mode) = 1h 2m 3s
+; total layers count = 42
+; layer_height = 0.2
+"""
+
+
+@pytest.fixture
+def cache_dir(mocker, tmp_path):
+    directory = tmp_path / "cache"
+    mocker.patch.object(slice_cache, "CACHE_DIR", str(directory))
+    return directory
+
+
+def test_cache_key_depends_on_content_args_and_version():
+    key = slice_cache.cache_key("abc", ["--layer-height", "0.2"], "2.7.1")
+
+    assert key == slice_cache.cache_key("abc", ["--layer-height", "0.2"], "2.7.1")
+    assert key != slice_cache.cache_key("abd", ["--layer-height", "0.2"], "2.7.1")
+    assert key != slice_cache.cache_key("abc", ["--layer-height", "0.3"], "2.7.1")
+    assert key != slice_cache.cache_key("abc", ["--layer-height", "0.2"], "2.8.0")
+    assert key != slice_cache.cache_key("abc", ["--layer-height", "0.2"], "2.7.1", {"orient": True})
+
+
+def test_store_and_lookup(cache_dir, tmp_path):
+    source = tmp_path / "part.gcode"
+    source.write_bytes(GCODE)
+    key = slice_cache.cache_key("abc", [], "2.7.1")
+
+    assert slice_cache.lookup(key, str(tmp_path / "out.gcode")) is None
+    stored = slice_cache.store(key, str(source), {"intent": "draft"})
+    metadata = slice_cache.lookup(key, str(tmp_path / "out.gcode"))
+
+    assert metadata == stored
+    assert metadata["intent"] == "draft"
+    assert (tmp_path / "out.gcode").read_bytes() == GCODE
+    assert slice_cache.stats()["entries"] == 1
+
+
+def test_trim_evicts_least_recently_used(cache_dir, tmp_path):
+    source = tmp_path / "part.gcode"
+    source.write_bytes(GCODE)
+    for i, key in enumerate(["old", "used", "new"]):
+        slice_cache.store(key, str(source))
+        os.utime(cache_dir / f"{key}.gcode", (1000 + i, 1000 + i))
+    # A hit makes the oldest entry the most recent one
+    slice_cache.lookup("old", str(tmp_path / "out.gcode"))
+
+    slice_cache.trim(max_bytes=2 * len(GCODE))
+
+    assert sorted(p.name for p in cache_dir.glob("*.gcode")) == ["new.gcode", "old.gcode"]
+    assert not (cache_dir / "used.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_slice_model_reuses_results_across_filenames(mocker, tmp_path, cache_dir):
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.dict("slicer_runner._slicer_versions", {server.slicer.slicer_path: "2.7.1"})
+    calls = []
+
+    async def slice_file(input_path, output_path, intent):
+        calls.append(input_path)
+        with open(output_path, "wb") as f:
+            f.write(GCODE)
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    stl = (tmp_path / "cube.stl")
+    stl.write_bytes(b"solid x\nendsolid x\n")
+    (tmp_path / "copy.stl").write_bytes(stl.read_bytes())
+
+    first = await server.slice_model("cube.stl", validate=False, orient=False, simplify=False)
+    second = await server.slice_model("copy.stl", validate=False, orient=False, simplify=False)
+    other_intent = await server.slice_model("copy.stl", intent="draft", validate=False, orient=False, simplify=False)
+
+    assert "42 layers" in first
+    assert "(cached)" in second and "42 layers" in second
+    assert (tmp_path / "copy.gcode").read_bytes() == GCODE
+    assert "(cached)" not in other_intent
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_slicer_version_is_queried_once(mocker):
+    from slicer_runner import SlicerRunner
+    runner = mocker.MagicMock()
+
+    async def run(cmd, limits=None, cwd=None):
+        return ProcessResult(cmd=cmd, returncode=0, stdout="PrusaSlicer-2.7.1+linux-x64-GTK3 based on Slic3r\n",
+                             stderr="", wall_time=0.1)
+
+    runner.run = mocker.AsyncMock(side_effect=run)
+    mocker.patch.dict("slicer_runner._slicer_versions", clear=True)
+    slicer = SlicerRunner("/opt/prusa-slicer", runner=runner)
+
+    assert await slicer.get_version() == "2.7.1+linux-x64-GTK3"
+    assert await slicer.get_version() == "2.7.1+linux-x64-GTK3"
+    assert runner.run.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_slicer_version_is_asked_again_and_not_cached(mocker, tmp_path, cache_dir):
+    import server
+    from slicer_runner import SlicerRunner
+    runner = mocker.MagicMock()
+    runner.run = mocker.AsyncMock(side_effect=FileNotFoundError("prusa-slicer"))
+    mocker.patch.dict("slicer_runner._slicer_versions", clear=True)
+    slicer = SlicerRunner("/opt/prusa-slicer", runner=runner)
+
+    assert await slicer.get_version() == "unknown"
+    assert await slicer.get_version() == "unknown"
+    assert runner.run.call_count == 2
+
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server.slicer, "get_version", mocker.AsyncMock(return_value="unknown"))
+
+    async def slice_file(input_path, output_path, intent):
+        with open(output_path, "wb") as f:
+            f.write(GCODE)
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    (tmp_path / "cube.stl").write_bytes(b"solid x\nendsolid x\n")
+
+    await server.slice_model("cube.stl", validate=False, orient=False, simplify=False)
+
+    assert slice_cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_do_not_wait_for_a_slicer_worker(mocker, tmp_path, cache_dir):
+    import asyncio
+    import job_queue
+    import server
+    mocker.patch.object(server, "MODELS_DIR", str(tmp_path))
+    mocker.patch.object(server, "slice_jobs", job_queue.JobQueue(workers=1))
+    mocker.patch.dict("slicer_runner._slicer_versions", {server.slicer.slicer_path: "2.7.1"})
+
+    async def slice_file(input_path, output_path, intent):
+        with open(output_path, "wb") as f:
+            f.write(GCODE)
+        return {"success": True, "message": "Slicing successful"}
+
+    mocker.patch.object(server.slicer, "slice_file", side_effect=slice_file)
+    (tmp_path / "cube.stl").write_bytes(b"solid x\nendsolid x\n")
+    await server.slice_model("cube.stl", validate=False, orient=False, simplify=False)
+
+    # Occupy the only worker
+    release = asyncio.Event()
+    busy = server.slice_jobs.submit("busy", lambda job: release.wait())
+    await asyncio.sleep(0)
+
+    cached = await asyncio.wait_for(server.slice_model("cube.stl", validate=False, orient=False, simplify=False), 5)
+
+    assert "(cached)" in cached
+    assert server.slice_jobs.stats()["submitted"] == 2
+    release.set()
+    await busy.task
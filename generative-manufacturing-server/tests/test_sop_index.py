@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sop_index
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "layer_shift.md").write_text("# Layer Shift SOP\n<!-- aliases: skipped steps -->\nCheck belt tension.\n")
+    (tmp_path / "bed_adhesion.md").write_text("# Bed Adhesion SOP\n<!-- aliases: warping, lifting corners -->\n"
+                                              "Clean the bed. Layers shifted? See the layer shift SOP.\n")
+    (tmp_path / "safety.md").write_text("# Safety Protocols\nPress the reset button.\n")
+    library = sop_index.SOPIndex(str(tmp_path), check_interval=0)
+    library.refresh()
+    return library
+
+
+def test_tokens_normalize_spelling_and_inflection():
+    assert sop_index.tokens("layer_shift") == sop_index.tokens("Layer Shift") == ["layer", "shift"]
+    assert sop_index.tokens("Shifted layers") == ["shift", "layer"]
+    assert sop_index.tokens("skipped steps") == sop_index.tokens("skip step")
+    assert sop_index.tokens("stringing") == sop_index.tokens("strings") == ["string"]
+
+
+@pytest.mark.parametrize("query", ["layer shift", "layer_shift", "Shifted layers", "LAYER SHIFTS", "Skipped steps"])
+def test_synonyms_find_the_same_sop(library, query):
+    assert [match["name"] for match in library.search(query)] == ["layer_shift"]
+
+
+def test_ranking_prefers_names_over_body_text(library):
+    assert [match["name"] for match in library.search("warping")] == ["bed_adhesion"]
+    # bed_adhesion only mentions shifted layers in its text
+    assert library.search("shifted layers")[0]["name"] == "layer_shift"
+    assert library.search("nozzle blob") == []
+
+
+def test_index_follows_file_changes(library, tmp_path):
+    assert library.search("stringing") == []
+    (tmp_path / "stringing.md").write_text("# Stringing SOP\nDry the filament.\n")
+    # Lookups read the index as last built, only refresh reads the disk
+    assert library.search("stringing") == []
+    assert library.refresh()
+    assert library.search("stringing")[0]["title"] == "Stringing"
+
+    os.remove(tmp_path / "stringing.md")
+    assert library.refresh()
+    assert library.search("stringing") == []
+    assert library.get("safety").content.startswith("# Safety Protocols")
+
+
+def test_lookups_with_hundreds_of_sops(tmp_path):
+    for i in range(400):
+        (tmp_path / f"problem_{i}.md").write_text(f"# Problem {i} SOP\n<!-- aliases: symptom{i} -->\n" + "Text. " * 200)
+    library = sop_index.SOPIndex(str(tmp_path))
+    library.refresh()
+
+    for i in range(200):
+        assert library.search(f"symptom{i}")[0]["name"] == f"problem_{i}"
+
+
+@pytest.mark.asyncio
+async def test_review_latest_incident_matches_issue_synonyms(mocker, tmp_path):
+    import incident_store
+    import server
+    mocker.patch.object(server, "incidents", incident_store.IncidentStore(str(tmp_path)))
+
+    result = json.loads((await server.review_latest_incident({"status": "failure", "issues": [
+        {"type": "Shifted layers", "confidence": 0.8},
+        {"type": "layer_shift", "confidence": 0.6},
+        {"type": "Warping", "confidence": 0.5},
+    ]}))[0].text)
+
+    assert [sop["title"] for sop in result["sops"]] == ["Layer Shift", "Bed Adhesion", "Safety Protocols"]
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stl_generator
+
+
+@pytest.fixture
+def fake_pipeline(mocker, tmp_path, tetra_stl):
+    """Fake Gemini + OpenSCAD; the SCAD text decides how long a compile takes and whether it works."""
+    mocker.patch.object(stl_generator, "MODELS_DIR", str(tmp_path))
+    state = {"codes": [], "prompts": [], "compiled": [], "cancelled": []}
+
+    async def generate(prompt, client=None, full_prompt=None):
+        state["prompts"].append(full_prompt)
+        return state["codes"].pop(0)
+
+    async def compile_scad(scad_code, output_path, runner=None, backend=None):
+        delay, outcome = scad_code.split(":")
+        try:
+            await asyncio.sleep(float(delay))
+        except asyncio.CancelledError:
+            state["cancelled"].append(scad_code)
+            raise
+        state["compiled"].append(scad_code)
+        if outcome == "error":
+            return {"success": False, "error": "ERROR: Parser error in line 3", "backend": "cgal", "usage": None}
+        with open(output_path, "wb") as f:
+            f.write(tetra_stl if outcome == "ok" else b"solid x\nendsolid x\n")
+        return {"success": True, "error": None, "backend": "cgal", "usage": {"wall_time": float(delay)}}
+
+    mocker.patch.object(stl_generator, "generate_scad_code", side_effect=generate)
+    mocker.patch.object(stl_generator, "compile_scad_to_stl", side_effect=compile_scad)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_first_valid_candidate_wins_and_rest_are_cancelled(fake_pipeline, tmp_path, tetra_stl):
+    fake_pipeline["codes"] = ["0.5:ok", "0.01:ok", "0.02:error"]
+
+    result = await stl_generator.compile_first_candidate("a cube", str(tmp_path / "cube.stl"), candidates=3)
+
+    assert result["success"]
+    assert result["scad_code"] == "0.01:ok"
+    assert sorted(fake_pipeline["cancelled"]) == ["0.02:error", "0.5:ok"]
+    assert (tmp_path / "cube.stl").read_bytes() == tetra_stl
+    assert sorted(os.listdir(tmp_path)) == ["cube.stl"]
+
+
+@pytest.mark.asyncio
+async def test_empty_mesh_is_not_a_winner(fake_pipeline, tmp_path):
+    fake_pipeline["codes"] = ["0.01:empty", "0.05:ok"]
+
+    result = await stl_generator.compile_first_candidate("a cube", str(tmp_path / "cube.stl"), candidates=2)
+
+    assert result["scad_code"] == "0.05:ok"
+
+
+@pytest.mark.asyncio
+async def test_compile_errors_feed_a_repair_round(fake_pipeline, tmp_path):
+    fake_pipeline["codes"] = ["0.01:error", "0.01:error", "0.01:ok", "0.01:ok"]
+
+    result = await stl_generator.compile_first_candidate("a cube", str(tmp_path / "cube.stl"), candidates=2, repair_rounds=1)
+
+    assert result["success"]
+    assert result["round"] == 1
+    assert result["attempts"] == 4
+    repair_prompt = fake_pipeline["prompts"][2]
+    assert "0.01:error" in repair_prompt
+    assert "Parser error in line 3" in repair_prompt
+
+
+@pytest.mark.asyncio
+async def test_repair_rounds_are_bounded(fake_pipeline, tmp_path):
+    fake_pipeline["codes"] = ["0.01:error"] * 3
+
+    result = await stl_generator.compile_first_candidate("a cube", str(tmp_path / "cube.stl"), candidates=1, repair_rounds=2)
+
+    assert not result["success"]
+    assert result["attempts"] == 3
+    assert not os.listdir(tmp_path)
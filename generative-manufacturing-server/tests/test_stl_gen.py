@@ -27,8 +27,7 @@ async def test_generation():
     
     print(f"Prompt: {prompt}")
     
-    # Run synchronous generator
-    result = stl_generator.generate_model(prompt, filename, client)
+    result = await stl_generator.generate_model(prompt, filename, client)
     
     print("Result:", result)
     
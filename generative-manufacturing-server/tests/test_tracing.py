@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import executors
+import tracing
+
+
+@pytest.fixture
+def exported(mocker, tmp_path):
+    """Spans written by a file exporter, read back as dicts after flushing."""
+    exporter = tracing.FileExporter(str(tmp_path / "traces" / "spans.jsonl"))
+    mocker.patch.object(tracing, "exporter", exporter)
+
+    def read():
+        exporter.flush()
+        with open(exporter.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    return read
+
+
+def blocking_step():
+    with tracing.span("io.step", thread=threading.current_thread().name):
+        return tracing.current_trace_id()
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks_and_executors(exported):
+    async def child():
+        with tracing.span("model.turn", turn=0):
+            await asyncio.sleep(0)
+
+    with tracing.span("tool.deep_print_check") as root:
+        await asyncio.gather(child(), child())
+        worker_trace = await executors.run("io", blocking_step)
+        with pytest.raises(ValueError):
+            with tracing.span("printer.call"):
+                raise ValueError("offline")
+    assert tracing.current_span() is None
+
+    spans = {span["name"]: span for span in exported()}
+    assert worker_trace == root.trace_id
+    assert {span["trace_id"] for span in spans.values()} == {root.trace_id}
+    assert spans["model.turn"]["parent_id"] == spans["io.step"]["parent_id"] == root.span_id
+    assert spans["printer.call"]["status"] == "error"
+    assert spans["printer.call"]["error"] == "ValueError: offline"
+    assert spans["tool.deep_print_check"]["parent_id"] is None
+    assert spans["io.step"]["attributes"]["thread"].startswith("io")
+
+
+@pytest.mark.asyncio
+async def test_background_spans_finishing_late_are_exported_alone(exported):
+    release = asyncio.Event()
+
+    async def background():
+        with tracing.span("printer.check"):
+            await release.wait()
+
+    with tracing.span("tool.print_from_prompt"):
+        task = asyncio.ensure_future(background())
+        await asyncio.sleep(0)
+    assert [span["name"] for span in exported()] == ["tool.print_from_prompt"]
+
+    release.set()
+    await task
+    late = exported()[-1]
+    assert late["name"] == "printer.check" and late["trace_id"] == exported()[0]["trace_id"]
+
+
+def test_slow_requests_log_the_span_tree(mocker, caplog):
+    mocker.patch.object(tracing, "SLOW_SECONDS", 1e-9)
+    with caplog.at_level(logging.WARNING, logger="tracing"):
+        with tracing.span("tool.deep_print_check"):
+            with tracing.span("camera.capture"):
+                with tracing.span("camera.encode", quality=80):
+                    pass
+            with tracing.span("gemini.analyze_frame", turn=0):
+                pass
+
+    tree = caplog.text.split("trace ")[1].splitlines()[1:]
+    assert len(tree) == 4
+    assert tree[0].startswith("tool.deep_print_check ")
+    assert tree[1].startswith("  camera.capture ")
+    assert tree[2].startswith("    camera.encode ") and tree[2].endswith("[quality=80]")
+    assert tree[3].startswith("  gemini.analyze_frame ")
+
+
+def test_exporter_rotates_the_file(tmp_path):
+    exporter = tracing.FileExporter(str(tmp_path / "spans.jsonl"), max_bytes=10)
+    for name in ("one", "two"):
+        span = tracing.span(name)
+        with span:
+            pass
+        exporter.export([span])
+        exporter.flush()
+
+    assert os.path.exists(exporter.path + ".1")
+    with open(exporter.path, encoding="utf-8") as f:
+        assert json.loads(f.read())["name"] == "two"
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_and_subprocesses_are_traced(exported):
+    import server
+    from process_runner import ProcessRunner
+
+    await server.mcp.call_tool("get_loop_stats", {})
+    with tracing.span("tool.slice_model") as root:
+        await ProcessRunner(max_workers=1).run([sys.executable, "-c", "pass"])
+
+    spans = exported()
+    assert spans[0]["name"] == "tool.get_loop_stats" and spans[0]["parent_id"] is None
+    process = next(span for span in spans if span["name"].startswith("process."))
+    assert process["parent_id"] == root.span_id
+    assert process["attributes"]["returncode"] == 0
@@ -0,0 +1,192 @@
+import base64
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ui_resources
+
+APP_URL = "https://unpkg.com/@modelcontextprotocol/ext-apps@0.4.0/app-with-deps"
+MARKED_URL = "https://unpkg.com/marked@12.0.0/marked.min.js"
+FONT_CSS_URL = "https://fonts.googleapis.com/css2?family=Inter:wght@400&display=swap"
+FONT_URL = "https://fonts.gstatic.com/s/inter/v13/inter.woff2"
+
+PAGE = f"""<!DOCTYPE html>
+<html>
+<head>
+    <link href="{FONT_CSS_URL}" rel="stylesheet">
+    <script src="{MARKED_URL}"></script>
+</head>
+<body>
+    <script type="module">
+        import {{ App }} from "{APP_URL}";
+        const app = new App({{ name: "Test" }});
+    </script>
+</body>
+</html>
+"""
+
+
+BUNDLE = b'class t{constructor(e){this.name=e.name}}const s="</script>";export{t as App,s as Tag};\n'
+ASSETS = {
+    APP_URL: BUNDLE,
+    MARKED_URL: b"window.marked={parse:function(s){return s}};",
+    FONT_CSS_URL: f"@font-face{{font-family:'Inter';src:url({FONT_URL}) format('woff2')}}".encode(),
+    FONT_URL: b"wOF2font",
+}
+
+
+@pytest.fixture
+def vendor(mocker, tmp_path):
+    """A vendor directory holding every asset of PAGE, all pinned; downloads fail."""
+    mocker.patch.object(ui_resources, "VENDOR_DIR", str(tmp_path / "vendor"))
+    mocker.patch.object(ui_resources, "PINS_PATH", str(tmp_path / "vendor.lock.json"))
+    mocker.patch.object(ui_resources.httpx, "get", side_effect=ui_resources.httpx.ConnectError("offline"))
+    os.makedirs(tmp_path / "vendor")
+    for url, data in ASSETS.items():
+        with open(ui_resources.vendor_path(url), "wb") as f:
+            f.write(data)
+    (tmp_path / "vendor.lock.json").write_text(json.dumps({url: ui_resources.integrity(data) for url, data in ASSETS.items()}))
+    return tmp_path / "vendor"
+
+
+def test_inline_assets(vendor):
+    page, inlined = ui_resources.inline_assets(PAGE, fetch=False)
+
+    assert sorted(inlined) == sorted([APP_URL, MARKED_URL, FONT_CSS_URL])
+    assert "https://" not in page
+    assert "<script>window.marked=" in page
+    assert "url(data:font/woff2;base64,d09GMmZvbnQ=)" in page
+    # The module imports the bundle unchanged from a data: URL
+    data_url = "data:text/javascript;base64," + base64.b64encode(BUNDLE).decode("ascii")
+    assert f'import {{ App }} from "{data_url}";' in page
+
+
+def test_missing_assets_stay_external(vendor):
+    os.remove(ui_resources.vendor_path(APP_URL))
+
+    page, inlined = ui_resources.inline_assets(PAGE)
+
+    assert APP_URL not in inlined
+    assert f'import {{ App }} from "{APP_URL}";' in page
+    assert ui_resources.httpx.get.call_count == 1
+
+
+def test_bundles_with_relative_imports_stay_external():
+    assert ui_resources._module_url(b'import{x}from"./dep.js";export{x as App};') is None
+    assert ui_resources._module_url(b'import{x}from"https://unpkg.com/dep";export{x as App};') is not None
+
+
+def test_downloads_must_match_their_pin(vendor, mocker):
+    os.remove(ui_resources.vendor_path(MARKED_URL))
+    response = mocker.Mock(content=b"window.marked=evil;")
+    mocker.patch.object(ui_resources.httpx, "get", return_value=response)
+
+    assert ui_resources.fetch_asset(MARKED_URL) is None
+    assert not os.path.exists(ui_resources.vendor_path(MARKED_URL))
+
+    response.content = ASSETS[MARKED_URL]
+    assert ui_resources.fetch_asset(MARKED_URL) == ASSETS[MARKED_URL]
+    assert os.path.exists(ui_resources.vendor_path(MARKED_URL))
+
+
+def test_unpinned_assets_are_not_downloaded(vendor, mocker):
+    mocker.patch.object(ui_resources.httpx, "get")
+
+    assert ui_resources.fetch_asset("https://unpkg.com/other@1.0.0/other.js") is None
+    ui_resources.httpx.get.assert_not_called()
+
+
+def test_tampered_cache_is_not_inlined(vendor):
+    with open(ui_resources.vendor_path(MARKED_URL), "wb") as f:
+        f.write(b"window.marked=evil;")
+
+    page, inlined = ui_resources.inline_assets(PAGE, fetch=False)
+
+    assert MARKED_URL not in inlined
+    assert f'<script src="{MARKED_URL}"></script>' in page
+
+
+def test_pin_assets_records_every_asset_and_font(vendor, mocker, tmp_path):
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "page.html").write_text(PAGE)
+    mocker.patch.object(ui_resources.httpx, "get", side_effect=lambda url, **kwargs: mocker.Mock(content=ASSETS[url]))
+
+    pins = ui_resources.pin_assets(str(tmp_path / "pages"))
+
+    assert pins == {url: ui_resources.integrity(data) for url, data in ASSETS.items()}
+    assert ui_resources.load_pins() == pins
+
+
+def test_registry_serves_from_memory_and_hot_reloads(vendor, tmp_path):
+    (tmp_path / "page.html").write_text(PAGE)
+    registry = ui_resources.UIRegistry(str(tmp_path), hot_reload=True)
+
+    assert registry.load_all() == ["page.html"]
+    first = registry.get("page.html")
+    assert gzip.decompress(first.gzipped) == first.body == first.html.encode("utf-8")
+    assert registry.get("page.html") is first
+
+    (tmp_path / "page.html").write_text(PAGE.replace("Test", "Changed"))
+    os.utime(tmp_path / "page.html", ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+    second = registry.get("page.html")
+    assert "Changed" in second.html
+    assert second.etag != first.etag
+
+    with pytest.raises(FileNotFoundError):
+        registry.get("../secret.html")
+    assert "Error: missing.html not found" in registry.html("missing.html")
+
+
+def test_server_route_uses_etags():
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+    import server
+
+    client = TestClient(Starlette(routes=server.mcp._custom_starlette_routes))
+    response = client.get("/ui/printer-snapshot.html")
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Printer Snapshot" in response.text
+
+    etag = response.headers["etag"]
+    assert client.get("/ui/printer-snapshot.html", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/ui/nothing.html").status_code == 404
+
+
+def test_shipped_pages_are_served_without_cdn_assets(mocker, tmp_path):
+    # Every CDN reference of the real pages must be one inline_assets replaces, once the assets are vendored
+    mocker.patch.object(ui_resources, "VENDOR_DIR", str(tmp_path / "vendor"))
+    mocker.patch.object(ui_resources, "PINS_PATH", str(tmp_path / "vendor.lock.json"))
+
+    def download(url, **kwargs):
+        if url.startswith("https://fonts.googleapis.com/"):
+            return mocker.Mock(content=f"@font-face{{src:url({FONT_URL})}}".encode())
+        return mocker.Mock(content=b"wOF2font" if url == FONT_URL else b"const x=1;export{x as App};")
+
+    mocker.patch.object(ui_resources.httpx, "get", side_effect=download)
+    pins = ui_resources.pin_assets()
+    registry = ui_resources.UIRegistry(inline=True)
+
+    assert APP_URL in pins and FONT_URL in pins
+    for filename in registry.load_all(fetch=False):
+        page = registry.get(filename).html
+        assert '<script src="https://unpkg.com' not in page
+        assert "unpkg.com" not in page and "fonts.googleapis.com" not in page and "fonts.gstatic.com" not in page
+
+
+def test_pin_assets_keeps_pins_that_do_not_match(vendor, mocker, tmp_path):
+    (tmp_path / "pages").mkdir()
+    (tmp_path / "pages" / "page.html").write_text(PAGE)
+    os.remove(ui_resources.vendor_path(MARKED_URL))
+    pinned = ui_resources.load_pins()
+    changed = dict(ASSETS, **{MARKED_URL: b"window.marked=evil;"})
+    mocker.patch.object(ui_resources.httpx, "get", side_effect=lambda url, **kwargs: mocker.Mock(content=changed[url]))
+
+    pins = ui_resources.pin_assets(str(tmp_path / "pages"))
+
+    assert pins[MARKED_URL] == pinned[MARKED_URL]
+    assert not os.path.exists(ui_resources.vendor_path(MARKED_URL))
@@ -0,0 +1,238 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# JSON lines file that finished spans are appended to, one span per line; unset disables the export
+TRACE_FILE = os.getenv("TRACE_FILE")
+# The trace file is rotated to <TRACE_FILE>.1 beyond this size
+TRACE_FILE_MAX_BYTES = int(float(os.getenv("TRACE_FILE_MAX_MB", "50")) * 1024 * 1024)
+# Traces taking longer than this are logged as an indented span tree; 0 disables
+SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "10"))
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Trace:
+    """The spans of one request, collected as they finish, from any thread."""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: list[Span] = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span") -> bool:
+        """Keeps a finished span. False if the root already finished, the span then goes out on its own."""
+        with self._lock:
+            if self.finished:
+                return False
+            self.spans.append(span)
+            return True
+
+    def finish(self) -> list["Span"]:
+        with self._lock:
+            self.finished = True
+            return list(self.spans)
+
+
+class Span:
+    """
+    One timed step of a request. Used as a context manager, it becomes the parent of spans
+    opened inside it, across awaits, tasks and executors.run, which copy context variables.
+    A span opened with no parent starts a new trace and exports it when it ends.
+    """
+    __slots__ = ("name", "attributes", "trace", "span_id", "parent_id", "start", "duration", "status", "error",
+                 "_started", "_token")
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace: Optional[Trace] = None
+        self.span_id = os.urandom(8).hex()
+        self.parent_id: Optional[str] = None
+        self.start = 0.0
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> Optional[str]:
+        return self.trace.trace_id if self.trace else None
+
+    def set(self, **attributes) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def fail(self, error: str = None):
+        self.status = "error"
+        self.error = error or self.error
+
+    def __enter__(self) -> "Span":
+        parent = _current.get()
+        if parent is not None:
+            self.trace = parent.trace
+            self.parent_id = parent.span_id
+        else:
+            self.trace = Trace()
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None:
+            self.fail(f"{exc_type.__name__}: {exc}")
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Exited in another context than it was entered in; that context keeps its own current span
+            pass
+        if self.parent_id is None:
+            self.trace.add(self)
+            _finish_trace(self, self.trace.finish())
+        elif not self.trace.add(self):
+            _export([self])
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def span(name: str, **attributes) -> Span:
+    """A span to open with `with`: `with tracing.span("camera.read", url=url): ...`"""
+    return Span(name, attributes)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current.get()
+    return current.trace_id if current else None
+
+
+def traced(name: Optional[str] = None):
+    """Decorator running every call of a sync or async function in a span, named after it by default."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with Span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def format_tree(spans: list[Span]) -> str:
+    """Spans as an indented tree, children in start order, with durations in milliseconds."""
+    children: dict[Optional[str], list[Span]] = {}
+    ids = {s.span_id for s in spans}
+    root_id = next((s.span_id for s in spans if s.parent_id is None), None)
+    for s in sorted(spans, key=lambda s: s.start):
+        # Spans whose parent is still running, e.g. in a background task, hang off the root
+        parent = s.parent_id if s.parent_id in ids or s.parent_id is None else root_id
+        children.setdefault(parent, []).append(s)
+
+    lines = []
+
+    def walk(parent_id: Optional[str], depth: int):
+        for s in children.get(parent_id, []):
+            attributes = " ".join(f"{key}={value}" for key, value in s.attributes.items())
+            error = f" ERROR {s.error}" if s.status == "error" else ""
+            lines.append(f"{'  ' * depth}{s.name} {s.duration * 1000:.1f} ms"
+                         + (f" [{attributes}]" if attributes else "") + error)
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+class FileExporter:
+    """
+    Appends spans as JSON lines to a local file from a background thread, so exporting never
+    blocks the event loop. The file is rotated once it exceeds max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="trace-export", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait([json.dumps(s.to_dict(), default=str) for s in spans])
+        except queue.Full:
+            # Tracing must never slow requests down; a stuck disk loses spans instead
+            self.dropped += len(spans)
+
+    def flush(self):
+        """Blocks until every span exported so far is written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            lines = self._queue.get()
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write spans to {self.path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+exporter: Optional[FileExporter] = FileExporter(TRACE_FILE) if TRACE_FILE else None
+
+
+def _export(spans: list[Span]):
+    if exporter is not None and spans:
+        exporter.export(spans)
+
+
+def _finish_trace(root: Span, spans: list[Span]):
+    _export(spans)
+    if SLOW_SECONDS and root.duration > SLOW_SECONDS:
+        logger.warning(f"Slow request {root.name} took {root.duration:.1f}s, trace {root.trace_id}:\n{format_tree(spans)}")
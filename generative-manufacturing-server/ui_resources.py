@@ -0,0 +1,322 @@
+import base64
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "resources")
+# Downloaded CDN scripts and fonts; once fetched, inlining works offline
+VENDOR_DIR = os.path.join(RESOURCES_DIR, "vendor")
+# Subresource integrity hash of every CDN asset that may be downloaded, written by `python ui_resources.py`;
+# unpinned assets are never downloaded, and a download or cached copy that does not match is not inlined
+PINS_PATH = os.path.join(RESOURCES_DIR, "vendor.lock.json")
+# Inline unpkg scripts and Google Fonts into the HTML, so the UI renders without CDN round trips
+INLINE_ASSETS = os.getenv("UI_INLINE_ASSETS", "true").lower() == "true"
+# Reload an HTML file when its mtime changes, checked on every read; for UI development
+HOT_RELOAD = os.getenv("UI_HOT_RELOAD", "false").lower() == "true"
+FETCH_TIMEOUT = 10
+# Google Fonts only serves woff2 to user agents it recognizes as modern browsers
+FONT_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+_SCRIPT_TAG = re.compile(r'<script\s+src="(https://unpkg\.com/[^"]+)"\s*>\s*</script>')
+_FONT_LINK = re.compile(r'<link\b[^>]*\bhref="(https://fonts\.googleapis\.com/[^"]+)"[^>]*>')
+_FONT_URL = re.compile(r"url\((https://fonts\.gstatic\.com/[^)]+)\)")
+_MODULE_IMPORT = re.compile(r'(import\s*\{[^}]*\}\s*from\s*)"(https://unpkg\.com/[^"]+)"')
+# Relative specifiers cannot be resolved from a data: URL module
+_RELATIVE_IMPORT = re.compile(r"""\b(from|import)\s*\(?\s*["']\.{1,2}/""")
+
+
+@dataclass
+class UIResource:
+    """One HTML resource, ready to serve: text, UTF-8 bytes, gzip bytes and their strong ETag."""
+    filename: str
+    html: str
+    body: bytes
+    gzipped: bytes
+    etag: str
+    mtime_ns: int
+    inlined: list[str] = field(default_factory=list)
+
+
+def vendor_path(url: str) -> str:
+    return os.path.join(VENDOR_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest()[:24])
+
+
+def integrity(data: bytes) -> str:
+    """The subresource integrity string of an asset, as pinned in PINS_PATH."""
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode("ascii")
+
+
+def load_pins(path: Optional[str] = None) -> dict[str, str]:
+    """Pinned integrity per asset URL; none if the pin file does not exist."""
+    try:
+        with open(path or PINS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _download(url: str, user_agent: Optional[str] = None) -> bytes:
+    headers = {"User-Agent": user_agent} if user_agent else {}
+    response = httpx.get(url, headers=headers, follow_redirects=True, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def _store(url: str, data: bytes):
+    path = vendor_path(url)
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def fetch_asset(url: str, fetch: bool = True, user_agent: Optional[str] = None,
+                pins: Optional[dict[str, str]] = None) -> Optional[bytes]:
+    """
+    Contents of a CDN asset from the vendor directory, downloading it there first if fetch is set
+    and the asset is pinned. None if it is not cached and cannot be downloaded, or does not match its pin.
+    Files put in the vendor directory by hand are vendored assets and need no pin.
+    """
+    pins = load_pins() if pins is None else pins
+    pin = pins.get(url)
+    try:
+        with open(vendor_path(url), "rb") as f:
+            data = f.read()
+        if pin is None or integrity(data) == pin:
+            return data
+        logger.warning(f"Cached {url} does not match its pinned integrity, the UI keeps loading it from the CDN")
+        return None
+    except FileNotFoundError:
+        pass
+    if not fetch:
+        return None
+    if pin is None:
+        logger.info(f"{url} is not pinned in {PINS_PATH}, the UI keeps loading it from the CDN")
+        return None
+
+    try:
+        data = _download(url, user_agent)
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not fetch {url}, the UI keeps loading it from the CDN: {e}")
+        return None
+    if integrity(data) != pin:
+        logger.warning(f"Downloaded {url} does not match its pinned integrity, the UI keeps loading it from the CDN")
+        return None
+
+    try:
+        _store(url, data)
+    except OSError as e:
+        logger.warning(f"Could not cache {url}: {e}")
+    return data
+
+
+def _script_text(source: str) -> str:
+    # The HTML parser ends a script at the first "</script", wherever it appears
+    return source.replace("</script", "<\\/script")
+
+
+def _module_url(bundle: bytes) -> Optional[str]:
+    """
+    A data: URL importing a self-contained ES module bundle unchanged. None if the bundle imports
+    relative paths, which only resolve against its CDN URL.
+    """
+    if _RELATIVE_IMPORT.search(bundle.decode("utf-8")):
+        return None
+    return "data:text/javascript;base64," + base64.b64encode(bundle).decode("ascii")
+
+
+def _inline_fonts(css: str, fetch: bool, pins: dict[str, str]) -> str:
+    def font(match):
+        data = fetch_asset(match.group(1), fetch, pins=pins)
+        if data is None:
+            return match.group(0)
+        return f"url(data:font/woff2;base64,{base64.b64encode(data).decode('ascii')})"
+    return _FONT_URL.sub(font, css)
+
+
+def inline_assets(page: str, fetch: bool = True) -> tuple[str, list[str]]:
+    """
+    Replaces unpkg scripts and Google Fonts stylesheets with their contents, and the URLs of unpkg
+    ES module imports with data: URLs of the bundle. Assets that are neither cached nor downloadable,
+    or do not match their pinned integrity, stay external.
+
+    Returns:
+        The rewritten HTML and the URLs that were inlined.
+    """
+    inlined = []
+    pins = load_pins()
+
+    def script(match):
+        data = fetch_asset(match.group(1), fetch, pins=pins)
+        if data is None:
+            return match.group(0)
+        inlined.append(match.group(1))
+        return f"<script>{_script_text(data.decode('utf-8'))}</script>"
+
+    def stylesheet(match):
+        url = html.unescape(match.group(1))
+        data = fetch_asset(url, fetch, FONT_USER_AGENT, pins)
+        if data is None:
+            return match.group(0)
+        inlined.append(url)
+        return f"<style>{_inline_fonts(data.decode('utf-8'), fetch, pins)}</style>"
+
+    def module(match):
+        # The browser imports the bundle as it is, from a data: URL instead of the CDN
+        url = match.group(2)
+        data = fetch_asset(url, fetch, pins=pins)
+        module_url = _module_url(data) if data is not None else None
+        if module_url is None:
+            return match.group(0)
+        inlined.append(url)
+        return f'{match.group(1)}"{module_url}"'
+
+    page = _SCRIPT_TAG.sub(script, page)
+    page = _FONT_LINK.sub(stylesheet, page)
+    page = _MODULE_IMPORT.sub(module, page)
+    return page, inlined
+
+
+def asset_urls(page: str) -> list[tuple[str, Optional[str]]]:
+    """(URL, user agent to fetch it with) of every CDN asset inline_assets would inline from a page."""
+    urls = [(url, None) for url in _SCRIPT_TAG.findall(page)]
+    urls += [(html.unescape(url), FONT_USER_AGENT) for url in _FONT_LINK.findall(page)]
+    urls += [(url, None) for _, url in _MODULE_IMPORT.findall(page)]
+    return urls
+
+
+def pin_assets(directory: str = RESOURCES_DIR, path: Optional[str] = None) -> dict[str, str]:
+    """
+    Vendors every CDN asset of the HTML files in directory, with the fonts their stylesheets load:
+    downloads them into the vendor directory and writes their integrity to the pin file. Assets
+    already pinned must match their pin; one that does not is left out of the vendor directory and
+    keeps its old pin, so the UI loads it from the CDN. Run by hand when an asset URL changes and
+    review the new pins like any other change; image builds run it to vendor the pinned assets.
+    """
+    pending = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                pending += asset_urls(f.read())
+    path = path or PINS_PATH
+    known = load_pins(path)
+    pins = {}
+    while pending:
+        url, user_agent = pending.pop(0)
+        if url in pins:
+            continue
+        data = _download(url, user_agent)
+        if url in known and integrity(data) != known[url]:
+            logger.warning(f"{url} does not match its pinned integrity, not vendored")
+            pins[url] = known[url]
+            continue
+        _store(url, data)
+        pins[url] = integrity(data)
+        if user_agent == FONT_USER_AGENT:
+            pending += [(font_url, None) for font_url in _FONT_URL.findall(data.decode("utf-8"))]
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(pins.items())), f, indent=2)
+        f.write("\n")
+    os.replace(temp_path, path)
+    return pins
+
+
+class UIRegistry:
+    """
+    The HTML resources of the MCP UI, held in memory: tool calls and resource reads never touch
+    the disk. Each file is read once, its CDN assets are inlined and the result is compressed
+    and hashed up front. With hot_reload, a changed mtime reloads the file on its next read.
+    """
+
+    def __init__(self, directory: str = RESOURCES_DIR, inline: Optional[bool] = None,
+                 hot_reload: Optional[bool] = None):
+        self.directory = directory
+        self.inline = INLINE_ASSETS if inline is None else inline
+        self.hot_reload = HOT_RELOAD if hot_reload is None else hot_reload
+        self.resources: dict[str, UIResource] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, filename: str) -> str:
+        if os.path.basename(filename) != filename or not filename.endswith(".html"):
+            raise FileNotFoundError(f"Not a UI resource: {filename}")
+        return os.path.join(self.directory, filename)
+
+    def load(self, filename: str, fetch: bool = False) -> UIResource:
+        """Reads, inlines, compresses and hashes one file. fetch allows downloading missing assets."""
+        path = self._path(filename)
+        mtime_ns = os.stat(path).st_mtime_ns
+        with open(path, "r", encoding="utf-8") as f:
+            page = f.read()
+        inlined = []
+        if self.inline:
+            page, inlined = inline_assets(page, fetch)
+        body = page.encode("utf-8")
+        resource = UIResource(
+            filename=filename,
+            html=page,
+            body=body,
+            # mtime=0 keeps the gzip bytes, and so any cache validation on them, identical across reloads
+            gzipped=gzip.compress(body, compresslevel=9, mtime=0),
+            etag='"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+            mtime_ns=mtime_ns,
+            inlined=inlined,
+        )
+        with self._lock:
+            self.resources[filename] = resource
+        logger.info(f"Loaded UI resource {filename}: {len(body)} bytes, {len(resource.gzipped)} gzipped, "
+                    f"{len(inlined)} assets inlined")
+        return resource
+
+    def load_all(self, fetch: bool = True) -> list[str]:
+        """Loads every HTML file of the directory; run at startup, where downloading pinned assets may block."""
+        loaded = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".html"):
+                self.load(filename, fetch)
+                loaded.append(filename)
+        return loaded
+
+    def get(self, filename: str) -> UIResource:
+        """
+        A loaded resource, loading it on first use from cached assets only, so a request never
+        waits on a CDN. Raises FileNotFoundError if the file does not exist.
+        """
+        resource = self.resources.get(filename)
+        if resource is None:
+            return self.load(filename)
+        if self.hot_reload:
+            try:
+                changed = os.stat(self._path(filename)).st_mtime_ns != resource.mtime_ns
+            except FileNotFoundError:
+                changed = False
+            if changed:
+                return self.load(filename)
+        return resource
+
+    def html(self, filename: str) -> str:
+        """The HTML of a resource, or an error page naming the missing file."""
+        try:
+            return self.get(filename).html
+        except FileNotFoundError:
+            logger.warning(f"UI resource {filename} not found in {self.directory}")
+            return f"<html><body><h1>Error: {filename} not found</h1></body></html>"
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    pinned = pin_assets()
+    print(f"Vendored and pinned {len(pinned)} assets in {PINS_PATH}")